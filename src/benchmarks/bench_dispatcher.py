@@ -0,0 +1,43 @@
+"""Нагрузочный тест диспетчера апдейтов с имитацией бота.
+
+Каждый апдейт обрабатывается HANDLER_LATENCY секунд (как сетевой вызов к LLM
+или API), и видно, как пропускная способность растет с числом воркеров.
+
+Запуск: python -m src.benchmarks.bench_dispatcher
+"""
+import time
+from types import SimpleNamespace
+
+from src.project.dispatcher import UpdateDispatcher
+
+CHATS = 64
+UPDATES_PER_CHAT = 10
+HANDLER_LATENCY = 0.02
+
+
+def make_update(chat_id, seq):
+    return SimpleNamespace(update_id=seq, message=SimpleNamespace(chat=SimpleNamespace(id=chat_id)))
+
+
+def run(workers):
+    dispatcher = UpdateDispatcher(lambda update: time.sleep(HANDLER_LATENCY), workers=workers, queue_size=32)
+    dispatcher.start()
+    start = time.perf_counter()
+    for seq in range(UPDATES_PER_CHAT):
+        for chat_id in range(CHATS):
+            dispatcher.submit(make_update(chat_id, seq))
+    dispatcher.stop()
+    elapsed = time.perf_counter() - start
+    return dispatcher.processed / elapsed
+
+
+def main():
+    baseline = None
+    for workers in (1, 2, 4, 8, 16, 32):
+        throughput = run(workers)
+        baseline = baseline or throughput
+        print(f"workers={workers:<3} {throughput:8.1f} updates/s  (x{throughput / baseline:.1f})")
+
+
+if __name__ == "__main__":
+    main()
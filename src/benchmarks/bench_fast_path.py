@@ -0,0 +1,72 @@
+"""Точность и задержка локального разбора (fast path) против LLM на размеченном корпусе.
+
+Корпус собирается из шаблонов: для каждой фразы известно ожидаемое название и
+время начала (или что фраза должна уйти в LLM). С флагом --llm те же фразы
+разбираются через Yandex GPT (нужны реальные ключи в config).
+
+Запуск: python -m src.benchmarks.bench_fast_path [--llm]
+"""
+import itertools
+import statistics
+import sys
+import time
+
+from src.project import fast_parser
+from src.project.dateparse import convert_relative_to_iso
+
+TITLES = ["Созвон с командой", "позвонить маме", "Ревью кода", "купить молоко", "Встреча с друзьями"]
+DATES = [("завтра", "завтра"), ("послезавтра", "послезавтра"), ("в пятницу", "пятница"), ("во вторник", "вторник"),
+         ("28 декабря", "28 декабря"), ("12.01.2025", "12.01.2025,")]
+TIMES = ["9:30", "15:00", "20:00"]
+TEMPLATES = ["{title} {date} в {time}", "Напомни {title} {date} в {time}", "{date} в {time} {title}"]
+VAGUE = ["Напомни про свидание завтра в семь вечера", "Встреча с друзьями в пятницу вечером",
+         "каждый понедельник в 10:00 планерка", "позвонить врачу через два часа", "обед полпервого завтра",
+         "купить молоко"]
+
+
+def build_corpus():
+    corpus = []
+    for title, (date_text, date_phrase), clock, template in itertools.product(TITLES, DATES, TIMES, TEMPLATES):
+        text = template.format(title=title, date=date_text, time=clock)
+        corpus.append((text, title, convert_relative_to_iso(f"{date_phrase} {clock}")))
+    corpus.extend((text, None, None) for text in VAGUE)
+    return corpus
+
+
+def is_correct(result, title, start_time):
+    return result is not None and result["title"].lower() == title.lower() and result["start_time"] == start_time
+
+
+def run(name, corpus, parse):
+    latencies = []
+    accepted = correct = 0
+    for text, title, start_time in corpus:
+        start = time.perf_counter()
+        result = parse(text)
+        latencies.append(time.perf_counter() - start)
+        if result is not None:
+            accepted += 1
+            correct += title is not None and is_correct(result, title, start_time)
+    latencies.sort()
+    print(f"{name:<10} handled {accepted}/{len(corpus)} ({accepted / len(corpus):.0%}), "
+          f"accuracy on handled {correct / max(accepted, 1):.1%}, "
+          f"p50 {statistics.median(latencies) * 1000:.3f} ms, p99 {latencies[int(len(latencies) * 0.99)] * 1000:.3f} ms")
+
+
+def llm_parse(text):
+    from src.project import bot
+    payload = bot.form_payload(text, True)
+    response = bot.transport.post(bot.YANDEX_API_URL, headers=bot.llm_headers(), data=payload)
+    return bot.parse_llm_response(response)
+
+
+def main():
+    corpus = build_corpus()
+    run("fast path", corpus, lambda text: fast_parser.parse_locally(text, True))
+    print(f"fast path hit ratio: {fast_parser.stats.hit_ratio:.1%}")
+    if "--llm" in sys.argv:
+        run("llm", corpus, llm_parse)
+
+
+if __name__ == "__main__":
+    main()
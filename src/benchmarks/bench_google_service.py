@@ -0,0 +1,36 @@
+"""Микро-бенчмарк: холодное и тёплое получение сервиса Google Calendar.
+
+Запуск: python -m src.benchmarks.bench_google_service
+"""
+import time
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+from src.project.api import googleapi
+
+ITERATIONS = 200
+
+
+def bench(label, func, iterations=ITERATIONS):
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed / iterations * 1000:8.3f} ms/call")
+    return elapsed
+
+
+def main():
+    googleapi._service_cache.clear()
+    googleapi._discovery_document = None
+
+    legacy = bench("build() on every call", lambda i: build('calendar', 'v3', credentials=Credentials(f"token-{i}")))
+    cold = bench("cold (new token every call)", lambda i: googleapi.get_google_service(f"token-{i}"))
+    googleapi.get_google_service("warm-token")
+    warm = bench("warm (cached token)", lambda i: googleapi.get_google_service("warm-token"))
+    print(f"speedup vs build(): cold x{legacy / cold:.1f}, warm x{legacy / warm:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Бенчмарк списка событий Google: полный events.list против инкрементального syncToken.
+
+Фейковый календарь на 10k событий; каждый запрос страницы стоит фиксированную задержку сети
+плюс время на передачу событий.
+
+Запуск: python -m src.benchmarks.bench_google_sync [количество_событий]
+"""
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from src.project.api.google_sync import PAGE_SIZE, CalendarCache
+
+EVENTS = 10_000
+READS = 50
+CHANGES_PER_READ = 3
+REQUEST_LATENCY = 0.05
+EVENT_LATENCY = 0.00002
+
+
+class FakeCalendar:
+    """Минимальный Calendar API: постраничный list с timeMin или syncToken."""
+
+    def __init__(self, events):
+        now = datetime.now(timezone.utc)
+        self.stored = {}
+        self.version = 0
+        self.changed = {}
+        for i in range(events):
+            self.put(now, i)
+        self.requests = 0
+        self._params = None
+
+    def put(self, now, i):
+        start = now + timedelta(minutes=30 * i)
+        self.version += 1
+        self.stored[str(i)] = {"id": str(i), "summary": f"событие {i}", "status": "confirmed",
+                               "start": {"dateTime": start.isoformat()},
+                               "end": {"dateTime": (start + timedelta(hours=1)).isoformat()}}
+        self.changed[str(i)] = self.version
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        self._params = params
+        return self
+
+    def execute(self, num_retries=0):
+        self.requests += 1
+        params = self._params
+        if "syncToken" in params:
+            since = int(params["syncToken"])
+            items = [self.stored[event_id] for event_id, version in self.changed.items() if version > since]
+        else:
+            items = list(self.stored.values())
+        offset = int(params.get("pageToken") or 0)
+        page = items[offset:offset + params.get("maxResults", 250)]
+        time.sleep(REQUEST_LATENCY + EVENT_LATENCY * len(page))
+        result = {"items": page}
+        if offset + len(page) < len(items):
+            result["nextPageToken"] = str(offset + len(page))
+        else:
+            result["nextSyncToken"] = str(self.version)
+        return result
+
+
+def full_list(calendar):
+    """Как раньше: полный список с timeMin на каждое чтение."""
+    page_token = None
+    items = []
+    while True:
+        result = calendar.events().list(calendarId="primary", singleEvents=True, maxResults=PAGE_SIZE,
+                                        pageToken=page_token).execute()
+        items.extend(result["items"])
+        page_token = result.get("nextPageToken")
+        if not page_token:
+            return sorted(items, key=lambda e: e["start"]["dateTime"])[:10]
+
+
+def bench(name, calendar, read):
+    now = datetime.now(timezone.utc)
+    calendar.requests = 0
+    start = time.perf_counter()
+    for n in range(READS):
+        for i in range(CHANGES_PER_READ):
+            calendar.put(now, (n * CHANGES_PER_READ + i) % len(calendar.stored))
+        read()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {elapsed / READS * 1000:>8.1f} ms/чтение   запросов к API: {calendar.requests}")
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else EVENTS
+    calendar = FakeCalendar(events)
+    bench("полный список", calendar, lambda: full_list(calendar))
+
+    cache = CalendarCache(max_events=events)
+    start = time.perf_counter()
+    cache.sync(calendar)
+    print(f"{'первая полная синхр.':<24} {(time.perf_counter() - start) * 1000:>8.1f} ms")
+    bench("syncToken", calendar, lambda: (cache.sync(calendar), cache.upcoming()))
+
+    start = time.perf_counter()
+    for _ in range(10_000):
+        cache.upcoming()
+    print(f"{'upcoming() из кэша':<24} {(time.perf_counter() - start) / 10_000 * 1e6:>8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
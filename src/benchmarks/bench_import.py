@@ -0,0 +1,66 @@
+"""Время холодного импорта src.project.bot по `python -X importtime`.
+
+Импорт повторяется в новых процессах, берется лучший прогон (меньше всего шума от диска и
+планировщика). Печатает самые тяжелые модули и завершается с кодом 1, если импорт дольше
+бюджета или тянет за собой интеграции, которые должны грузиться лениво.
+
+Запуск: python -m src.benchmarks.bench_import [--budget 350] [--runs 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+MODULE = "src.project.bot"
+BUDGET_MS = 350
+RUNS = 5
+TOP = 10
+# Эти библиотеки нужны только при запуске сервера или первом обращении к API.
+LAZY_MODULES = ("fastapi", "uvicorn", "telebot", "httpx", "googleapiclient", "google.oauth2", "httplib2")
+
+
+def import_profile(module=MODULE):
+    """Один прогон в чистом процессе: {модуль: (собственное, суммарное время в мкс)} и загруженные LAZY_MODULES."""
+    check = f"import sys; print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}; {check}"],
+                            capture_output=True, text=True, env=os.environ, check=True)
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile, result.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=float, default=BUDGET_MS, help="бюджет на импорт, ms")
+    parser.add_argument("--runs", type=int, default=RUNS)
+    args = parser.parse_args()
+
+    best, loaded = None, []
+    for _ in range(args.runs):
+        profile, loaded = import_profile()
+        if best is None or profile[MODULE][1] < best[MODULE][1]:
+            best = profile
+    total_ms = best[MODULE][1] / 1000
+    print(f"import {MODULE}: {total_ms:.0f} ms (лучший из {args.runs}), бюджет {args.budget:.0f} ms")
+    print(f"  {'модуль':<40} {'суммарно, ms':>13}")
+    heaviest = sorted(((cumulative, name) for name, (_, cumulative) in best.items() if name != MODULE), reverse=True)
+    for cumulative, name in heaviest[:TOP]:
+        print(f"  {name:<40} {cumulative / 1000:>13.1f}")
+
+    failed = False
+    if loaded:
+        print("импортированы при загрузке модуля, хотя должны грузиться лениво:", ", ".join(loaded))
+        failed = True
+    if total_ms > args.budget:
+        print("бюджет превышен")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
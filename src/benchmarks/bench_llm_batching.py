@@ -0,0 +1,84 @@
+"""Пропускная способность и хвосты задержки разбора сообщений через Yandex GPT:
+по запросу на сообщение против LLMBatcher (пачки и ограничение одновременных вызовов).
+
+Фейковый completion-сервер (src/benchmarks/fakes.py) отвечает с задержкой, которая растет
+с числом пунктов в ответе, и возвращает 429 сверх квоты на одновременные запросы.
+Сообщения приходят с постоянной частотой (открытая нагрузка), задержка считается от прихода.
+
+Запуск: python -m src.benchmarks.bench_llm_batching [--rate 100] [--seconds 10] [--quota 10]
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.benchmarks.fakes import FakeYandexGPT
+from src.project.llm_batcher import LLMBatcher
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+
+def run(name, parse, args, fake):
+    """Шлет rate сообщений в секунду в parse(text) и печатает итог."""
+    total = int(args.rate * args.seconds)
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    calls_before, throttled_before = sum(fake.requests.values()), fake.throttled
+
+    def handle(i, arrived):
+        nonlocal errors
+        try:
+            parse(f"созвон с клиентом {i} послезавтра вечером")
+        except Exception:
+            with lock:
+                errors += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - arrived)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=1024) as pool:
+        for i in range(total):
+            arrival = start + i / args.rate
+            time.sleep(max(0.0, arrival - time.perf_counter()))
+            pool.submit(handle, i, arrival)
+    elapsed = time.perf_counter() - start
+    calls = sum(fake.requests.values()) - calls_before
+    print(f"{name:<12} {len(latencies) / elapsed:>8.1f} {percentile(latencies, 0.5) * 1000:>9.0f} "
+          f"{percentile(latencies, 0.99) * 1000:>9.0f} {calls:>7} {fake.throttled - throttled_before:>6} {errors:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=100, help="сообщений в секунду")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--quota", type=int, default=10, help="одновременных запросов к LLM")
+    parser.add_argument("--latency", type=float, default=0.3, help="задержка ответа на один пункт, с")
+    parser.add_argument("--item-latency", type=float, default=0.03, help="добавка за каждый следующий пункт, с")
+    args = parser.parse_args()
+
+    fake = FakeYandexGPT(latency=args.latency, jitter=args.latency / 5, item_latency=args.item_latency,
+                         max_concurrency=args.quota, seed=0).start()
+    try:
+        from src.project import bot as bot_module
+
+        bot_module.YANDEX_API_URL = fake.url + "/foundationModels/v1/completion"
+        print(f"{args.rate:.0f} сообщений/с в течение {args.seconds:.0f} s, квота {args.quota}, "
+              f"задержка LLM {args.latency * 1000:.0f} ms + {args.item_latency * 1000:.0f} ms за пункт")
+        print(f"{'режим':<12} {'ответов/с':>8} {'p50, ms':>9} {'p99, ms':>9} {'вызовов':>7} {'429':>6} {'ошибок':>7}")
+        run("по одному", lambda text: bot_module.request_llm(text, True), args, fake)
+        batcher = LLMBatcher(bot_module.complete_llm_batch, max_concurrency=args.quota)
+        try:
+            run("пачками", lambda text: batcher(True, text), args, fake)
+        finally:
+            batcher.stop()
+        print(f"пачек {batcher.batches}, средний размер {batcher.batched_requests / max(1, batcher.batches):.1f}")
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
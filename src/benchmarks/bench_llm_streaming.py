@@ -0,0 +1,65 @@
+"""Время до первого отклика и до результата при разборе сообщения через Yandex GPT:
+ответ целиком против потока с остановкой, как только JSON-объект дописан.
+
+Фейковый completion-сервер (src/benchmarks/fakes.py) генерирует ответ по токенам с задержкой
+token_latency и дописывает после JSON пояснение, как это любит делать модель. Отклик целиком
+приходит вместе с результатом, в потоке — как только видно название.
+
+Запуск: python -m src.benchmarks.bench_llm_streaming [--messages 20] [--token-latency 0.02]
+"""
+import argparse
+import time
+
+from src.benchmarks.fakes import FakeYandexGPT
+from src.benchmarks.bench_llm_batching import percentile
+
+CHATTER = "\nЯ выделил название, время начала и время окончания. Если нужно что-то изменить, напишите."
+
+
+def run(name, parse, args):
+    """Разбирает сообщения по одному; parse(text, on_partial) -> результат."""
+    first, total = [], []
+    for i in range(args.messages):
+        started = time.perf_counter()
+        seen = []
+
+        def on_partial(fields):
+            if "title" in fields and not seen:
+                seen.append(time.perf_counter() - started)
+
+        parse(f"созвон с клиентом {i} послезавтра вечером", on_partial)
+        total.append(time.perf_counter() - started)
+        first.append(seen[0] if seen else total[-1])
+    print(f"{name:<10} {percentile(first, 0.5) * 1000:>16.0f} {percentile(first, 0.99) * 1000:>16.0f} "
+          f"{percentile(total, 0.5) * 1000:>14.0f} {percentile(total, 0.99) * 1000:>14.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.15, help="задержка до первого токена, с")
+    parser.add_argument("--token-latency", type=float, default=0.02, help="время генерации одного токена, с")
+    args = parser.parse_args()
+
+    fake = FakeYandexGPT(latency=args.latency, token_latency=args.token_latency, chatter=CHATTER, seed=0).start()
+    try:
+        from src.project import bot as bot_module
+
+        bot_module.YANDEX_API_URL = fake.url + "/foundationModels/v1/completion"
+        print(f"{args.messages} сообщений по одному, до первого токена {args.latency * 1000:.0f} ms, "
+              f"{args.token_latency * 1000:.0f} ms на токен")
+        print(f"{'режим':<10} {'отклик p50, ms':>16} {'отклик p99, ms':>16} {'итог p50, ms':>14} {'итог p99, ms':>14}")
+        tokens = fake.tokens
+        run("целиком", lambda text, on_partial: bot_module.request_llm(text, True), args)
+        print(f"  отдано токенов: {fake.tokens - tokens}")
+        tokens = fake.tokens
+        run("поток", lambda text, on_partial: bot_module.stream_llm(True, text, on_partial), args)
+        cut = sum(not stream.completed for stream in fake.streams)
+        print(f"  отдано токенов: {sum(stream.written for stream in fake.streams)} из {fake.tokens - tokens}, "
+              f"потоков прервано после JSON: {cut} из {len(fake.streams)}")
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Нагрузочный тест бота целиком: синтетические пользователи через настоящие хендлеры.
+
+Внешние API заменены локальными фейками (src/benchmarks/fakes.py) с задержкой и ошибками.
+Каждый пользователь проходит сценарий: список задач, добавление задачи, список событий,
+добавление события (простое — локально, размытое — через LLM), удаление задачи.
+Печатает пропускную способность, p50/p99 времени обработки по командам и память.
+
+Запуск: python -m src.benchmarks.bench_load [--users 200] [--latency 0.02] [--error-rate 0.0]
+"""
+import argparse
+import resource
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+from src.benchmarks.fakes import FakeCloud
+from src.project.dispatcher import UpdateDispatcher
+from src.project.outbox import Outbox
+from src.project.token_store import MemoryTokenStore
+
+FIRST_CHAT = 1_000_000
+
+
+def session(chat_id, i):
+    """Тексты сообщений одного пользователя по порядку."""
+    event = f"созвон с клиентом {i} послезавтра вечером" if i % 4 == 0 else f"встреча {i} завтра в 15:00"
+    return ["/list_tasks", "/add_task", "1", f"купить молоко {i} завтра в 10:00",
+            "/list_events", "/add_event", event, "/delete_task", "1"]
+
+
+def make_update(update_id, chat_id, text):
+    message = {"message_id": update_id, "date": int(time.time()), "text": text,
+               "chat": {"id": chat_id, "type": "private"},
+               "from": {"id": chat_id, "is_bot": False, "first_name": "load"}}
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    return {"update_id": update_id, "message": message}
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка каждого фейкового API, с")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--tracemalloc", action="store_true", help="пик памяти Python (замедляет прогон)")
+    args = parser.parse_args()
+
+    with FakeCloud(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate) as cloud:
+        from src.project import bot as bot_module
+        import telebot
+
+        cloud.apply(bot_module)
+        bot_module.token_store = MemoryTokenStore()
+        # Лимиты Telegram здесь не меряем: их соблюдение проверяет test_outbox.
+        bot_module.outbox = Outbox(bot_module.outbox._send, global_rate=100_000, chat_rate=100_000)
+        bot_module.outbox.start()
+
+        timings = defaultdict(list)
+        lock = threading.Lock()
+        finished = threading.Semaphore(0)
+
+        def handle(update):
+            command = bot_module.update_command(update)
+            start = time.perf_counter()
+            try:
+                bot_module.process_update(update)
+            finally:
+                with lock:
+                    timings[command].append(time.perf_counter() - start)
+                finished.release()
+
+        updates = []
+        for i in range(args.users):
+            chat_id = FIRST_CHAT + i
+            bot_module.token_store.set(chat_id, "google_token", f"google-{chat_id}")
+            bot_module.token_store.set(chat_id, "todoist_token", f"todoist-{chat_id}")
+            for step, text in enumerate(session(chat_id, i)):
+                updates.append((step, chat_id, text))
+        # Чередуем пользователей, как в жизни: сообщения разных чатов перемешаны, одного — по порядку.
+        updates.sort(key=lambda item: item[0])
+
+        if args.tracemalloc:
+            tracemalloc.start()
+        dispatcher = UpdateDispatcher(handle, workers=args.workers, queue_size=len(updates))
+        dispatcher.start()
+        start = time.perf_counter()
+        for update_id, (_, chat_id, text) in enumerate(updates, start=1):
+            dispatcher.submit(telebot.types.Update.de_json(make_update(update_id, chat_id, text)))
+        for _ in updates:
+            finished.acquire()
+        elapsed = time.perf_counter() - start
+        dispatcher.stop()
+        bot_module.outbox.stop(timeout=30)
+        peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+        tracemalloc.stop()
+
+        print(f"пользователей {args.users}, апдейтов {len(updates)}, воркеров {args.workers}, "
+              f"задержка API {args.latency * 1000:.0f}±{args.jitter * 1000:.0f} ms, ошибки {args.error_rate:.0%}")
+        print(f"пропускная способность: {len(updates) / elapsed:.0f} апдейтов/с ({elapsed:.1f} s)")
+        print(f"  {'команда':<14} {'n':>6} {'p50, ms':>9} {'p99, ms':>9}")
+        for command, values in sorted(timings.items()):
+            print(f"  {command:<14} {len(values):>6} {percentile(values, 0.5) * 1000:>9.1f} "
+                  f"{percentile(values, 0.99) * 1000:>9.1f}")
+        everything = [value for values in timings.values() for value in values]
+        print(f"  {'все':<14} {len(everything):>6} {percentile(everything, 0.5) * 1000:>9.1f} "
+              f"{percentile(everything, 0.99) * 1000:>9.1f}")
+        print(f"сообщений в Telegram: {sum(cloud.telegram.messages.values())}, склеено {bot_module.outbox.coalesced}, "
+              f"не отправлено {bot_module.outbox.failed}")
+        memory = f"пик RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB"
+        if peak is not None:
+            memory += f", пик tracemalloc {peak / 2 ** 20:.1f} MiB"
+        print(memory)
+        print("фейки:")
+        print(cloud.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Бенчмарк планировщика напоминаний: 1M напоминаний в SQLite, точность срабатывания и память.
+
+Первые FIRING напоминаний назначены на ближайшие секунды, остальные — дальше; доставка
+фиктивная, лимит Telegram снят, чтобы мерить сам планировщик.
+
+Запуск: python -m src.benchmarks.bench_reminders [количество_напоминаний]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from src.project.reminders import MAX_LOADED, ReminderScheduler, ReminderStore
+
+REMINDERS = 1_000_000
+FIRING = 2_000
+FIRING_WINDOW = 5.0
+BATCH = 50_000
+
+
+class Recorder:
+    def __init__(self, expected):
+        self.jitter = []
+        self.expected = expected
+        self.done = threading.Event()
+
+    def deliver(self, chat_id, texts):
+        now = time.time()
+        self.jitter.extend(now - float(text) for text in texts)
+        if len(self.jitter) >= self.expected:
+            self.done.set()
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def bench(name, reminders, spread):
+    with tempfile.TemporaryDirectory() as directory:
+        store = ReminderStore(os.path.join(directory, "reminders.db"))
+        later = time.time() + 30 + FIRING_WINDOW
+        start = time.perf_counter()
+        for first in range(FIRING, reminders, BATCH):
+            rows = []
+            for chat_id in range(first, min(first + BATCH, reminders)):
+                due = later + random.random() * spread
+                rows.append((due, chat_id, "google:event", repr(due)))
+            store.put_many(rows)
+        start_at = time.time() + 1.0
+        firing = [start_at + random.random() * FIRING_WINDOW for _ in range(FIRING)]
+        store.put_many((due, chat_id, "todoist:task", repr(due)) for chat_id, due in enumerate(firing))
+        stored = time.perf_counter() - start
+
+        recorder = Recorder(FIRING)
+        scheduler = ReminderScheduler(store, recorder.deliver, send_rate=100_000)
+        tracemalloc.start()
+        scheduler.start()
+        recorder.done.wait(FIRING_WINDOW + 30)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        loaded = scheduler.loaded
+        scheduler.stop()
+        store.close()
+
+    jitter = [value * 1000 for value in recorder.jitter[:FIRING]]
+    print(f"{name}")
+    print(f"  запись {reminders} напоминаний: {stored:.1f} s, в памяти: {loaded} (MAX_LOADED={MAX_LOADED})")
+    print(f"  задержка срабатывания: p50 {percentile(jitter, 0.5):.2f} ms  p99 {percentile(jitter, 0.99):.2f} ms"
+          f"  max {max(jitter):.2f} ms   пик памяти планировщика {peak / 2 ** 20:.1f} MiB")
+
+
+def main():
+    reminders = int(sys.argv[1]) if len(sys.argv) > 1 else REMINDERS
+    bench("1M напоминаний на 30 дней вперед", reminders, 30 * 24 * 3600)
+    bench("1M напоминаний в пределах часа", reminders, 3000)
+
+
+if __name__ == "__main__":
+    main()
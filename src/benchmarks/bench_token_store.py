@@ -0,0 +1,48 @@
+"""Бенчмарк хранилищ токенов: пакетная запись и lookups/sec на 1M chat_id.
+
+Запуск: python -m src.benchmarks.bench_token_store [количество_чатов]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from src.project.token_store import MemoryTokenStore, RedisTokenStore, LocalRedis, SQLiteTokenStore
+
+CHATS = 1_000_000
+LOOKUPS = 500_000
+BATCH = 10_000
+
+
+def bench(name, store, chats):
+    start = time.perf_counter()
+    for first in range(0, chats, BATCH):
+        store.set_many((chat_id, "google_token", f"token-{chat_id}") for chat_id in range(first, min(first + BATCH, chats)))
+    store.flush()
+    write = time.perf_counter() - start
+
+    ids = [random.randrange(chats) for _ in range(LOOKUPS)]
+    start = time.perf_counter()
+    for chat_id in ids:
+        store.get(chat_id, "google_token")
+    lookups = time.perf_counter() - start
+    print(f"{name:<28} writes {chats / write:>10.0f}/s   lookups {LOOKUPS / lookups:>10.0f}/s")
+
+
+def main():
+    chats = int(sys.argv[1]) if len(sys.argv) > 1 else CHATS
+    bench("memory", MemoryTokenStore(), chats)
+    bench("local redis", RedisTokenStore(LocalRedis()), chats)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "tokens.db")
+        store = SQLiteTokenStore(path, cache_size=chats, batch_size=BATCH, flush_interval=0)
+        bench("sqlite, LRU fits all chats", store, chats)
+        store.close()
+        cold = SQLiteTokenStore(path, cache_size=chats // 10, batch_size=BATCH, flush_interval=0)
+        bench("sqlite, LRU 10% of chats", cold, chats)
+        cold.close()
+
+
+if __name__ == "__main__":
+    main()
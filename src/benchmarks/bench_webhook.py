@@ -0,0 +1,79 @@
+"""Стенд для режима webhook: шлет синтетические апдейты в FastAPI-приложение
+и измеряет задержку подтверждения и полную задержку до ответа обработчика.
+
+Отправка сообщений в Telegram подменяется записью времени ответа.
+
+Запуск: python -m src.benchmarks.bench_webhook
+"""
+import json
+import statistics
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from src.project import bot as bot_module
+
+CHATS = 50
+UPDATES_PER_CHAT = 10
+
+
+def make_update(update_id, chat_id, text="/start"):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "bench"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+        },
+    }
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def main():
+    sent_at = {}
+    latencies = []
+    done = threading.Semaphore(0)
+    lock = threading.Lock()
+
+    def fake_send_message(chat_id, text, **kwargs):
+        with lock:
+            latencies.append(time.perf_counter() - sent_at.pop(chat_id, time.perf_counter()))
+        done.release()
+
+    bot_module.bot.send_message = fake_send_message
+    bot_module.dispatcher.start()
+    client = TestClient(bot_module.app)
+    headers = {"X-Telegram-Bot-Api-Secret-Token": bot_module.WEBHOOK_SECRET or ""}
+
+    ack_latencies = []
+    total = CHATS * UPDATES_PER_CHAT
+    start = time.perf_counter()
+    for i in range(total):
+        chat_id = i % CHATS
+        body = json.dumps(make_update(i + 1, chat_id))
+        posted = time.perf_counter()
+        with lock:
+            sent_at[chat_id] = posted
+        response = client.post(bot_module.WEBHOOK_PATH, content=body, headers=headers)
+        ack_latencies.append(time.perf_counter() - posted)
+        assert response.status_code == 200, response.status_code
+    for _ in range(total):
+        done.acquire(timeout=10)
+    elapsed = time.perf_counter() - start
+    bot_module.dispatcher.stop()
+
+    print(f"updates: {total}, throughput: {total / elapsed:.0f} updates/s")
+    print(f"ack  p50={statistics.median(ack_latencies) * 1000:.2f} ms  p99={percentile(ack_latencies, 0.99) * 1000:.2f} ms")
+    print(f"e2e  p50={statistics.median(latencies) * 1000:.2f} ms  p99={percentile(latencies, 0.99) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
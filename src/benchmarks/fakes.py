@@ -0,0 +1,441 @@
+"""Локальные фейки внешних API для бенчмарков и нагрузочных тестов.
+
+Каждый фейк — ThreadingHTTPServer на 127.0.0.1 со случайным портом, настраиваемой
+задержкой и долей ошибок. FakeCloud поднимает все четыре и переключает на них бота.
+"""
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+# Сколько символов ответа фейковая модель генерирует за один токен.
+TOKEN_CHARS = 4
+
+
+class Stream:
+    """Тело ответа, которое отдается частями (Transfer-Encoding: chunked), по строке на часть.
+
+    Перед каждой частью — пауза delay (генерация следующего токена). written — отданные части,
+    completed — клиент дочитал поток до конца, а не закрыл соединение раньше.
+    """
+
+    def __init__(self, lines, delay=0.0):
+        self.lines = lines
+        self.delay = delay
+        self.written = 0
+        self.completed = False
+
+    def write(self, wfile):
+        try:
+            for line in self.lines:
+                if self.delay:
+                    time.sleep(self.delay)
+                data = (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+                wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                wfile.flush()
+                self.written += 1
+            wfile.write(b"0\r\n\r\n")
+            wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        self.completed = True
+
+
+class FakeService:
+    """Базовый фейковый сервер: маршруты (метод, регулярка пути) -> обработчик."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.requests = Counter()
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.routes = []
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                service.dispatch(self)
+
+            do_POST = do_DELETE = do_PATCH = do_PUT = do_GET
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def route(self, method, pattern, handler):
+        self.routes.append((method, re.compile(pattern + "$"), handler))
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def error_body(self):
+        return {"error": {"code": self.error_status, "message": "injected error"}}
+
+    def dispatch(self, request):
+        parts = urlsplit(request.path)
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length) if length else b""
+        with self.lock:
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.error_rate and self.random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        for method, pattern, handler in self.routes:
+            match = pattern.match(parts.path)
+            if method == request.command and match:
+                break
+        else:
+            return self.respond(request, 404, {"error": f"no route for {request.command} {parts.path}"})
+        with self.lock:
+            self.requests[handler.__name__] += 1
+            if fail:
+                self.errors += 1
+        if fail:
+            return self.respond(request, self.error_status, self.error_body())
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        status, payload = handler(match, query, body, request.headers)
+        self.respond(request, status, payload)
+
+    @staticmethod
+    def respond(request, status, payload):
+        if isinstance(payload, Stream):
+            request.send_response(status)
+            request.send_header("Content-Type", "application/json; charset=utf-8")
+            request.send_header("Transfer-Encoding", "chunked")
+            request.end_headers()
+            payload.write(request.wfile)
+            return
+        data = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json; charset=utf-8")
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+
+def bearer(headers):
+    return (headers.get("Authorization") or "").removeprefix("Bearer ")
+
+
+def form_or_json(body, headers):
+    if not body:
+        return {}
+    if (headers.get("Content-Type") or "").startswith("application/json"):
+        return json.loads(body)
+    return {key: values[-1] for key, values in parse_qs(body.decode("utf-8")).items()}
+
+
+class FakeYandexGPT(FakeService):
+    """Completion API: отвечает JSON в формате системного промпта, время — завтра в 10:00.
+
+    item_latency — добавка к задержке за каждый пункт ответа после первого (генерация длиннее),
+    max_concurrency — квота на одновременные запросы, сверх нее отвечает 429,
+    token_latency — время генерации одного токена (TOKEN_CHARS символов) с учетом maxTokens,
+    chatter — пояснение, которое модель дописывает после JSON.
+    С "stream": true ответ идет частями, в каждой — весь текст на данный момент, как у Yandex GPT.
+    """
+
+    def __init__(self, item_latency=0.0, max_concurrency=None, token_latency=0.0, chatter="", **options):
+        super().__init__(**options)
+        self.item_latency = item_latency
+        self.max_concurrency = max_concurrency
+        self.token_latency = token_latency
+        self.chatter = chatter
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.throttled = 0
+        self.tokens = 0
+        self.streams = []
+        self.route("POST", r"/foundationModels/v1/completion", self.completion)
+
+    def dispatch(self, request):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            throttled = self.max_concurrency is not None and self.in_flight > self.max_concurrency
+            self.throttled += throttled
+        try:
+            if throttled:
+                return self.respond(request, 429, {"error": {"code": 429, "message": "quota exceeded"}})
+            return super().dispatch(request)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def completion(self, match, query, body, headers):
+        request = json.loads(body)
+        system, user = request["messages"][0]["text"], request["messages"][-1]["text"]
+        start = (datetime.now() + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
+        end = start + timedelta(hours=1)
+
+        def item(text):
+            return {"title": text.strip(" ."), "start": start.isoformat(), "end": end.isoformat()}
+
+        if "независимых сообщений" in system:
+            answer = {number: item(text) for number, text in re.findall(r"^\[(\d+)\] (.*)$", user, re.M)}
+            items = len(answer)
+        elif "несколько пунктов" in system:
+            answer = [item(text) for text in re.split(r"\s*[,;\n]\s*", user) if text]
+            items = len(answer)
+        else:
+            answer, items = item(user), 1
+        if self.item_latency:
+            time.sleep(self.item_latency * (items - 1))
+        text = json.dumps(answer, ensure_ascii=False) + self.chatter
+        tokens = [text[i:i + TOKEN_CHARS] for i in range(0, len(text), TOKEN_CHARS)]
+        options = request.get("completionOptions", {})
+        max_tokens = int(options.get("maxTokens", len(tokens)))
+        final = "ALTERNATIVE_STATUS_TRUNCATED_FINAL" if len(tokens) > max_tokens else "ALTERNATIVE_STATUS_FINAL"
+        tokens = tokens[:max_tokens]
+        with self.lock:
+            self.tokens += len(tokens)
+
+        def alternative(count, status):
+            message = {"role": "assistant", "text": "".join(tokens[:count])}
+            return {"result": {"alternatives": [{"message": message, "status": status}]}}
+
+        if options.get("stream"):
+            stream = Stream([alternative(count, "ALTERNATIVE_STATUS_PARTIAL") for count in range(1, len(tokens))]
+                            + [alternative(len(tokens), final)], self.token_latency)
+            with self.lock:
+                self.streams.append(stream)
+            return 200, stream
+        if self.token_latency:
+            time.sleep(self.token_latency * len(tokens))
+        return 200, alternative(len(tokens), final)
+
+
+class FakeTodoist(FakeService):
+    """REST v2 (задачи, проекты) и Sync v9 (item_add и инкрементальная синхронизация)."""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.ids = itertools.count(1)
+        self.version = 0
+        self.tasks = {}
+        self.changes = {}
+        self.projects = [{"id": "1", "name": "Inbox", "child_order": 0},
+                         {"id": "2", "name": "Работа", "child_order": 1}]
+        self.route("GET", r"/rest/v2/tasks", self.list_tasks)
+        self.route("POST", r"/rest/v2/tasks", self.add_task)
+        self.route("DELETE", r"/rest/v2/tasks/(\w+)", self.delete_task)
+        self.route("GET", r"/rest/v2/projects", self.list_projects)
+        self.route("POST", r"/sync/v9/sync", self.sync)
+
+    def _put(self, token, task_id, item):
+        with self.lock:
+            self.version += 1
+            tasks = self.tasks.setdefault(token, {})
+            if item.get("is_deleted"):
+                tasks.pop(task_id, None)
+            else:
+                tasks[task_id] = item
+            self.changes.setdefault(token, []).append((self.version, item))
+
+    def _new_task(self, token, content, project_id, due_string=None):
+        task_id = str(next(self.ids))
+        due = {"string": due_string, "date": due_string[:10], "datetime": due_string} if due_string else None
+        item = {"id": task_id, "content": content, "project_id": project_id, "due": due,
+                "child_order": int(task_id), "checked": False, "is_deleted": False}
+        self._put(token, task_id, item)
+        return item
+
+    def list_tasks(self, match, query, body, headers):
+        return 200, list(self.tasks.get(bearer(headers), {}).values())
+
+    def add_task(self, match, query, body, headers):
+        data = form_or_json(body, headers)
+        return 200, self._new_task(bearer(headers), data["content"], data.get("project_id"), data.get("due_string"))
+
+    def delete_task(self, match, query, body, headers):
+        self._put(bearer(headers), match.group(1), {"id": match.group(1), "is_deleted": True})
+        return 204, None
+
+    def list_projects(self, match, query, body, headers):
+        return 200, self.projects
+
+    def sync(self, match, query, body, headers):
+        token = bearer(headers)
+        data = form_or_json(body, headers)
+        if "commands" in data:
+            status, mapping = {}, {}
+            for command in data["commands"]:
+                args = command["args"]
+                due = args.get("due", {}).get("string") if args.get("due") else None
+                item = self._new_task(token, args["content"], args.get("project_id"), due)
+                status[command["uuid"]] = "ok"
+                mapping[command["temp_id"]] = item["id"]
+            return 200, {"sync_status": status, "temp_id_mapping": mapping}
+        with self.lock:
+            version = self.version
+            if data.get("sync_token", "*") == "*":
+                return 200, {"full_sync": True, "sync_token": str(version), "projects": self.projects,
+                             "items": list(self.tasks.get(token, {}).values())}
+            since = int(data["sync_token"])
+            items = {item["id"]: item for changed, item in self.changes.get(token, []) if changed > since}
+        return 200, {"full_sync": False, "sync_token": str(version), "projects": [], "items": list(items.values())}
+
+
+class FakeGoogleCalendar(FakeService):
+    """Calendar v3: events.list (pageToken, syncToken, timeMin), insert и delete."""
+
+    EVENTS = r"/calendar/v3/calendars/primary/events"
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.version = 0
+        self.events = {}
+        self.changes = {}
+        self.route("GET", self.EVENTS, self.list_events)
+        self.route("POST", self.EVENTS, self.insert)
+        self.route("DELETE", self.EVENTS + r"/([\w-]+)", self.delete)
+
+    @property
+    def api_endpoint(self):
+        return self.url + "/calendar/v3/"
+
+    def _put(self, token, event):
+        with self.lock:
+            self.version += 1
+            events = self.events.setdefault(token, {})
+            if event["status"] == "cancelled":
+                events.pop(event["id"], None)
+            else:
+                events[event["id"]] = event
+            self.changes.setdefault(token, {})[event["id"]] = (self.version, event)
+
+    def list_events(self, match, query, body, headers):
+        token = bearer(headers)
+        with self.lock:
+            if "syncToken" in query:
+                since = int(query["syncToken"])
+                items = [event for version, event in self.changes.get(token, {}).values() if version > since]
+            else:
+                items = list(self.events.get(token, {}).values())
+            version = self.version
+        if "timeMin" in query:
+            time_min = datetime.fromisoformat(query["timeMin"].replace("Z", "+00:00"))
+            items = [event for event in items if datetime.fromisoformat(event["end"]["dateTime"]) > time_min]
+        if query.get("orderBy") == "startTime":
+            items.sort(key=lambda event: datetime.fromisoformat(event["start"]["dateTime"]))
+        offset = int(query.get("pageToken") or 0)
+        size = int(query.get("maxResults") or 250)
+        result = {"kind": "calendar#events", "items": items[offset:offset + size]}
+        if offset + size < len(items):
+            result["nextPageToken"] = str(offset + size)
+        else:
+            result["nextSyncToken"] = str(version)
+        return 200, result
+
+    def insert(self, match, query, body, headers):
+        event = json.loads(body)
+        for edge in ("start", "end"):
+            moment = datetime.fromisoformat(event[edge]["dateTime"])
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=timezone(timedelta(hours=3)))
+            event[edge] = {"dateTime": moment.isoformat()}
+        event.update(id=uuid.uuid4().hex, status="confirmed", kind="calendar#event")
+        self._put(bearer(headers), event)
+        return 200, event
+
+    def delete(self, match, query, body, headers):
+        self._put(bearer(headers), {"id": match.group(1), "status": "cancelled"})
+        return 204, None
+
+
+class FakeTelegram(FakeService):
+    """Bot API: sendMessage, editMessageText, answerCallbackQuery и управление webhook."""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.message_ids = itertools.count(1)
+        self.messages = Counter()
+        self.route("POST", r"/bot[^/]+/(\w+)", self.method)
+        self.route("GET", r"/bot[^/]+/(\w+)", self.method)
+
+    def error_body(self):
+        return {"ok": False, "error_code": self.error_status, "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1}}
+
+    def method(self, match, query, body, headers):
+        name = match.group(1)
+        params = {**query, **form_or_json(body, headers)}
+        if name in ("sendMessage", "editMessageText"):
+            chat_id = int(params.get("chat_id", 0))
+            with self.lock:
+                self.messages[chat_id] += 1
+            message_id = int(params.get("message_id") or next(self.message_ids))
+            result = {"message_id": message_id, "date": int(time.time()), "text": params.get("text", ""),
+                      "chat": {"id": chat_id, "type": "private"}}
+        elif name == "getUpdates":
+            result = []
+        else:
+            result = True
+        return 200, {"ok": True, "result": result}
+
+
+class FakeCloud:
+    """Все четыре фейка разом. apply() переключает на них модуль бота."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        options = {"latency": latency, "jitter": jitter, "error_rate": error_rate, "seed": seed}
+        self.yandex = FakeYandexGPT(**options)
+        self.todoist = FakeTodoist(**options)
+        self.google = FakeGoogleCalendar(**options)
+        self.telegram = FakeTelegram(**{**options, "error_status": 429})
+        self.services = (self.yandex, self.todoist, self.google, self.telegram)
+
+    def __enter__(self):
+        for service in self.services:
+            service.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        for service in self.services:
+            service.stop()
+
+    def apply(self, bot_module):
+        import telebot
+
+        from src.project.api import googleapi, todoistapi
+
+        telebot.apihelper.API_URL = self.telegram.url + "/bot{0}/{1}"
+        todoistapi.configure(self.todoist.url)
+        googleapi.configure(self.google.api_endpoint)
+        bot_module.YANDEX_API_URL = self.yandex.url + "/foundationModels/v1/completion"
+
+    def report(self):
+        lines = []
+        for service in self.services:
+            total = sum(service.requests.values())
+            calls = ", ".join(f"{name} {count}" for name, count in service.requests.most_common())
+            lines.append(f"  {type(service).__name__:<20} запросов {total:>6}, ошибок {service.errors:>4}  ({calls})")
+        return "\n".join(lines)
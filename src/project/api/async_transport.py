@@ -0,0 +1,85 @@
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from src.project.api import transport
+
+BLOCKING_WORKERS = 16
+MAX_KEEPALIVE_CONNECTIONS = 16
+# asyncio и httpx нужны только FastAPI-колбэкам, поэтому импортируются внутри функций.
+
+_clients = weakref.WeakKeyDictionary()
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking-io")
+
+
+def _create_client():
+    import httpx
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(transport.READ_TIMEOUT, connect=transport.CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=transport.POOL_MAXSIZE * transport.POOL_CONNECTIONS,
+                            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS),
+    )
+
+
+def get_client():
+    """Возвращает общий httpx.AsyncClient текущего event loop (соединения переиспользуются)."""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _create_client()
+        _clients[loop] = client
+    return client
+
+
+async def aclose():
+    """Закрывает клиент текущего event loop."""
+    import asyncio
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def request(method, url, **kwargs):
+    """Асинхронный аналог transport.request: те же таймауты и повторы на 429/5xx."""
+    import asyncio
+    import httpx
+    client = get_client()
+    retry_statuses = transport.NON_IDEMPOTENT_RETRY_STATUSES if method == "POST" else transport.RETRY_STATUSES
+    for attempt in range(transport.RETRY_TOTAL + 1):
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.ConnectError:
+            if attempt == transport.RETRY_TOTAL:
+                raise
+            response = None
+        else:
+            if response.status_code not in retry_statuses or attempt == transport.RETRY_TOTAL:
+                return response
+        await asyncio.sleep(_retry_delay(attempt, response))
+
+
+def _retry_delay(attempt, response):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return int(retry_after)
+    return transport.RETRY_BACKOFF_FACTOR * (2 ** attempt)
+
+
+async def get(url, **kwargs):
+    return await request("GET", url, **kwargs)
+
+
+async def post(url, **kwargs):
+    return await request("POST", url, **kwargs)
+
+
+async def delete(url, **kwargs):
+    return await request("DELETE", url, **kwargs)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Выполняет блокирующий вызов (например, Google SDK) в ограниченном пуле потоков."""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
@@ -0,0 +1,199 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+from src.project import metrics, singleflight
+from src.project.api import googleapi, transport
+
+MAX_USERS = 10_000
+MAX_EVENTS_PER_USER = 5_000
+FRESH_FOR = 30
+PAGE_SIZE = 2500
+# События, закончившиеся раньше этого, удаляются из кэша.
+KEEP_PAST = timedelta(days=1)
+# Насколько раньше «сейчас» ищем начавшиеся, но еще идущие события.
+ONGOING_LOOKBACK = timedelta(days=1)
+HTTP_GONE = 410
+
+
+def event_time(value):
+    """Время начала/конца события Google (dateTime или date для событий на весь день) в UTC."""
+    if "dateTime" in value:
+        moment = datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00"))
+    else:
+        moment = datetime.fromisoformat(value["date"])
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+class CalendarCache:
+    """Кэш событий основного календаря одного пользователя с инкрементальной синхронизацией
+    через syncToken и индексом по времени начала."""
+
+    def __init__(self, max_events=MAX_EVENTS_PER_USER):
+        self.max_events = max_events
+        self.sync_token = None
+        self.events = {}
+        self._index = []
+        self.synced_at = None
+        self.full_syncs = 0
+        self.incremental_syncs = 0
+        self.lock = threading.Lock()
+
+    def is_fresh(self, fresh_for):
+        return self.synced_at is not None and time.monotonic() - self.synced_at < fresh_for
+
+    def invalidate(self):
+        self.synced_at = None
+
+    @metrics.timed(metrics.API_LATENCY, service="google", operation="sync")
+    def sync(self, service):
+        """Забирает изменения с прошлой синхронизации; при 410 Gone делает полную."""
+        from googleapiclient.errors import HttpError
+        try:
+            self._sync(service)
+        except HttpError as e:
+            if e.resp.status != HTTP_GONE:
+                raise
+            self.sync_token = None
+            self._sync(service)
+
+    def _sync(self, service):
+        full = self.sync_token is None
+        params = {"calendarId": "primary", "singleEvents": True, "maxResults": PAGE_SIZE}
+        if full:
+            self.events = {}
+            self._index = []
+        else:
+            params["syncToken"] = self.sync_token
+        page_token = None
+        while True:
+            result = service.events().list(pageToken=page_token, **params).execute(num_retries=transport.RETRY_TOTAL)
+            for event in result.get("items", []):
+                self._apply(event)
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                break
+        self.sync_token = result.get("nextSyncToken")
+        self.synced_at = time.monotonic()
+        if full:
+            self.full_syncs += 1
+        else:
+            self.incremental_syncs += 1
+        self._trim()
+
+    def _apply(self, event):
+        self.remove(event["id"])
+        if event.get("status") != "cancelled" and "start" in event:
+            self.events[event["id"]] = event
+            bisect.insort(self._index, (event_time(event["start"]), event["id"]))
+
+    def _trim(self):
+        """Выбрасывает давно закончившиеся события и самые дальние, если событий слишком много."""
+        horizon = datetime.now(timezone.utc) - KEEP_PAST
+        position = bisect.bisect_left(self._index, (horizon, ""))
+        finished = [entry for entry in self._index[:position] if event_time(self.events[entry[1]]["end"]) < horizon]
+        for entry in finished:
+            self.remove(entry[1])
+        for _, event_id in self._index[self.max_events:]:
+            del self.events[event_id]
+        del self._index[self.max_events:]
+
+    def add(self, event):
+        """Добавляет созданное нами событие, не дожидаясь синхронизации."""
+        self._apply(event)
+        self._trim()
+
+    def remove(self, event_id):
+        event = self.events.pop(event_id, None)
+        if event is not None:
+            position = bisect.bisect_left(self._index, (event_time(event["start"]), event_id))
+            del self._index[position]
+
+    def iter_upcoming(self, now=None):
+        """События, которые еще не закончились (как events.list с timeMin=now), по времени начала."""
+        now = now or datetime.now(timezone.utc)
+        position = bisect.bisect_left(self._index, (now - ONGOING_LOOKBACK, ""))
+        for _, event_id in self._index[position:]:
+            event = self.events[event_id]
+            if event_time(event["end"]) > now:
+                yield event
+
+    def upcoming(self, now=None, limit=10, offset=0):
+        return list(islice(self.iter_upcoming(now), offset, offset + limit))
+
+
+class CalendarCaches:
+    """Кэши календарей по пользователям (LRU по токену)."""
+
+    def __init__(self, max_users=MAX_USERS, fresh_for=FRESH_FOR):
+        self.max_users = max_users
+        self.fresh_for = fresh_for
+        self._caches = OrderedDict()
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.upstream_syncs = 0
+
+    @property
+    def avoided_calls(self):
+        """Сколько чтений обслужено без обращения к Google."""
+        return self.reads - self.upstream_syncs
+
+    def _cache(self, token):
+        with self._lock:
+            cache = self._caches.get(token)
+            if cache is None:
+                cache = CalendarCache()
+                self._caches[token] = cache
+            self._caches.move_to_end(token)
+            while len(self._caches) > self.max_users:
+                self._caches.popitem(last=False)
+            return cache
+
+    def _sync(self, token, cache):
+        with cache.lock:
+            if cache.is_fresh(self.fresh_for):
+                return
+            with self._lock:
+                self.upstream_syncs += 1
+            cache.sync(googleapi.get_google_service(token))
+
+    def upcoming(self, token, limit=10, offset=0):
+        """Ближайшие события пользователя; в сеть идет только инкрементальная синхронизация."""
+        cache = self._cache(token)
+        with self._lock:
+            self.reads += 1
+        if not cache.is_fresh(self.fresh_for):
+            # Вне блокировки кэша: одновременные чтения присоединяются к одной синхронизации.
+            singleflight.reads.do(("google.sync", token), self._sync, token, cache)
+        with cache.lock:
+            return cache.upcoming(limit=limit, offset=offset)
+
+    def event_created(self, token, event):
+        """Вызывается после наших собственных изменений, чтобы список сразу был актуален."""
+        cache = self._cache(token)
+        with cache.lock:
+            if cache.sync_token is not None:
+                cache.add(event)
+
+    def event_deleted(self, token, event_id):
+        cache = self._cache(token)
+        with cache.lock:
+            cache.remove(event_id)
+
+    def rename(self, old_token, new_token):
+        """Переносит кэш на обновленный access token, чтобы не синхронизировать календарь заново."""
+        with self._lock:
+            cache = self._caches.pop(old_token, None)
+            if cache is not None:
+                self._caches[new_token] = cache
+
+    def invalidate(self, token):
+        with self._lock:
+            cache = self._caches.get(token)
+        if cache is not None:
+            cache.invalidate()
@@ -1,18 +1,96 @@
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from src.project.api import transport
+from src.project import metrics
+from collections import OrderedDict
 from datetime import datetime, timezone, timedelta
+import json
+import threading
+import time
 
+SERVICE_CACHE_SIZE = 1024
+SERVICE_CACHE_TTL = 3600
+# Клиент Google (googleapiclient, google.auth, httplib2) тяжелый, поэтому импортируется при первом обращении к API.
+# None — стандартный https://www.googleapis.com/; можно подменить, например, на локальный фейк.
+API_ENDPOINT = None
+# Часовой пояс повторяющихся событий: без него Google не разворачивает RRULE (смещение то же, что в
+# parse_datetime_to_iso).
+TIME_ZONE = "Europe/Moscow"
 
-def get_google_service(token):
-    """Создает объект сервиса Google Calendar."""
+_discovery_document = None
+_service_cache = OrderedDict()
+_service_cache_lock = threading.Lock()
+_thread_local = threading.local()
+
+
+def get_discovery_document():
+    """Возвращает разобранный discovery-документ Calendar v3 (читается один раз)."""
+    global _discovery_document
+    if _discovery_document is None:
+        from googleapiclient.discovery_cache import get_static_doc
+        _discovery_document = json.loads(get_static_doc('calendar', 'v3'))
+    return _discovery_document
+
+
+def _get_thread_http():
+    """httplib2.Http не потокобезопасен, поэтому держим по одному keep-alive соединению на поток."""
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        import httplib2
+        http = httplib2.Http(timeout=transport.READ_TIMEOUT)
+        _thread_local.http = http
+    return http
+
+
+def _build_request(http, *args, **kwargs):
+    from google_auth_httplib2 import AuthorizedHttp
+    from googleapiclient.http import HttpRequest
+    return HttpRequest(AuthorizedHttp(http.credentials, http=_get_thread_http()), *args, **kwargs)
+
+
+def configure(api_endpoint):
+    """Меняет адрес Calendar API. Закэшированные сервисы сбрасываются."""
+    global API_ENDPOINT
+    API_ENDPOINT = api_endpoint
+    with _service_cache_lock:
+        _service_cache.clear()
+
+
+def build_google_service(token):
+    """Создает новый объект сервиса Google Calendar без обращения к кэшу."""
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build_from_document
     credentials = Credentials(token)
-    service = build('calendar', 'v3', credentials=credentials)
+    client_options = {"api_endpoint": API_ENDPOINT} if API_ENDPOINT else None
+    return build_from_document(get_discovery_document(), credentials=credentials, requestBuilder=_build_request,
+                               client_options=client_options)
+
+
+def get_google_service(token):
+    """Возвращает объект сервиса Google Calendar из кэша или создает новый."""
+    now = time.monotonic()
+    with _service_cache_lock:
+        cached = _service_cache.get(token)
+        if cached is not None and now - cached[1] < SERVICE_CACHE_TTL:
+            _service_cache.move_to_end(token)
+            return cached[0]
+
+    service = build_google_service(token)
+    with _service_cache_lock:
+        _service_cache[token] = (service, now)
+        _service_cache.move_to_end(token)
+        while len(_service_cache) > SERVICE_CACHE_SIZE:
+            _service_cache.popitem(last=False)
     return service
 
 
-def create_google_event(token, summary, start_time, end_time):
-    service = get_google_service(token)
-    event = {
+def invalidate_google_service(token):
+    """Удаляет сервис для токена из кэша (например, при замене токена)."""
+    with _service_cache_lock:
+        _service_cache.pop(token, None)
+
+
+def event_body(summary, start_time, end_time, recurrence=None):
+    """Тело события; recurrence — строка RRULE, тогда Google сам разворачивает повторения."""
+    body = {
         'summary': summary,
         'start': {
             'dateTime': start_time,
@@ -21,25 +99,60 @@ def create_google_event(token, summary, start_time, end_time):
             'dateTime': end_time,
         },
     }
+    if recurrence:
+        body['start']['timeZone'] = body['end']['timeZone'] = TIME_ZONE
+        body['recurrence'] = [recurrence]
+    return body
+
+
+@metrics.timed(metrics.API_LATENCY, service="google", operation="create_event")
+def create_google_event(token, summary, start_time, end_time, recurrence=None):
+    service = get_google_service(token)
+    event = event_body(summary, start_time, end_time, recurrence)
     event_result = service.events().insert(calendarId='primary', body=event).execute()
     return event_result
 
 
-def list_google_events(token):
+@metrics.timed(metrics.API_LATENCY, service="google", operation="create_events_batch")
+def create_google_events_batch(token, events):
+    """Создает несколько событий одним batch-запросом.
+
+    events — список (summary, start_time, end_time[, recurrence]). Возвращает список той же длины:
+    созданное событие либо {"error": ...}; ошибка одного события не мешает остальным.
+    """
+    service = get_google_service(token)
+    results = [None] * len(events)
+
+    def callback(request_id, response, exception):
+        results[int(request_id)] = {"error": str(exception)} if exception is not None else response
+
+    batch = service.new_batch_http_request(callback=callback)
+    for idx, event in enumerate(events):
+        batch.add(service.events().insert(calendarId='primary', body=event_body(*event)), request_id=str(idx))
+    try:
+        batch.execute()
+    except Exception as e:
+        results = [result if result is not None else {"error": str(e)} for result in results]
+    return results
+
+
+@metrics.timed(metrics.API_LATENCY, service="google", operation="list_events")
+def list_google_events(token, limit=10):
+    """Одна страница ближайших событий. Бот листает события по снимку CalendarCaches, а не этим запросом."""
     service = get_google_service(token)
     now = datetime.utcnow().isoformat() + 'Z'
     events_result = service.events().list(
         calendarId='primary', timeMin=now,
-        maxResults=10, singleEvents=True,
+        maxResults=limit, singleEvents=True,
         orderBy='startTime'
-    ).execute()
-    events = events_result.get('items', [])
-    return events
+    ).execute(num_retries=transport.RETRY_TOTAL)
+    return events_result.get('items', [])
 
 
+@metrics.timed(metrics.API_LATENCY, service="google", operation="delete_event")
 def delete_google_event(token, event_id):
     service = get_google_service(token)
-    service.events().delete(calendarId='primary', eventId=event_id).execute()
+    service.events().delete(calendarId='primary', eventId=event_id).execute(num_retries=transport.RETRY_TOTAL)
     return True
 
 
@@ -0,0 +1,142 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from src.project import metrics, singleflight
+from src.project.api import todoistapi, transport
+
+MAX_USERS = 10_000
+MAX_ITEMS_PER_USER = 5_000
+FRESH_FOR = 30
+RESOURCE_TYPES = json.dumps(["items", "projects"])
+
+
+class TodoistMirror:
+    """Локальная копия задач и проектов одного пользователя, обновляемая через sync_token."""
+
+    def __init__(self, token, max_items=MAX_ITEMS_PER_USER):
+        self.token = token
+        self.max_items = max_items
+        self.sync_token = "*"
+        self.items = {}
+        self.projects = {}
+        self.synced_at = None
+        self.overflow = False
+        self.lock = threading.Lock()
+
+    def is_fresh(self, fresh_for):
+        return self.synced_at is not None and time.monotonic() - self.synced_at < fresh_for
+
+    def invalidate(self):
+        self.synced_at = None
+
+    @metrics.timed(metrics.API_LATENCY, service="todoist", operation="sync")
+    def sync(self):
+        """Инкрементальная синхронизация. Возвращает None или {"error": ...}."""
+        response = transport.post(
+            todoistapi.SYNC_URL,
+            data={"sync_token": self.sync_token, "resource_types": RESOURCE_TYPES},
+            headers=todoistapi.auth_headers(self.token),
+        )
+        if response.status_code != 200:
+            return {"error": response.text}
+        self.apply(response.json())
+        return None
+
+    def apply(self, result):
+        if result.get("full_sync"):
+            self.items = {}
+            self.projects = {}
+        for item in result.get("items", []):
+            if item.get("is_deleted") or item.get("checked"):
+                self.items.pop(item["id"], None)
+            else:
+                self.items[item["id"]] = item
+        for project in result.get("projects", []):
+            if project.get("is_deleted") or project.get("is_archived"):
+                self.projects.pop(project["id"], None)
+            else:
+                self.projects[project["id"]] = project
+        self.sync_token = result.get("sync_token", self.sync_token)
+        self.synced_at = time.monotonic()
+        if len(self.items) > self.max_items:
+            # Не держим в памяти слишком большие аккаунты: дальше читаем их напрямую из REST API.
+            self.overflow = True
+            self.items = {}
+            self.projects = {}
+
+    def tasks(self):
+        return sorted(self.items.values(), key=lambda item: (item.get("child_order", 0), item["id"]))
+
+    def project_list(self):
+        return sorted(self.projects.values(), key=lambda project: (project.get("child_order", 0), project["id"]))
+
+
+class TodoistMirrors:
+    """Зеркала Todoist по пользователям (LRU по токену) со счетчиками обращений к API."""
+
+    def __init__(self, max_users=MAX_USERS, max_items_per_user=MAX_ITEMS_PER_USER, fresh_for=FRESH_FOR):
+        self.max_users = max_users
+        self.max_items_per_user = max_items_per_user
+        self.fresh_for = fresh_for
+        self._mirrors = OrderedDict()
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.upstream_calls = 0
+
+    @property
+    def avoided_calls(self):
+        """Сколько чтений обслужено без обращения к Todoist."""
+        return self.reads - self.upstream_calls
+
+    def _count_upstream(self):
+        with self._lock:
+            self.upstream_calls += 1
+
+    def _mirror(self, token):
+        with self._lock:
+            self.reads += 1
+            mirror = self._mirrors.get(token)
+            if mirror is None:
+                mirror = TodoistMirror(token, self.max_items_per_user)
+                self._mirrors[token] = mirror
+            self._mirrors.move_to_end(token)
+            while len(self._mirrors) > self.max_users:
+                self._mirrors.popitem(last=False)
+            return mirror
+
+    def _sync(self, mirror):
+        with mirror.lock:
+            if mirror.overflow or mirror.is_fresh(self.fresh_for):
+                return None
+            self._count_upstream()
+            return mirror.sync()
+
+    def _read(self, token, getter, fallback):
+        mirror = self._mirror(token)
+        if not mirror.overflow and not mirror.is_fresh(self.fresh_for):
+            # Вне блокировки зеркала: одновременные чтения присоединяются к одной синхронизации.
+            error = singleflight.reads.do(("todoist.sync", token), self._sync, mirror)
+            if error is not None:
+                return error
+        with mirror.lock:
+            if mirror.overflow:
+                self._count_upstream()
+                return fallback(token)
+            return getter(mirror)
+
+    def get_tasks(self, token):
+        """Активные задачи пользователя (как GET /rest/v2/tasks)."""
+        return self._read(token, TodoistMirror.tasks, todoistapi.get_todoist_tasks)
+
+    def get_projects(self, token):
+        """Проекты пользователя (как GET /rest/v2/projects)."""
+        return self._read(token, TodoistMirror.project_list, todoistapi.get_todoist_projects)
+
+    def invalidate(self, token):
+        """Вызывается после наших собственных изменений: следующее чтение сделает инкрементальный sync."""
+        with self._lock:
+            mirror = self._mirrors.get(token)
+        if mirror is not None:
+            mirror.invalidate()
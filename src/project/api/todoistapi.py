@@ -1,32 +1,94 @@
-import requests
+import uuid
 
+from src.project.api import transport
+from src.project import metrics
 
-def create_task_in_project(token, task_content, project_id, due_string=None):
-    url = "https://api.todoist.com/rest/v2/tasks"
-    headers = {
+API_URL = "https://api.todoist.com"
+TASKS_URL = f"{API_URL}/rest/v2/tasks"
+PROJECTS_URL = f"{API_URL}/rest/v2/projects"
+SYNC_URL = f"{API_URL}/sync/v9/sync"
+
+
+def configure(api_url):
+    """Меняет адрес Todoist API (например, на локальный фейк)."""
+    global API_URL, TASKS_URL, PROJECTS_URL, SYNC_URL
+    API_URL = api_url.rstrip("/")
+    TASKS_URL = f"{API_URL}/rest/v2/tasks"
+    PROJECTS_URL = f"{API_URL}/rest/v2/projects"
+    SYNC_URL = f"{API_URL}/sync/v9/sync"
+
+
+def auth_headers(token):
+    return {
         "Authorization": f"Bearer {token}"
     }
+
+
+def json_or_error(response, *ok_statuses):
+    if response.status_code in ok_statuses:
+        return response.json()
+    else:
+        return {"error": response.text}
+
+
+def task_request_data(task_content, project_id, due_string=None, due_lang=None):
     data = {
         "content": task_content,
         "project_id": project_id
     }
     if due_string:
         data["due_string"] = due_string
-    response = requests.post(url, json=data, headers=headers)
-    if response.status_code == 200 or response.status_code == 204:
-        return response.json()
-    else:
-        return {"error": response.text}
+        if due_lang:
+            data["due_lang"] = due_lang
+    return data
 
 
+@metrics.timed(metrics.API_LATENCY, service="todoist", operation="create_task")
+def create_task_in_project(token, task_content, project_id, due_string=None, due_lang=None):
+    data = task_request_data(task_content, project_id, due_string, due_lang)
+    response = transport.post(TASKS_URL, json=data, headers=auth_headers(token))
+    return json_or_error(response, 200, 204)
+
+
+@metrics.timed(metrics.API_LATENCY, service="todoist", operation="list_tasks")
+def get_todoist_tasks(token):
+    """Получает список всех активных задач из REST API."""
+    response = transport.get(TASKS_URL, headers=auth_headers(token))
+    return json_or_error(response, 200)
+
+
+@metrics.timed(metrics.API_LATENCY, service="todoist", operation="list_projects")
 def get_todoist_projects(token):
-    url = "https://api.todoist.com/rest/v2/projects"
-    headers = {
-        "Authorization": f"Bearer {token}"
-    }
-    response = requests.get(url, headers=headers)
+    response = transport.get(PROJECTS_URL, headers=auth_headers(token))
+    return json_or_error(response, 200)
 
-    if response.status_code == 200:
-        return response.json()
-    else:
-        return {"error": response.text}
+
+@metrics.timed(metrics.API_LATENCY, service="todoist", operation="create_tasks_batch")
+def create_tasks_batch(token, tasks, project_id, due_lang=None):
+    """Создает несколько задач одним запросом Sync API.
+
+    tasks — список (название, due_string или None); due_lang — язык всех due_string. Возвращает список той же длины:
+    для каждой задачи {"id": ...} либо {"error": ...}.
+    """
+    commands = []
+    for task_content, due_string in tasks:
+        args = {"content": task_content, "project_id": project_id}
+        if due_string:
+            args["due"] = {"string": due_string, "lang": due_lang} if due_lang else {"string": due_string}
+        commands.append({"type": "item_add", "temp_id": str(uuid.uuid4()), "uuid": str(uuid.uuid4()), "args": args})
+
+    response = transport.post(SYNC_URL, json={"commands": commands}, headers=auth_headers(token))
+    if response.status_code != 200:
+        return [{"error": response.text}] * len(commands)
+
+    result = response.json()
+    sync_status = result.get("sync_status", {})
+    temp_id_mapping = result.get("temp_id_mapping", {})
+    created = []
+    for command in commands:
+        status = sync_status.get(command["uuid"])
+        if status == "ok":
+            created.append({"id": temp_id_mapping.get(command["temp_id"])})
+        else:
+            created.append({"error": status.get("error", str(status)) if isinstance(status, dict) else str(status)})
+    return created
@@ -0,0 +1,107 @@
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 30
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Запросы, создающие объекты, повторяем только если сервер точно их не обработал.
+NON_IDEMPOTENT_RETRY_STATUSES = (429, 503)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class _Retry(Retry):
+    """Retry, который не повторяет POST на 5xx, чтобы не создать дубликаты."""
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method == "POST" and status_code not in NON_IDEMPOTENT_RETRY_STATUSES:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def configure(pool_connections=None, pool_maxsize=None, connect_timeout=None, read_timeout=None, retries=None,
+              backoff_factor=None):
+    """Меняет параметры транспорта. Уже созданные сессии закрываются."""
+    global POOL_CONNECTIONS, POOL_MAXSIZE, CONNECT_TIMEOUT, READ_TIMEOUT, RETRY_TOTAL, RETRY_BACKOFF_FACTOR
+    if pool_connections is not None:
+        POOL_CONNECTIONS = pool_connections
+    if pool_maxsize is not None:
+        POOL_MAXSIZE = pool_maxsize
+    if connect_timeout is not None:
+        CONNECT_TIMEOUT = connect_timeout
+    if read_timeout is not None:
+        READ_TIMEOUT = read_timeout
+    if retries is not None:
+        RETRY_TOTAL = retries
+    if backoff_factor is not None:
+        RETRY_BACKOFF_FACTOR = backoff_factor
+    close_sessions()
+
+
+def _create_session():
+    retry = _Retry(
+        total=RETRY_TOTAL,
+        connect=RETRY_TOTAL,
+        read=0,
+        status=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(url):
+    """Возвращает общую keep-alive сессию для хоста из url."""
+    parts = urlsplit(url)
+    key = (parts.scheme, parts.netloc)
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = _create_session()
+                _sessions[key] = session
+    return session
+
+
+def close_sessions():
+    """Закрывает все сессии и их пулы соединений."""
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+def request(method, url, **kwargs):
+    """Выполняет HTTP-запрос через пул соединений хоста с таймаутами и повторами."""
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    return get_session(url).request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def delete(url, **kwargs):
+    return request("DELETE", url, **kwargs)
@@ -1,52 +1,339 @@
-from datetime import datetime, timedelta
-from src.project.api import googleapi, todoistapi
-import telebot
+from datetime import datetime, timedelta, timezone
+from src.project.api import async_transport, googleapi, todoistapi, transport
+from src.project.api.google_sync import CalendarCaches, event_time
+from src.project.api.todoist_sync import TodoistMirrors
+from src.project.conversations import create_conversation_store
+from src.project.google_tokens import GoogleCredentialStore, GoogleTokenRefresher
+from src.project.dispatcher import SHUTDOWN_TIMEOUT, ProcessDispatcher, UpdateDispatcher, run_polling, serve_process
+from src.project.llm_batcher import LLMBatcher
+from src.project.llm_cache import LLMCache
+from src.project.outbox import GLOBAL_RATE, Outbox
+from src.project.dateparse import convert_relative_to_iso
+from src.project import fast_parser, listing, llm_answer, metrics, recurrence, singleflight
+from src.project.progress import PLACEHOLDER, ProgressMessage
+from src.project.reminders import ReminderScheduler, ReminderStore
+from src.project.token_store import create_token_store
 import urllib.parse
+import contextlib
+import functools
+import hashlib
+import hmac
 import re
-import requests
-from fastapi import FastAPI, Request
+from itertools import islice
 import threading
-import uvicorn
 import json
+import logging
 import signal
+import time
+import config
 from config import BOT_TOKEN, REDIRECT_URI, GOOGLE_CLIENT_ID, TODOIST_CLIENT_ID, GOOGLE_CLIENT_SECRET, TODOIST_CLIENT_SECRET, YANDEX_IAM_TOKEN
 
 from const import (
-    HTTP_OK,
     HTTP_NO_CONTENT,
     MODEL_URI,
     DEFAULT_COMPLETION_OPTIONS,
+    EXTRACTION_MAX_TOKENS,
     SYSTEM_MESSAGE_GOOGLE,
+    SYSTEM_MESSAGE_GOOGLE_BATCH,
+    SYSTEM_MESSAGE_GOOGLE_MULTI,
     SYSTEM_MESSAGE_TODOIST,
-    DELTA_TOMORROW,
-    DELTA_AFTER_TOMORROW,
-    WEEKDAY_R,
-    DAYS_IN_WEEK,
-    MONTH_R,
-    DATE_R,
-    MONTH_MAP,
-    TIME_R
+    SYSTEM_MESSAGE_TODOIST_BATCH,
+    SYSTEM_MESSAGE_TODOIST_MULTI,
 )
 
 
-bot = telebot.TeleBot(BOT_TOKEN)
-user_data = {}
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+WEBHOOK_URL = getattr(config, "WEBHOOK_URL", None)
+WEBHOOK_SECRET = getattr(config, "WEBHOOK_SECRET", None)
+WEBHOOK_PATH = "/telegram/webhook"
+TOKEN_STORE_URL = getattr(config, "TOKEN_STORE_URL", "sqlite:///tokens.db")
+LLM_CACHE_PATH = getattr(config, "LLM_CACHE_PATH", None)
+REMINDERS_PATH = getattr(config, "REMINDERS_PATH", "reminders.db")
+CONVERSATION_STORE_URL = getattr(config, "CONVERSATION_STORE_URL", "sqlite:///conversations.db")
+GOOGLE_CREDENTIALS_PATH = getattr(config, "GOOGLE_CREDENTIALS_PATH", "google_credentials.db")
+# Больше 1 — апдейты обрабатывают процессы-воркеры (по чату на процесс), см. use_worker_processes.
+WORKER_PROCESSES = getattr(config, "WORKER_PROCESSES", 1)
+# Адреса внешних API можно переопределить в config (например, на локальные фейки из src/benchmarks/fakes.py).
+TELEGRAM_API_URL = getattr(config, "TELEGRAM_API_URL", None)
+TODOIST_API_URL = getattr(config, "TODOIST_API_URL", None)
+GOOGLE_API_ENDPOINT = getattr(config, "GOOGLE_API_ENDPOINT", None)
+
+
+# ======== Ленивые объекты приложения ========
+# TeleBot, FastAPI-приложение, хранилища, планировщик напоминаний, очередь сообщений, диспетчер
+# апдейтов и объекты LLM создаются при первом обращении: импорт модуля не тянет тяжелые библиотеки,
+# не открывает базы и не ставит обработчики сигналов. Объект можно подменить присваиванием атрибута
+# модуля (bot_module.token_store = ...).
+_lazy_lock = threading.RLock()
+
+
+def _lazy(name, factory):
+    value = globals().get(name)
+    if value is None:
+        with _lazy_lock:
+            value = globals().get(name)
+            if value is None:
+                value = globals()[name] = factory()
+    return value
+
+
+def get_bot():
+    return _lazy("bot", create_bot)
+
+
+def get_app():
+    return _lazy("app", create_app)
+
+
+def get_token_store():
+    return _lazy("token_store", lambda: create_token_store(TOKEN_STORE_URL))
+
+
+def get_reminders():
+    return _lazy("reminders", lambda: ReminderScheduler(ReminderStore(REMINDERS_PATH), send_reminder))
+
+
+def get_conversations():
+    return _lazy("conversations", lambda: create_conversation_store(CONVERSATION_STORE_URL))
+
+
+def get_google_tokens():
+    return _lazy("google_tokens", lambda: create_google_tokens(GoogleCredentialStore(GOOGLE_CREDENTIALS_PATH)))
+
+
+def get_outbox():
+    # Все ответы идут через очередь: хендлеры не ждут Telegram и не упираются в 429.
+    return _lazy("outbox", lambda: Outbox(send_message))
+
+
+def get_dispatcher():
+    return _lazy("dispatcher", lambda: UpdateDispatcher(process_update))
+
+
+def get_llm_cache():
+    return _lazy("llm_cache", lambda: LLMCache(disk_path=LLM_CACHE_PATH))
+
+
+def get_llm_batcher():
+    # Одновременные сообщения, которым нужна LLM, уходят общими запросами (см. LLMBatcher),
+    # а одиночные при низкой нагрузке — потоково, если пользователю показывается ход разбора.
+    return _lazy("llm_batcher", lambda: LLMBatcher(complete_llm_batch, max_concurrency=YANDEX_MAX_CONCURRENCY,
+                                                   stream=stream_llm))
+
+
+_LAZY_ATTRIBUTES = {"bot": get_bot, "app": get_app, "token_store": get_token_store, "reminders": get_reminders,
+                    "conversations": get_conversations, "google_tokens": get_google_tokens, "outbox": get_outbox,
+                    "dispatcher": get_dispatcher, "llm_cache": get_llm_cache, "llm_batcher": get_llm_batcher}
+
+
+def __getattr__(name):
+    # Срабатывает, только пока объект еще не создан: `from src.project.bot import app` по-прежнему работает.
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def send_message(chat_id, text, **kwargs):
+    return get_bot().send_message(chat_id, text, **kwargs)
+
+
+def progress_message(chat_id):
+    """Заглушка на время разбора через LLM; ее отправка, правки и ответ идут в лимитах outbox."""
+    bot = get_bot()
+    return ProgressMessage(chat_id, bot.send_message, bot.edit_message_text, get_outbox())
+
+
+def update_command(update):
+    """Метка апдейта для метрик: имя команды, «callback» или «text» (ответ на шаг диалога)."""
+    if update.callback_query is not None:
+        return "callback"
+    message = update.message
+    if message is None or not message.text:
+        return "other"
+    if message.text.startswith("/"):
+        command = message.text.split()[0][1:].split("@")[0]
+        return command if command in known_commands() else "other"
+    return "text"
+
+
+def known_commands():
+    return {command for handler in get_bot().message_handlers for command in handler["filters"].get("commands") or ()}
+
+
+def process_update(update):
+    with metrics.HANDLER_LATENCY.time(command=update_command(update)):
+        get_bot().process_new_updates([update])
+
+
+todoist_mirrors = TodoistMirrors()
+calendar_caches = CalendarCaches()
+
+
+# ======== ДИАЛОГИ ========
+# Шаги диалога (выбор проекта, номер задачи для удаления) хранятся в общем хранилище, а не в
+# register_next_step_handler: так их видит любой процесс-воркер и они переживают перезапуск.
+def expect_reply(message, step, *args):
+    """Следующее текстовое сообщение чата уйдет в шаг step из CONVERSATION_STEPS; args — JSON."""
+    get_conversations().set(message.chat.id, step, args)
+
+
+def in_conversation(message):
+    return get_conversations().has(message.chat.id)
+
+
+def continue_conversation(message):
+    state = get_conversations().pop(message.chat.id)
+    if state is None:
+        return
+    step, args = state
+    CONVERSATION_STEPS[step](message, *args)
+
+
+# ======== НАПОМИНАНИЯ ========
+# Напоминания ставятся только на то, что создано через бота. Правило повторения может быть
+# бесконечным, поэтому напоминания получают лишь ближайшие повторения.
+RECURRENCE_REMINDERS = 10
+# Повторения считаются в местном времени, как в googleapi.parse_datetime_to_iso и Recurrence.rrule.
+LOCAL_TIMEZONE = timezone(timedelta(hours=3))
+
+
+def send_reminder(chat_id, texts):
+    """Все напоминания чата, сработавшие одновременно, уходят одним сообщением."""
+    get_outbox().send(chat_id, "Напоминание:\n" + "\n".join(f"- {text}" for text in texts))
+
+
+def reminder_moments(start, rule=None):
+    """Будущие начала, на которые ставятся напоминания: start, а с rule — первые RECURRENCE_REMINDERS
+    повторений серии."""
+    if rule is None:
+        moments = [start]
+    else:
+        moments = islice(recurrence.occurrences(rule, start.astimezone(LOCAL_TIMEZONE)), RECURRENCE_REMINDERS)
+    now = time.time()
+    return [moment for moment in moments if moment.timestamp() > now]
+
+
+def remind_about_event(chat_id, event, rule=None):
+    """Напоминания на начало созданного события Google.
+
+    Повторение серии напоминает под id своего экземпляра (его показывает /list_events), так что
+    /delete_event снимает напоминание только об удаленном повторении.
+    """
+    moments = reminder_moments(event_time(event["start"]), rule)
+    if rule is None:
+        keys = [f"google:{event['id']}"]
+    else:
+        keys = [f"google:{event['id']}_{moment.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}" for moment in moments]
+    title = event.get("summary", "Событие")
+    if moments:
+        get_reminders().schedule_many([(moment.timestamp(), chat_id, key, title)
+                                       for moment, key in zip(moments, keys)])
+
+
+def task_reminder_key(task_id, index=0):
+    """Ключ напоминания задачи Todoist; у повторений после первого — с номером."""
+    return f"todoist:{task_id}#{index}" if index else f"todoist:{task_id}"
+
+
+def remind_about_task(chat_id, task_id, title, start_time, rule=None):
+    """Напоминания на срок задачи Todoist; start_time — ISO без зоны из разбора сообщения."""
+    if not start_time or not task_id:
+        return
+    try:
+        start = datetime.fromisoformat(googleapi.parse_datetime_to_iso(start_time))
+    except ValueError:
+        return
+    moments = reminder_moments(start, rule)
+    if moments:
+        get_reminders().schedule_many([(moment.timestamp(), chat_id, task_reminder_key(task_id, index), title)
+                                       for index, moment in enumerate(moments)])
+
+
+def cancel_task_reminders(chat_id, task_id):
+    """Удаленная задача Todoist (у повторяющейся — вся серия) больше не напоминает."""
+    for index in range(RECURRENCE_REMINDERS):
+        get_reminders().cancel(chat_id, task_reminder_key(task_id, index))
+
+
+# ======== ПОВТОРЕНИЯ ========
+RECURRENCE_PREVIEW = 3
+
+
+def split_recurrence(text):
+    """(правило повторения или None, текст для разбора). Без даты первое повторение ищется с сегодня."""
+    rule, rest = recurrence.parse_recurrence(text)
+    if rule is not None and not fast_parser.mentions_date(rest):
+        rest = f"сегодня {rest}"
+    return rule, rest
+
+
+def align_to_rule(event, rule):
+    """Переносит разобранное событие на ближайшее повторение правила; длительность сохраняется."""
+    if rule is None or not event.get("start_time"):
+        return event
+    start = datetime.fromisoformat(event["start_time"])
+    first = recurrence.first_occurrence(rule, start, datetime.now())
+    if first is None:
+        raise ValueError("все повторения уже в прошлом")
+    end_time = event.get("end_time")
+    if end_time:
+        end_time = (datetime.fromisoformat(end_time) + (first - start)).isoformat()
+    return {**event, "start_time": first.isoformat(), "end_time": end_time}
+
+
+def task_due(task, rule):
+    """due_string задачи: время из разбора, а для повторяющейся — правило на языке recurrence.DUE_LANG."""
+    if rule is None:
+        return task["start_time"]
+    return rule.due_string(datetime.fromisoformat(task["start_time"]) if task["start_time"] else None)
+
+
+def format_recurrence(rule, start_time):
+    """«Повторяется ...» и ближайшие даты: первые элементы ленивого перебора повторений."""
+    if rule is None:
+        return ""
+    text = f"\nПовторяется {rule.describe()}."
+    if start_time:
+        start = datetime.fromisoformat(start_time)
+        upcoming = islice(recurrence.occurrences(rule, start), RECURRENCE_PREVIEW)
+        text += " Ближайшие: " + ", ".join(f"{moment:%d.%m %H:%M}" for moment in upcoming)
+        if len(list(islice(recurrence.occurrences(rule, start), RECURRENCE_REMINDERS + 1))) > RECURRENCE_REMINDERS:
+            text += f"\nНапоминания придут только о ближайших {RECURRENCE_REMINDERS} повторениях."
+    return text
+
+
+def google_event_created(google_token, event, rule):
+    """Обычное событие сразу попадает в кэш календаря. Повторяющееся — нет: кэш хранит экземпляры
+    (singleEvents), и их Google развернет сам при следующей синхронизации."""
+    if rule is None:
+        calendar_caches.event_created(google_token, event)
+    else:
+        calendar_caches.invalidate(google_token)
 
 
 # ======== Вспомогательные функции для подключения ========
 def save_user_token(chat_id, key, token):
-    if chat_id not in user_data:
-        user_data[chat_id] = {}
-    user_data[chat_id][key] = token
+    old_token = get_token_store().get(chat_id, key)
+    if key == "google_token" and old_token and old_token != token:
+        googleapi.invalidate_google_service(old_token)
+    get_token_store().set(chat_id, key, token)
 
 
 def get_user_token(chat_id, key):
-    return user_data.get(chat_id, {}).get(key)
+    return get_token_store().get(chat_id, key)
+
+
+def get_google_token(chat_id):
+    """Access token Google: из подключения через /setup (обновляется сам) или вставленный вручную."""
+    return get_google_tokens().access_token(chat_id) or get_user_token(chat_id, "google_token")
 
 
-def generate_google_auth_url():
-    """Генерирует ссылку авторизации Google."""
+def generate_google_auth_url(chat_id=None):
+    """Генерирует ссылку авторизации Google.
+
+    С chat_id в state уходит подписанный номер чата: callback сам сохранит токены для этого чата.
+    """
     base_url = "https://accounts.google.com/o/oauth2/v2/auth"
     params = {
         "client_id": GOOGLE_CLIENT_ID,
@@ -56,9 +343,26 @@ def generate_google_auth_url():
         "access_type": "offline",
         "prompt": "consent",
     }
+    if chat_id is not None:
+        params["state"] = google_auth_state(chat_id)
     return f"{base_url}?{urllib.parse.urlencode(params)}"
 
 
+def google_auth_state(chat_id):
+    signature = hmac.new(GOOGLE_CLIENT_SECRET.encode(), str(chat_id).encode(), hashlib.sha256).hexdigest()[:32]
+    return f"{chat_id}.{signature}"
+
+
+def chat_from_google_state(state):
+    """Номер чата из state колбэка или None, если подпись не сходится."""
+    chat_id, _, _ = (state or "").partition(".")
+    try:
+        chat_id = int(chat_id)
+    except ValueError:
+        return None
+    return chat_id if hmac.compare_digest(google_auth_state(chat_id), state) else None
+
+
 def generate_todoist_auth_url():
     """Генерирует ссылку авторизации Todoist."""
     base_url = "https://todoist.com/oauth/authorize"
@@ -70,35 +374,90 @@ def generate_todoist_auth_url():
     return f"{base_url}?{urllib.parse.urlencode(params)}"
 
 
-def exchange_google_code_for_token(code):
-    """Обменивает код Google на токен."""
-    url = "https://oauth2.googleapis.com/token"
-    data = {
+GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
+TODOIST_TOKEN_URL = "https://todoist.com/oauth/access_token"
+
+
+def google_token_request_data(code):
+    return {
         "code": code,
         "client_id": GOOGLE_CLIENT_ID,
         "client_secret": GOOGLE_CLIENT_SECRET,
         "redirect_uri": REDIRECT_URI + "/google",
         "grant_type": "authorization_code",
     }
-    response = requests.post(url, data=data)
-    return response.json().get("access_token")
 
 
-def exchange_todoist_code_for_token(code):
-    """Обменивает код Todoist на токен."""
-    url = "https://todoist.com/oauth/access_token"
-    data = {
+def todoist_token_request_data(code):
+    return {
         "code": code,
         "client_id": TODOIST_CLIENT_ID,
         "client_secret": TODOIST_CLIENT_SECRET,
         "redirect_uri": REDIRECT_URI + "/todoist",
     }
-    response = requests.post(url, data=data)
+
+
+def google_refresh_request_data(refresh_token):
+    return {
+        "refresh_token": refresh_token,
+        "client_id": GOOGLE_CLIENT_ID,
+        "client_secret": GOOGLE_CLIENT_SECRET,
+        "grant_type": "refresh_token",
+    }
+
+
+def exchange_google_code_for_token(code):
+    """Обменивает код Google на токены: ответ с access_token, refresh_token и expires_in или None."""
+    response = transport.post(GOOGLE_TOKEN_URL, data=google_token_request_data(code))
+    tokens = response.json()
+    return tokens if tokens.get("access_token") else None
+
+
+async def exchange_google_code_for_token_async(code):
+    """Обменивает код Google на токены, не блокируя event loop."""
+    response = await async_transport.post(GOOGLE_TOKEN_URL, data=google_token_request_data(code))
+    tokens = response.json()
+    return tokens if tokens.get("access_token") else None
+
+
+def refresh_google_token(refresh_token):
+    """Новый access token по refresh token: ответ Google ({"error": "invalid_grant", ...}, если отозван)."""
+    return transport.post(GOOGLE_TOKEN_URL, data=google_refresh_request_data(refresh_token)).json()
+
+
+def google_token_refreshed(chat_id, old_token, new_token):
+    """Закэшированное по старому токену переезжает на новый или сбрасывается."""
+    googleapi.invalidate_google_service(old_token)
+    calendar_caches.rename(old_token, new_token)
+
+
+def google_connected(chat_id, tokens):
+    """Сохраняет токены после авторизации и сообщает об этом в чат.
+
+    Блокирующая (запись в SQLite, а в родителе воркеров outbox не запущен и шлет сразу), поэтому
+    колбэк вызывает ее через async_transport.run_blocking.
+    """
+    get_google_tokens().save(chat_id, tokens)
+    get_outbox().send(chat_id, "Google Calendar подключен!\nВведите /add_event если хотите добавить событие")
+
+
+def create_google_tokens(store):
+    return GoogleTokenRefresher(store, refresh_google_token, on_refreshed=google_token_refreshed)
+
+
+def exchange_todoist_code_for_token(code):
+    """Обменивает код Todoist на токен."""
+    response = transport.post(TODOIST_TOKEN_URL, data=todoist_token_request_data(code))
+    return response.json().get("access_token")
+
+
+async def exchange_todoist_code_for_token_async(code):
+    """Обменивает код Todoist на токен, не блокируя event loop."""
+    response = await async_transport.post(TODOIST_TOKEN_URL, data=todoist_token_request_data(code))
     return response.json().get("access_token")
 
 
 # ======== Telegram Bot Настройка аккаунта ========
-@bot.message_handler(commands=['start'])
 def start(message):
     welcome_message = (
         "Привет! Я WorkLifeBalanceBot. Я помогу тебе управлять твоими встречами и задачами.\n\n"
@@ -108,10 +467,9 @@ def start(message):
         "📌 Для настройки доступа к Google Calendar и Todoist используй команду /setup.\n"
         "ℹ️ Для справки по использованию напиши /help."
     )
-    bot.send_message(message.chat.id, welcome_message)
+    get_outbox().send(message.chat.id, welcome_message)
 
 
-@bot.message_handler(commands=['help'])
 def help_command(message):
     help_message = (
         "🔹 Доступные команды:\n\n"
@@ -125,15 +483,17 @@ def help_command(message):
         "/delete_task — Удалить задачу из Todoist.\n\n"
         "💡 Пример использования:\n"
         "- 'Встречаюсь с коллегами завтра в 15:00' — Событие 'встреча с коллегами' успешно добавлено в Google Calendar.\n"
-        "- 'Напомни про свидание завтра в семь вечера' — Задача 'свидание' успешно добавлена в проект.\n\n"
+        "- 'Напомни про свидание завтра в семь вечера' — Задача 'свидание' успешно добавлена в проект.\n"
+        "- 'Каждый понедельник в 10:00 планёрка' — одно повторяющееся событие вместо многих.\n\n"
+        "🔔 Напоминания приходят только о задачах и событиях, добавленных через бота, а у повторяющихся — "
+        f"о ближайших {RECURRENCE_REMINDERS} повторениях.\n\n"
         "Для корректной работы авторизуйтесь с помощью команды /setup."
     )
-    bot.send_message(message.chat.id, help_message)
+    get_outbox().send(message.chat.id, help_message)
 
 
-@bot.message_handler(commands=['setup'])
 def setup(message):
-    google_auth_url = generate_google_auth_url()
+    google_auth_url = generate_google_auth_url(message.chat.id)
     todoist_auth_url = generate_todoist_auth_url()
     setup_message = (
         "Для настройки сервисов выполните следующие шаги:\n\n"
@@ -144,78 +504,136 @@ def setup(message):
         "- `Google: ваш_код`\n"
         "- `Todoist: ваш_код`."
     )
-    bot.send_message(message.chat.id, setup_message, parse_mode="Markdown")
+    get_outbox().send(message.chat.id, setup_message, parse_mode="Markdown")
 
 
-@bot.message_handler(func=lambda message: message.text.startswith("Google:"))
 def handle_google_token(message):
     chat_id = message.chat.id
     google_token = message.text.split("Google:")[1].strip()
 
     if google_token:
         save_user_token(chat_id, "google_token", google_token)
-        bot.send_message(chat_id, "Токен Google успешно сохранён!\nВведите /add_event если хотите добавить событие\nВведите /list_events если хотите увидеть список всех запланированных событий\nВведите /delete_event если хотите удалить событие")
+        get_outbox().send(chat_id, "Токен Google успешно сохранён!\nВведите /add_event если хотите добавить событие\nВведите /list_events если хотите увидеть список всех запланированных событий\nВведите /delete_event если хотите удалить событие")
     else:
-        bot.send_message(chat_id, "Не удалось сохранить токен Google. Попробуйте снова.")
+        get_outbox().send(chat_id, "Не удалось сохранить токен Google. Попробуйте снова.")
 
 
-@bot.message_handler(func=lambda message: message.text.startswith("Todoist:"))
 def handle_todoist_token(message):
     chat_id = message.chat.id
     todoist_token = message.text.split("Todoist:")[1].strip()
 
     if todoist_token:
         save_user_token(chat_id, "todoist_token", todoist_token)
-        bot.send_message(chat_id, "Токен Todoist успешно сохранён!\nВведите /add_task если хотите добавить событие\nВведите /list_tasks если хотите увидеть список всех запланированных событий\nВведите /delete_task если хотите удалить событие")
+        get_outbox().send(chat_id, "Токен Todoist успешно сохранён!\nВведите /add_task если хотите добавить событие\nВведите /list_tasks если хотите увидеть список всех запланированных событий\nВведите /delete_task если хотите удалить событие")
     else:
-        bot.send_message(chat_id, "Не удалось сохранить токен Todoist. Попробуйте снова.")
-
-
-# ======== FastAPI Колбэки ========
-@app.get("/callback/google")
-async def google_callback(request: Request):
-    """Обрабатывает колбэк от Google."""
-    code = request.query_params.get("code")
-    if code:
-        token = exchange_google_code_for_token(code)
-        if token:
-            return {"message": "Google authorisation completed!", "token": token}
-        return {"message": "Google authorisation error"}
-    return {"message": "Authorisation code missing"}
-
-
-@app.get("/callback/todoist")
-async def todoist_callback(request: Request):
-    """Обрабатывает колбэк от Todoist."""
-    code = request.query_params.get("code")
-    if code:
-        token = exchange_todoist_code_for_token(code)
-        if token:
-            return {"message": "Todoist authorisation completed!", "token": token}
-        return {"message": "Todoist authorisation error"}
-    return {"message": "Authorisation code missing"}
+        get_outbox().send(chat_id, "Не удалось сохранить токен Todoist. Попробуйте снова.")
+
+
+# ======== МЕТРИКИ ========
+def created(name, attribute):
+    """Атрибут (или результат метода без аргументов) ленивого объекта или 0, пока объект не создан:
+    сбор /metrics не открывает базы и не создает объекты."""
+    value = globals().get(name)
+    if value is None:
+        return 0
+    value = getattr(value, attribute)
+    return value() if callable(value) else value
+
+
+# Значения, которые копятся там, где обрабатываются апдейты. С процессами-воркерами каждый воркер
+# публикует их через WorkerCounters, а /metrics родителя отдает сумму по воркерам.
+WORKER_METRICS = (
+    ("smart_todo_fast_path_hits_total", "counter", "Сообщения, разобранные без LLM.",
+     lambda: fast_parser.stats.hits),
+    ("smart_todo_fast_path_fallbacks_total", "counter", "Сообщения, отправленные в LLM.",
+     lambda: fast_parser.stats.fallbacks),
+    ("smart_todo_llm_cache_hits_total", "counter", "Попадания в кэш LLM (память и диск).",
+     lambda: created("llm_cache", "hits")),
+    ("smart_todo_llm_cache_misses_total", "counter", "Промахи кэша LLM.", lambda: created("llm_cache", "misses")),
+    ("smart_todo_todoist_reads_total", "counter", "Чтения задач и проектов Todoist.", lambda: todoist_mirrors.reads),
+    ("smart_todo_todoist_syncs_total", "counter", "Обращения к Todoist при чтении.",
+     lambda: todoist_mirrors.upstream_calls),
+    ("smart_todo_calendar_reads_total", "counter", "Чтения списка событий Google.", lambda: calendar_caches.reads),
+    ("smart_todo_calendar_syncs_total", "counter", "Синхронизации календаря при чтении.",
+     lambda: calendar_caches.upstream_syncs),
+    ("smart_todo_outbox_sent_total", "counter", "Отправленные сообщения.", lambda: created("outbox", "sent")),
+    ("smart_todo_outbox_coalesced_total", "counter", "Сообщения, склеенные с предыдущими.",
+     lambda: created("outbox", "coalesced")),
+    ("smart_todo_outbox_retried_total", "counter", "Повторы отправки после 429.", lambda: created("outbox", "retried")),
+    ("smart_todo_outbox_failed_total", "counter", "Сообщения, которые не удалось отправить.",
+     lambda: created("outbox", "failed")),
+    ("smart_todo_reminders_fired_total", "counter", "Сработавшие напоминания.", lambda: created("reminders", "fired")),
+    ("smart_todo_llm_requests_total", "counter", "Сообщения, отправленные на разбор в LLM.",
+     lambda: created("llm_batcher", "requests")),
+    ("smart_todo_llm_calls_total", "counter", "Вызовы Yandex GPT (пачками).",
+     lambda: created("llm_batcher", "batches")),
+    ("smart_todo_llm_deduplicated_total", "counter", "Одинаковые сообщения, разобранные одним пунктом пачки.",
+     lambda: created("llm_batcher", "deduplicated")),
+    ("smart_todo_llm_streamed_total", "counter", "Вызовы Yandex GPT в потоковом режиме.",
+     lambda: created("llm_batcher", "streamed")),
+    ("smart_todo_google_tokens_refreshed_total", "counter", "Обновленные токены Google.",
+     lambda: created("google_tokens", "refreshed")),
+    ("smart_todo_google_token_refresh_shared_total", "counter", "Обращения, дождавшиеся уже идущего обновления токена.",
+     lambda: created("google_tokens", "shared")),
+    ("smart_todo_singleflight_calls_total", "counter", "Чтения, дошедшие до API.", lambda: singleflight.reads.calls),
+    ("smart_todo_singleflight_shared_total", "counter", "Чтения, присоединившиеся к уже идущему запросу.",
+     lambda: singleflight.reads.shared),
+    ("smart_todo_singleflight_negative_hits_total", "counter", "Чтения, получившие недавнюю ошибку из кэша.",
+     lambda: singleflight.reads.negative_hits),
+    ("smart_todo_outbox_depth", "gauge", "Сообщения в очереди на отправку.", lambda: created("outbox", "depth")),
+    ("smart_todo_outbox_waiting_chats", "gauge", "Чаты с неотправленными сообщениями.",
+     lambda: created("outbox", "waiting_chats")),
+    ("smart_todo_llm_in_flight", "gauge", "Идущие сейчас вызовы Yandex GPT.",
+     lambda: created("llm_batcher", "in_flight")),
+    ("smart_todo_llm_queued", "gauge", "Сообщения, ждущие вызова Yandex GPT.", lambda: created("llm_batcher", "qsize")),
+    ("smart_todo_reminders_loaded", "gauge", "Напоминания в памяти планировщика.",
+     lambda: created("reminders", "loaded")),
+)
+
+
+def worker_metric(name, read):
+    """Сумма по воркерам, если апдейты обрабатывают процессы, иначе значение этого процесса."""
+    dispatcher = globals().get("dispatcher")
+    if isinstance(dispatcher, ProcessDispatcher):
+        return dispatcher.counters.total(name)
+    return read()
+
+
+def read_worker_metrics():
+    return {name: read() for name, _, _, read in WORKER_METRICS}
+
+
+for name, kind, documentation, read in WORKER_METRICS:
+    metrics.Callback(name, documentation, functools.partial(worker_metric, name, read), kind=kind)
+for name, documentation, read in (
+    ("smart_todo_updates_processed_total", "Обработанные апдейты.", lambda: created("dispatcher", "processed")),
+    ("smart_todo_updates_failed_total", "Апдейты, упавшие с ошибкой.", lambda: created("dispatcher", "failed")),
+    ("smart_todo_updates_rejected_total", "Апдейты, отклоненные из-за полной очереди.",
+     lambda: created("dispatcher", "rejected")),
+):
+    metrics.Callback(name, documentation, read, kind="counter")
+metrics.Callback("smart_todo_updates_queued", "Апдейты в очередях диспетчера.", lambda: created("dispatcher", "qsize"))
 
 
 # ======== TODOIST ========
-@bot.message_handler(commands=['add_task'])
 def add_task(message):
     chat_id = message.chat.id
     todoist_token = get_user_token(chat_id, "todoist_token")
     if not todoist_token:
-        bot.send_message(chat_id, "Вы не авторизованы в Todoist. Используйте /setup.")
+        get_outbox().send(chat_id, "Вы не авторизованы в Todoist. Используйте /setup.")
         return
 
-    projects = todoistapi.get_todoist_projects(todoist_token)
+    projects = todoist_mirrors.get_projects(todoist_token)
     if not projects or "error" in projects:
-        bot.send_message(chat_id, "Не удалось получить список проектов.")
+        get_outbox().send(chat_id, "Не удалось получить список проектов.")
         return
 
     response = "Выберите проект (пришлите номер проекта):\n"
     for idx, project in enumerate(projects):
         response += f"{idx + 1}. {project['name']} (ID: {project['id']})\n"
-    bot.send_message(chat_id, response)
+    get_outbox().send(chat_id, response)
 
-    bot.register_next_step_handler(message, process_project_selection, projects)
+    expect_reply(message, "project_selection", [{"id": project["id"]} for project in projects])
 
 
 def process_project_selection(message, projects):
@@ -225,87 +643,124 @@ def process_project_selection(message, projects):
         selected_index = int(message.text.strip()) - 1
         if 0 <= selected_index < len(projects):
             selected_project_id = projects[selected_index]["id"]
-            bot.send_message(chat_id, "Введите описание задачи:")
-            bot.register_next_step_handler(message, process_task_creation, selected_project_id)
+            get_outbox().send(chat_id, "Введите описание задачи:")
+            expect_reply(message, "task_creation", selected_project_id)
         else:
-            bot.send_message(chat_id, "Неверный выбор. Попробуйте снова.")
+            get_outbox().send(chat_id, "Неверный выбор. Попробуйте снова.")
     except ValueError:
-        bot.send_message(chat_id, "Неверный ввод. Укажите номер проекта.")
+        get_outbox().send(chat_id, "Неверный ввод. Укажите номер проекта.")
 
 
 def process_task_creation(message, project_id):
     """ Обработка текста задачи."""
     chat_id = message.chat.id
     todoist_token = get_user_token(chat_id, "todoist_token")
-    user_input = message.text.strip()
+    rule, user_input = split_recurrence(message.text.strip())
+    due_lang = recurrence.DUE_LANG if rule else None
+    progress = progress_message(chat_id)
 
     try:
-        task_details = extract_event_details(user_input, False)
+        task_list = [align_to_rule(task, rule) for task in extract_event_list(user_input, False, progress)]
+        if len(task_list) > 1:
+            titles = [task["title"] for task in task_list]
+            results = todoistapi.create_tasks_batch(
+                todoist_token, [(task["title"], task_due(task, rule)) for task in task_list], project_id, due_lang)
+            todoist_mirrors.invalidate(todoist_token)
+            for task, result in zip(task_list, results):
+                remind_about_task(chat_id, result.get("id"), task["title"], task["start_time"], rule)
+            progress.finish(format_batch_report(titles, results))
+            return
+
+        task_details = task_list[0] if task_list else {}
+        if not task_details.get("title"):
+            progress.finish("Не удалось распознать задачу. Пожалуйста, введите задачу еще раз.")
+            expect_reply(message, "task_creation", project_id)
+            return
         task_name = task_details["title"]
-        due_string = task_details["start_time"]
+        start_time = task_details["start_time"]
 
-        task = todoistapi.create_task_in_project(todoist_token, task_name, project_id, due_string)
+        task = todoistapi.create_task_in_project(todoist_token, task_name, project_id, task_due(task_details, rule),
+                                                 due_lang)
+        todoist_mirrors.invalidate(todoist_token)
         if "error" not in task:
-            bot.send_message(chat_id, f"Задача '{task_name}' успешно добавлена в проект.")
+            remind_about_task(chat_id, task.get("id"), task_name, start_time, rule)
+            progress.finish(f"Задача '{task_name}' успешно добавлена в проект." + format_recurrence(rule, start_time))
         else:
-            bot.send_message(chat_id, f"Ошибка при создании задачи: {task['error']}")
+            progress.finish(f"Ошибка при создании задачи: {task['error']}")
     except Exception as e:
-        bot.send_message(chat_id, f"Произошла ошибка: {str(e)}")
+        progress.finish(f"Произошла ошибка: {str(e)}")
 
 
 def get_todoist_tasks(token):
-    """Получает список всех задач."""
-    url = "https://api.todoist.com/rest/v2/tasks"
-    headers = {
-        "Authorization": f"Bearer {token}"
-    }
-    response = requests.get(url, headers=headers)
-
-    if response.status_code == HTTP_OK:
-        return response.json()
-    else:
-        return {"error": response.text}
+    """Получает список всех задач из локального зеркала Todoist."""
+    return todoist_mirrors.get_tasks(token)
 
 
-@bot.message_handler(commands=['list_tasks'])
 def list_tasks(message):
     """Обработчик команды /list_tasks."""
     chat_id = message.chat.id
     todoist_token = get_user_token(chat_id, "todoist_token")
 
     if not todoist_token:
-        bot.send_message(chat_id, "Вы не авторизованы в Todoist. Используйте /setup.")
+        get_outbox().send(chat_id, "Вы не авторизованы в Todoist. Используйте /setup.")
         return
 
+    send_tasks_page(chat_id, todoist_token, 0)
+
+
+def send_tasks_page(chat_id, todoist_token, page, message_id=None):
+    """Показывает одну страницу задач; при листании редактирует то же сообщение."""
     tasks = get_todoist_tasks(todoist_token)
     if "error" in tasks:
-        bot.send_message(chat_id, f"Ошибка при получении задач: {tasks['error']}")
+        get_outbox().send(chat_id, f"Ошибка при получении задач: {tasks['error']}")
         return
 
-    if not tasks:
-        bot.send_message(chat_id, "У вас нет активных задач.")
-        return
-    response = "Список ваших задач:\n"
-    for idx, task in enumerate(tasks):
-        print(task)
-        due_date = task.get('due', {}).get('string')
-        print(due_date)
-        if due_date:
-            parsed_date = datetime.fromisoformat(due_date)
-            formatted_date = parsed_date.strftime("%d %B %Y year %H:%M")
-            response += f"{idx + 1}. {task['content']} (дата: {formatted_date})\n"
-        else:
-            response += f"{idx + 1}. {task['content']}\n"
-    bot.send_message(chat_id, response)
+    text, has_next = listing.render_page("Список ваших задач:", listing.get_page(tasks, page),
+                                         listing.format_task, page)
+    show_page(chat_id, text or "У вас нет активных задач.", listing.page_keyboard("tasks", page, has_next), message_id)
+
+
+def show_page(chat_id, text, keyboard, message_id=None):
+    """Первая страница — новым сообщением, следующие — правкой; и то и другое в лимитах outbox."""
+    if message_id is None:
+        get_outbox().send(chat_id, text, reply_markup=keyboard)
+    else:
+        get_outbox().call(chat_id, get_bot().edit_message_text, text, chat_id, message_id, reply_markup=keyboard)
+
+
+def send_long_message(chat_id, lines, header=""):
+    """Отправляет список, разбивая его на сообщения не длиннее лимита Telegram."""
+    for chunk in listing.chunk_lines(lines, header):
+        get_outbox().send(chat_id, chunk)
+
+
+def turn_page(call):
+    """Кнопки «◀/▶» под списками задач и событий.
+
+    На нажатие отвечаем после правки страницы: оба вызова идут через outbox.call, так что частые
+    нажатия ждут лимита чата, а не получают 429.
+    """
+    kind, page = listing.parse_page_callback(call.data)
+    chat_id = call.message.chat.id
+    message_id = call.message.message_id
+    try:
+        if kind == "tasks":
+            todoist_token = get_user_token(chat_id, "todoist_token")
+            if todoist_token:
+                send_tasks_page(chat_id, todoist_token, page, message_id)
+        elif kind == "events":
+            google_token = get_google_token(chat_id)
+            if google_token:
+                send_events_page(chat_id, google_token, page, message_id)
+    except Exception as e:
+        get_outbox().send(chat_id, f"Ошибка при получении списка: {str(e)}")
+    get_outbox().call(chat_id, get_bot().answer_callback_query, call.id)
 
 
+@metrics.timed(metrics.API_LATENCY, service="todoist", operation="delete_task")
 def delete_todoist_task(token, task_id):
     """Удаление задачи."""
-    url = f"https://api.todoist.com/rest/v2/tasks/{task_id}"
-    headers = {
-        "Authorization": f"Bearer {token}"
-    }
-    response = requests.delete(url, headers=headers)
+    response = transport.delete(f"{todoistapi.TASKS_URL}/{task_id}", headers=todoistapi.auth_headers(token))
 
     if response.status_code == HTTP_NO_CONTENT:
         return True
@@ -323,296 +778,475 @@ def process_task_deletion(message, tasks):
         if 0 <= selected_index < len(tasks):
             task_id = tasks[selected_index]["id"]
             success = delete_todoist_task(todoist_token, task_id)
+            todoist_mirrors.invalidate(todoist_token)
             if success is True:
-                bot.send_message(chat_id, "Задача успешно удалена.")
+                cancel_task_reminders(chat_id, task_id)
+                get_outbox().send(chat_id, "Задача успешно удалена.")
             else:
-                bot.send_message(chat_id, f"Ошибка при удалении задачи: {success['error']}")
+                get_outbox().send(chat_id, f"Ошибка при удалении задачи: {success['error']}")
         else:
-            bot.send_message(chat_id, "Неверный выбор. Попробуйте снова.")
+            get_outbox().send(chat_id, "Неверный выбор. Попробуйте снова.")
     except ValueError:
-        bot.send_message(chat_id, "Неверный ввод. Укажите номер задачи.")
+        get_outbox().send(chat_id, "Неверный ввод. Укажите номер задачи.")
 
 
-@bot.message_handler(commands=['delete_task'])
 def delete_task(message):
     """Обработчик команды /delete_task."""
     chat_id = message.chat.id
     todoist_token = get_user_token(chat_id, "todoist_token")
 
     if not todoist_token:
-        bot.send_message(chat_id, "Вы не авторизованы в Todoist. Используйте /setup.")
+        get_outbox().send(chat_id, "Вы не авторизованы в Todoist. Используйте /setup.")
         return
 
     tasks = get_todoist_tasks(todoist_token)
     if "error" in tasks:
-        bot.send_message(chat_id, f"Ошибка при получении задач: {tasks['error']}")
+        get_outbox().send(chat_id, f"Ошибка при получении задач: {tasks['error']}")
         return
 
     if not tasks:
-        bot.send_message(chat_id, "У вас нет активных задач.")
+        get_outbox().send(chat_id, "У вас нет активных задач.")
         return
 
-    response = "Выберите задачу для удаления:\n"
-    for idx, task in enumerate(tasks):
-        due_date = task.get('due', {}).get('string')
-        if due_date:
-            parsed_date = datetime.fromisoformat(due_date)
-            formatted_date = parsed_date.strftime("%d %B %Y года %H:%M")
-            response += f"{idx + 1}. {task['content']} (дата: {formatted_date})\n"
-        else:
-            response += f"{idx + 1}. {task['content']}\n"
-    bot.send_message(chat_id, response)
+    send_long_message(chat_id, (listing.format_task(number, task) for number, task in enumerate(tasks, start=1)),
+                      "Выберите задачу для удаления:\n")
 
-    bot.register_next_step_handler(message, process_task_deletion, tasks)
+    expect_reply(message, "task_deletion", [{"id": task["id"]} for task in tasks])
 
 
 # ======== GOOGLE ========
-@bot.message_handler(commands=['add_event'])
 def add_event(message):
     chat_id = message.chat.id
-    google_token = get_user_token(chat_id, "google_token")
+    google_token = get_google_token(chat_id)
 
     if not google_token:
-        bot.send_message(chat_id, "Вы не авторизованы в Google. Используйте /setup.")
+        get_outbox().send(chat_id, "Вы не авторизованы в Google. Используйте /setup.")
         return
 
-    bot.send_message(chat_id, "Пожалуйста, введите информацию о событии:")
-    bot.register_next_step_handler(message, process_event_details_nlp)
+    get_outbox().send(chat_id, "Пожалуйста, введите информацию о событии:")
+    expect_reply(message, "event_details")
 
 
-@bot.message_handler(commands=['list_events'])
 def list_events(message):
     chat_id = message.chat.id
-    google_token = get_user_token(chat_id, "google_token")
+    google_token = get_google_token(chat_id)
     if not google_token:
-        bot.send_message(chat_id, "Вы не авторизованы в Google. Используйте /setup.")
+        get_outbox().send(chat_id, "Вы не авторизованы в Google. Используйте /setup.")
         return
     try:
-        events = googleapi.list_google_events(google_token)
-        if not events:
-            bot.send_message(chat_id, "У вас нет ближайших событий.")
-        else:
-            response = "Ваши ближайшие события:\n"
-            for event in events:
-                start = event['start'].get('dateTime', event['start'].get('date'))
-                parsed_date = datetime.fromisoformat(start)
-                formatted_date = parsed_date.strftime("%d %B %Y года %H:%M")
-                response += f"- {event['summary']} ({formatted_date})\n"
-            bot.send_message(chat_id, response)
+        send_events_page(chat_id, google_token, 0)
     except Exception as e:
-        bot.send_message(chat_id, f"Ошибка при получении событий: {str(e)}")
+        get_outbox().send(chat_id, f"Ошибка при получении событий: {str(e)}")
+
+
+def send_events_page(chat_id, google_token, page, message_id=None):
+    """Показывает одну страницу ближайших событий из кэша календаря."""
+    rows = calendar_caches.upcoming(google_token, limit=listing.PAGE_SIZE + 1, offset=page * listing.PAGE_SIZE)
+    text, has_next = listing.render_page("Ваши ближайшие события:", rows, listing.format_event, page)
+    show_page(chat_id, text or "У вас нет ближайших событий.", listing.page_keyboard("events", page, has_next),
+              message_id)
 
 
-@bot.message_handler(commands=['delete_event'])
 def delete_event_start(message):
     """Удаление события. Список событий для удаления."""
     chat_id = message.chat.id
-    google_token = get_user_token(chat_id, "google_token")
+    google_token = get_google_token(chat_id)
 
     if not google_token:
-        bot.send_message(chat_id, "Вы не авторизованы в Google. Используйте /setup.")
+        get_outbox().send(chat_id, "Вы не авторизованы в Google. Используйте /setup.")
         return
 
     try:
-        events = googleapi.list_google_events(google_token)
+        events = calendar_caches.upcoming(google_token)
         if not events:
-            bot.send_message(chat_id, "У вас нет ближайших событий для удаления.")
+            get_outbox().send(chat_id, "У вас нет ближайших событий для удаления.")
             return
 
-        event_list = "Ваши ближайшие события:\n"
-        for idx, event in enumerate(events, start=1):
-            start = event['start'].get('dateTime', event['start'].get('date'))
-            parsed_date = datetime.fromisoformat(start)
-            formatted_date = parsed_date.strftime("%d %B %Y года %H:%M")
-            event_list += f"{idx}. {event['summary']} ({formatted_date})\n"
-
-        bot.send_message(chat_id, event_list)
-        bot.send_message(chat_id, "Напишите номер из списка, чтобы удалить событие по номеру.")
-        bot.register_next_step_handler(message, process_event_deletion, events)
+        send_long_message(chat_id, (listing.format_event(idx, event) for idx, event in enumerate(events, start=1)),
+                          "Ваши ближайшие события:\n")
+        get_outbox().send(chat_id, "Напишите номер из списка, чтобы удалить событие по номеру.")
+        expect_reply(message, "event_deletion",
+                     [{"id": event["id"], "summary": event.get("summary")} for event in events])
 
     except Exception as e:
-        bot.send_message(chat_id, f"Ошибка при получении событий: {str(e)}")
+        get_outbox().send(chat_id, f"Ошибка при получении событий: {str(e)}")
 
 
 def process_event_deletion(message, events):
     """Обрабатывает запрос удаления события."""
     chat_id = message.chat.id
-    google_token = get_user_token(chat_id, "google_token")
+    google_token = get_google_token(chat_id)
 
     try:
         text = message.text.lower()
         parts = text.split()
         if len(parts) != 1 or not parts[0].isdigit():
-            bot.send_message(chat_id,
+            get_outbox().send(chat_id,
                              "Неверный формат. Убедитесь, что вы указали номер события, например: '2'.")
             return
 
         event_index = int(parts[0]) - 1
         if event_index < 0 or event_index >= len(events):
-            bot.send_message(chat_id, "Неверный номер события. Пожалуйста, выберите номер из списка.")
+            get_outbox().send(chat_id, "Неверный номер события. Пожалуйста, выберите номер из списка.")
             return
 
         event_id = events[event_index]['id']
         googleapi.delete_google_event(google_token, event_id)
+        calendar_caches.event_deleted(google_token, event_id)
+        get_reminders().cancel(chat_id, f"google:{event_id}")
 
-        bot.send_message(chat_id, f"Событие '{events[event_index]['summary']}' успешно удалено.")
+        get_outbox().send(chat_id, f"Событие '{events[event_index]['summary']}' успешно удалено.")
     except Exception as e:
-        bot.send_message(chat_id, f"Ошибка при удалении события: {str(e)}")
+        get_outbox().send(chat_id, f"Ошибка при удалении события: {str(e)}")
 
 
 # ======== YANDEX LLM ========
-YANDEX_API_URL = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
+YANDEX_API_URL = getattr(config, "YANDEX_API_URL", "https://llm.api.cloud.yandex.net/foundationModels/v1/completion")
+# Квота Yandex GPT на одновременные запросы; при нескольких процессах делится между ними.
+YANDEX_MAX_CONCURRENCY = getattr(config, "YANDEX_MAX_CONCURRENCY", 10)
+# Сколько раз спрашивать модель, если ее ответ не разбирается даже после локальной починки.
+LLM_FORMAT_ATTEMPTS = 2
+# Тело запроса заканчивается текстом пользователя: все до него сериализуется один раз на промпт.
+PAYLOAD_SUFFIX = "}]}"
+
 
+def form_payload(request_text, google_todoist, batch=False, stream=False):
+    """Формируем тело запроса к Yandex LLM API.
 
-def form_payload(request_text, google_todoist):
-    """Формируем тело запроса к Yandex LLM API."""
+    Ответу на одно сообщение хватает EXTRACTION_MAX_TOKENS, списку пунктов — полного бюджета.
+    """
     if google_todoist:
-        return json.dumps({
-            "modelUri": MODEL_URI,
-            "completionOptions": DEFAULT_COMPLETION_OPTIONS,
-            "messages": [
-                {
-                    "role": "system",
-                    "text": SYSTEM_MESSAGE_GOOGLE
-                },
-                {
-                    "role": "user",
-                    "text": request_text
-                }
-            ]
-        })
-    return json.dumps({
+        system_message = SYSTEM_MESSAGE_GOOGLE_BATCH if batch else SYSTEM_MESSAGE_GOOGLE
+    else:
+        system_message = SYSTEM_MESSAGE_TODOIST_BATCH if batch else SYSTEM_MESSAGE_TODOIST
+    max_tokens = DEFAULT_COMPLETION_OPTIONS["maxTokens"] if batch else EXTRACTION_MAX_TOKENS
+    return completion_payload(system_message, request_text, max_tokens, stream)
+
+
+def form_multi_payload(request_texts, google_todoist):
+    """Несколько независимых сообщений в одном запросе: каждое со своим номером, ответы — по номерам."""
+    system_message = SYSTEM_MESSAGE_GOOGLE_MULTI if google_todoist else SYSTEM_MESSAGE_TODOIST_MULTI
+    numbered = "\n".join(f"[{number}] {' '.join(text.split())}" for number, text in enumerate(request_texts, start=1))
+    max_tokens = min(DEFAULT_COMPLETION_OPTIONS["maxTokens"], EXTRACTION_MAX_TOKENS * len(request_texts))
+    return completion_payload(system_message, numbered, max_tokens)
+
+
+def completion_payload(system_message, request_text, max_tokens=EXTRACTION_MAX_TOKENS, stream=False):
+    return payload_prefix(system_message, max_tokens, stream) + json.dumps(request_text) + PAYLOAD_SUFFIX
+
+
+@functools.lru_cache(maxsize=None)
+def payload_prefix(system_message, max_tokens, stream):
+    """JSON тела запроса до текста пользователя; промптов немного, поэтому кэш без ограничения."""
+    payload = json.dumps({
         "modelUri": MODEL_URI,
-        "completionOptions": DEFAULT_COMPLETION_OPTIONS,
+        "completionOptions": {**DEFAULT_COMPLETION_OPTIONS, "stream": stream, "maxTokens": max_tokens},
         "messages": [
             {
                 "role": "system",
-                "text": SYSTEM_MESSAGE_TODOIST
+                "text": system_message
             },
             {
                 "role": "user",
-                "text": request_text
+                "text": ""
             }
         ]
     })
+    return payload[:-len('""' + PAYLOAD_SUFFIX)]
 
 
-def extract_event_details(request_text, google_todoist):
-    """Отправляет запрос к Yandex LLM API для анализа текста."""
-    headers = {
+def llm_headers():
+    return {
         "Authorization": f"Bearer {YANDEX_IAM_TOKEN}",
         "Content-Type": "application/json"
     }
-    payload = form_payload(request_text, google_todoist)
-    response = requests.post(YANDEX_API_URL, headers=headers, data=payload)
 
+
+def parse_llm_response(response, parser=None):
+    """Достает текст ответа модели и разбирает его."""
     if response.status_code == 200:
         result = response.json()
         text = result['result']['alternatives'][0]['message']['text']
 
-        return parse_event_text(text)
+        return (parser or parse_event_answer)(text)
     else:
+        metrics.PARSE_FAILURES.inc(stage="llm_response")
         raise Exception(f"Ошибка при вызове Yandex LLM API: {response.status_code} {response.text}")
 
 
-def parse_event_text(text):
-    """Парсинг текста от Yandex LLM."""
-    print(text)
-    title_match = re.search(r"(?:Событие:|Задача:) (.+?)\.", text)
-    start_time_match = re.search(r"Начало: (.+?)\К", text)
-    end_time_match = re.search(r"Конец: (.*)", text)
-
-    title = title_match.group(1) if title_match else "Неизвестное событие"
-    start_time = start_time_match.group(1) if start_time_match else None
-    end_time = end_time_match.group(1) if end_time_match else None
-
-    if start_time and not re.match(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}", start_time):
-        start_time = convert_relative_to_iso(start_time)
-    if end_time and not re.match(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}", end_time):
-        end_time = convert_relative_to_iso(end_time)
-    return {"title": title, "start_time": start_time, "end_time": end_time}
+def parse_numbered_answers(text):
+    return llm_answer.numbered_items(llm_answer.decode_json(text))
 
 
-def convert_relative_to_iso(time_str):
-    now = datetime.now()
-    print(f"Original time string: {time_str}")
+def complete_llm(payload, parser=None):
+    """Запрос к LLM с разбором ответа. Повторный запрос — только если ответ не удалось починить локально."""
+    for attempt in range(1, LLM_FORMAT_ATTEMPTS + 1):
+        response = transport.post(YANDEX_API_URL, headers=llm_headers(), data=payload)
+        try:
+            return parse_llm_response(response, parser)
+        except llm_answer.AnswerFormatError:
+            metrics.PARSE_FAILURES.inc(stage="llm_format")
+            if attempt == LLM_FORMAT_ATTEMPTS:
+                raise
+
+
+def request_llm(request_text, google_todoist):
+    return complete_llm(form_payload(request_text, google_todoist))
+
+
+def stream_llm(google_todoist, request_text, progress):
+    """Потоковый запрос к LLM на одно сообщение; progress получает уже пришедшие поля ответа.
+
+    Поток читается только до конца JSON-объекта: пояснения, которые модель может дописать
+    после него, не нужны, и соединение закрывается сразу.
+    """
+    payload = form_payload(request_text, google_todoist, stream=True)
+    response = transport.post(YANDEX_API_URL, headers=llm_headers(), data=payload, stream=True)
+    with contextlib.closing(response):
+        if response.status_code != 200:
+            metrics.PARSE_FAILURES.inc(stage="llm_response")
+            raise Exception(f"Ошибка при вызове Yandex LLM API: {response.status_code} {response.text}")
+        text = ""
+        for line in response.iter_lines():
+            if not line:
+                continue
+            # Каждый фрагмент потока Yandex GPT содержит весь текст ответа на данный момент.
+            chunk = json.loads(line)["result"]["alternatives"][0]["message"]["text"]
+            text = chunk if chunk.startswith(text) else text + chunk
+            if llm_answer.complete_json(text) is not None:
+                metrics.LLM_STREAMS.inc(outcome="fields_complete")
+                break
+            progress(llm_answer.partial_fields(text))
+        else:
+            metrics.LLM_STREAMS.inc(outcome="stream_end")
+    try:
+        return parse_event_answer(text)
+    except llm_answer.AnswerFormatError:
+        metrics.PARSE_FAILURES.inc(stage="llm_format")
+        return request_llm(request_text, google_todoist)
+
+
+def complete_llm_batch(google_todoist, request_texts):
+    """Один вызов LLM на пачку из llm_batcher. Пункт без ответа или с битым ответом переспрашивается отдельно."""
+    if len(request_texts) == 1:
+        return [request_llm(request_texts[0], google_todoist)]
+    response = transport.post(YANDEX_API_URL, headers=llm_headers(),
+                              data=form_multi_payload(request_texts, google_todoist))
+    try:
+        answers = parse_llm_response(response, parse_numbered_answers)
+    except llm_answer.AnswerFormatError:
+        metrics.PARSE_FAILURES.inc(stage="llm_format")
+        answers = {}
+    results = []
+    for number, request_text in enumerate(request_texts, start=1):
+        try:
+            if number in answers:
+                try:
+                    results.append(event_from_answer(answers[number]))
+                    continue
+                except llm_answer.AnswerFormatError:
+                    pass
+            metrics.PARSE_FAILURES.inc(stage="llm_batch_item")
+            results.append(request_llm(request_text, google_todoist))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def format_progress(fields, google_todoist):
+    """Текст заглушки по полям, которые модель уже успела написать."""
+    if "title" not in fields:
+        return PLACEHOLDER
+    lines = [f"⏳ {'Событие' if google_todoist else 'Задача'}: {fields['title']}"]
+    if "start" in fields:
+        lines.append(f"Начало: {fields['start']}")
+    if "end" in fields:
+        lines.append(f"Конец: {fields['end']}")
+    return "\n".join(lines)
+
+
+def extract_event_details(request_text, google_todoist, progress=None):
+    """Отправляет запрос к Yandex LLM API для анализа текста.
+
+    Простые сообщения разбираются локально, повторные формулировки берутся из кэша.
+    С progress (ProgressMessage) на время запроса к LLM показывается заглушка с ходом разбора.
+    """
+    started = time.perf_counter()
+    local = fast_parser.parse_locally(request_text, google_todoist)
+    if local is not None:
+        metrics.LLM_LATENCY.observe(time.perf_counter() - started, path="fast")
+        return local
+    cached = get_llm_cache().get(request_text, google_todoist)
+    if cached is not None:
+        metrics.LLM_LATENCY.observe(time.perf_counter() - started, path="cache")
+        return cached
+    on_partial = None
+    if progress is not None:
+        progress.waiting()
+
+        def on_partial(fields):
+            progress.update(format_progress(fields, google_todoist))
+
+    result = get_llm_batcher()(google_todoist, request_text, on_partial)
+    get_llm_cache().put(request_text, google_todoist, result)
+    metrics.LLM_LATENCY.observe(time.perf_counter() - started, path="llm")
+    return result
+
+
+ANSWER_LABEL_R = re.compile(r"(Событие:|Задача:|Начало:|Конец:) ")
+ISO_DATETIME_R = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}")
+# Значение метки заканчивается на этом символе (None — в конце строки).
+ANSWER_VALUE_END = {"Событие:": ".", "Задача:": ".", "Начало:": "К", "Конец:": None}
+
+
+def scan_answer_value(text, start, stop):
+    """Значение после метки: до символа stop (не пустое) или до конца строки."""
+    line_end = text.find("\n", start)
+    if line_end == -1:
+        line_end = len(text)
+    if stop is None:
+        return text[start:line_end]
+    end = text.find(stop, start + 1, line_end)
+    return text[start:end] if end != -1 else None
+
+
+def parse_event_answer(text):
+    """Разбирает JSON-ответ модели на одно сообщение.
+
+    Ответ старым текстом с метками («Событие: ... Начало: ...») тоже принимается, чтобы не
+    переспрашивать модель, если она проигнорировала формат.
+    """
+    logger.debug("LLM answer: %s", text)
+    try:
+        value = llm_answer.decode_json(text)
+    except llm_answer.AnswerFormatError:
+        if ANSWER_LABEL_R.search(text):
+            return parse_event_text(text)
+        raise
+    if isinstance(value, list) and value:
+        value = value[0]
+    return event_from_answer(value)
+
+
+def parse_event_list(text):
+    """Разбирает JSON-массив пунктов; пункты без названия пропускаются."""
+    logger.debug("LLM answer: %s", text)
+    try:
+        items = llm_answer.answer_items(llm_answer.decode_json(text))
+    except llm_answer.AnswerFormatError:
+        if ANSWER_LABEL_R.search(text):
+            return [parse_event_text(line) for line in text.splitlines() if ANSWER_LABEL_R.search(line)]
+        raise
+    events = []
+    for item in items:
+        try:
+            events.append(event_from_answer(item))
+        except llm_answer.AnswerFormatError:
+            metrics.PARSE_FAILURES.inc(stage="llm_item")
+    return events
+
+
+def event_from_answer(item):
+    """Пункт JSON-ответа -> {"title", "start_time", "end_time"} со временем в ISO."""
+    try:
+        title, start_time, end_time = llm_answer.event_fields(item)
+    except llm_answer.AnswerFormatError:
+        metrics.PARSE_FAILURES.inc(stage="title")
+        raise
+    if start_time is None:
+        metrics.PARSE_FAILURES.inc(stage="start_time")
+    try:
+        start_time = answer_time(start_time)
+        end_time = answer_time(end_time)
+    except ValueError:
+        metrics.PARSE_FAILURES.inc(stage="date")
+        raise
+    return {"title": title, "start_time": start_time, "end_time": end_time}
 
-    if "не указан" in time_str:
-        return None
 
-    if "послезавтра" in time_str:
-        target_date = now + timedelta(days=DELTA_AFTER_TOMORROW)
-    elif "завтра" in time_str:
-        target_date = now + timedelta(days=DELTA_TOMORROW)
-    elif "сегодня" in time_str:
-        target_date = now
-    elif re.search(WEEKDAY_R, time_str):
-        weekdays = {
-            "понедельник": 0, "вторник": 1, "среда": 2, "четверг": 3,
-            "пятница": 4, "суббота": 5, "воскресенье": 6
-        }
-        weekday_name = re.search(WEEKDAY_R, time_str).group(1)
-        target_weekday = weekdays[weekday_name]
-        current_weekday = now.weekday()
-
-        days_ahead = (target_weekday - current_weekday + DAYS_IN_WEEK) % DAYS_IN_WEEK
-        if days_ahead == 0:
-            days_ahead = DAYS_IN_WEEK
-        target_date = now + timedelta(days=days_ahead)
-    elif re.search(MONTH_R, time_str):
-        match = re.search(MONTH_R, time_str)
-        day, month_name = match.groups()
-        month = MONTH_MAP[month_name]
-        year_match = re.search(r"\d{4} года", time_str)
-        if year_match:
-            year = int(year_match.group().split()[0])
+def extract_event_list(request_text, google_todoist, progress=None):
+    """Разбирает сообщение с одним или несколькими пунктами за один запрос к LLM."""
+    items = fast_parser.split_items(request_text)
+    if len(items) == 1:
+        return [extract_event_details(request_text, google_todoist, progress)]
+    local = [fast_parser.parse_locally(item, google_todoist) for item in items]
+    if all(result is not None for result in local):
+        return local
+    if progress is not None:
+        progress.waiting()
+    payload = form_payload(request_text, google_todoist, batch=True)
+    with metrics.LLM_LATENCY.time(path="llm_batch"):
+        return complete_llm(payload, parse_event_list)
+
+
+def format_batch_report(titles, results):
+    """Одно сообщение с итогом пакетного добавления."""
+    done = sum("error" not in result for result in results)
+    lines = [f"Добавлено {done} из {len(results)}:"]
+    for title, result in zip(titles, results):
+        if "error" in result:
+            lines.append(f"❌ {title} — {result['error']}")
         else:
-            if not (month == 12 and 23 <= int(day) <= 31):
-                year = now.year + 1
-            else:
-                year = now.year
+            lines.append(f"✅ {title}")
+    return "\n".join(lines)
 
-        target_date = datetime(year, month, int(day), 0, 0, 0)
-    elif re.match(DATE_R, time_str):
-        try:
-            data = time_str.split(",") if "," in time_str else time_str.split(" ")
-            day, month, year = map(int, data[0].split("."))
-            if len(data) > 1 and re.match(TIME_R, data[1].strip()):
-                hour, minute = map(int, data[1].strip().split(":"))
-            else:
-                hour, minute = 0, 0
-            dt = datetime(year, month, day, hour, minute)
-            return dt.replace(microsecond=0).isoformat()
-        except ValueError as e:
-            raise ValueError(f"Ошибка обработки времени: {time_str}. Причина: {e}")
-    else:
-        raise ValueError(f"Не удалось распознать дату: {time_str}")
-    time_match = re.search(TIME_R, time_str)
-    if time_match:
-        target_time = time_match.group()
-        target_datetime = datetime.strptime(f"{target_date.date()} {target_time}", "%Y-%m-%d %H:%M")
-    else:
-        target_datetime = target_date.replace(hour=0, minute=0)
 
-    print(f"Processed datetime: {target_datetime.replace(microsecond=0).isoformat()}")
-    return target_datetime.replace(microsecond=0).isoformat()
+def answer_time(value):
+    """ISO-время из ответа как есть (без хвоста «. » перед следующей меткой), иначе разбор фразы."""
+    if not value:
+        return value
+    iso = ISO_DATETIME_R.match(value)
+    return iso.group() if iso else convert_relative_to_iso(value)
 
 
+def parse_event_text(text):
+    """Парсинг ответа Yandex LLM в старом текстовом формате за один проход по меткам."""
+    values = {}
+    for match in ANSWER_LABEL_R.finditer(text):
+        label = match.group(1)
+        kind = "title" if label in ("Событие:", "Задача:") else label
+        if kind not in values:
+            value = scan_answer_value(text, match.end(), ANSWER_VALUE_END[label])
+            if value is not None:
+                values[kind] = value
+
+    if "title" not in values:
+        metrics.PARSE_FAILURES.inc(stage="title")
+    if "Начало:" not in values:
+        metrics.PARSE_FAILURES.inc(stage="start_time")
+    title = values.get("title", "Неизвестное событие")
+    start_time = values.get("Начало:")
+    end_time = values.get("Конец:")
+
+    try:
+        start_time = answer_time(start_time)
+        end_time = answer_time(end_time)
+    except ValueError:
+        metrics.PARSE_FAILURES.inc(stage="date")
+        raise
+    return {"title": title, "start_time": start_time, "end_time": end_time}
+
 
 def process_event_details_nlp(message):
     chat_id = message.chat.id
-    google_token = get_user_token(chat_id, "google_token")
-    user_input = message.text.strip()
+    google_token = get_google_token(chat_id)
+    rule, user_input = split_recurrence(message.text.strip())
+    progress = progress_message(chat_id)
 
     try:
-        event_data = extract_event_details(user_input, True)
+        event_list = extract_event_list(user_input, True, progress)
+        if len(event_list) > 1:
+            create_google_events(chat_id, google_token, event_list, progress, rule)
+            return
+
+        event_data = event_list[0] if event_list else {}
 
         if not event_data.get("title") or not event_data.get("start_time"):
-            bot.send_message(chat_id,
-                             "Не удалось распознать событие. Пожалуйста, введите информацию о событии еще раз.")
-            bot.register_next_step_handler(message, process_event_details_nlp)
+            progress.finish("Не удалось распознать событие. Пожалуйста, введите информацию о событии еще раз.")
+            expect_reply(message, "event_details")
             return
 
+        event_data = align_to_rule(event_data, rule)
         summary = event_data.get("title")
         start_time_str = event_data.get("start_time")
         end_time_str = event_data.get("end_time") or start_time_str
@@ -620,31 +1254,266 @@ def process_event_details_nlp(message):
         start_time = googleapi.parse_datetime_to_iso(start_time_str)
         end_time = googleapi.parse_datetime_to_iso(end_time_str)
 
-        event = googleapi.create_google_event(google_token, summary, start_time, end_time)
-        bot.send_message(chat_id, f"Событие '{event['summary']}' успешно добавлено в Google Calendar.")
+        event = googleapi.create_google_event(google_token, summary, start_time, end_time, rule and rule.rrule())
+        google_event_created(google_token, event, rule)
+        remind_about_event(chat_id, event, rule)
+        progress.finish(f"Событие '{event['summary']}' успешно добавлено в Google Calendar."
+                        + format_recurrence(rule, start_time_str))
     except Exception as e:
-        bot.send_message(chat_id, f"Ошибка: {str(e)}")
+        progress.finish(f"Ошибка: {str(e)}")
+
+
+def create_google_events(chat_id, google_token, event_list, progress, rule=None):
+    """Пакетное добавление событий: одно сообщение с итогом по каждому событию.
+
+    С rule каждое событие создается одно, с правилом повторения.
+    """
+    titles = [event.get("title") or "Неизвестное событие" for event in event_list]
+    results = [None] * len(event_list)
+    to_create = []
+    for idx, event in enumerate(event_list):
+        if not event.get("start_time"):
+            results[idx] = {"error": "не удалось распознать время"}
+            continue
+        try:
+            event = align_to_rule(event, rule)
+            start_time = googleapi.parse_datetime_to_iso(event["start_time"])
+            end_time = googleapi.parse_datetime_to_iso(event.get("end_time") or event["start_time"])
+        except ValueError as e:
+            results[idx] = {"error": str(e)}
+            continue
+        to_create.append((idx, (titles[idx], start_time, end_time, rule and rule.rrule())))
+
+    if to_create:
+        created = googleapi.create_google_events_batch(google_token, [event for _, event in to_create])
+        for (idx, _), result in zip(to_create, created):
+            results[idx] = result
+            if "error" not in result:
+                google_event_created(google_token, result, rule)
+                remind_about_event(chat_id, result, rule)
+    progress.finish(format_batch_report(titles, results))
+
+
+# ======== Сборка приложения ========
+CONVERSATION_STEPS = {
+    "project_selection": process_project_selection,
+    "task_creation": process_task_creation,
+    "task_deletion": process_task_deletion,
+    "event_details": process_event_details_nlp,
+    "event_deletion": process_event_deletion,
+}
+
+
+def register_handlers(bot):
+    """Хендлеры в порядке проверки: сначала ответ на шаг диалога, затем команды и остальное."""
+    bot.register_message_handler(continue_conversation, func=in_conversation)
+    bot.register_message_handler(start, commands=['start'])
+    bot.register_message_handler(help_command, commands=['help'])
+    bot.register_message_handler(setup, commands=['setup'])
+    bot.register_message_handler(handle_google_token, func=lambda message: message.text.startswith("Google:"))
+    bot.register_message_handler(handle_todoist_token, func=lambda message: message.text.startswith("Todoist:"))
+    bot.register_message_handler(add_task, commands=['add_task'])
+    bot.register_message_handler(list_tasks, commands=['list_tasks'])
+    bot.register_callback_query_handler(
+        turn_page, func=lambda call: listing.parse_page_callback(call.data or "") is not None)
+    bot.register_message_handler(delete_task, commands=['delete_task'])
+    bot.register_message_handler(add_event, commands=['add_event'])
+    bot.register_message_handler(list_events, commands=['list_events'])
+    bot.register_message_handler(delete_event_start, commands=['delete_event'])
+
+
+def configure_apis():
+    """Адреса внешних API из config; задаются при создании бота и приложения, а не при импорте."""
+    if TODOIST_API_URL:
+        todoistapi.configure(TODOIST_API_URL)
+    if GOOGLE_API_ENDPOINT:
+        googleapi.configure(GOOGLE_API_ENDPOINT)
+
+
+def create_bot():
+    """Создает TeleBot с зарегистрированными хендлерами."""
+    import telebot
+
+    configure_apis()
+    if TELEGRAM_API_URL:
+        telebot.apihelper.API_URL = TELEGRAM_API_URL.rstrip("/") + "/bot{0}/{1}"
+    bot = telebot.TeleBot(BOT_TOKEN, threaded=False)
+    register_handlers(bot)
+    return bot
+
+
+def create_app():
+    """Создает FastAPI-приложение: OAuth-колбэки, webhook Telegram и /metrics."""
+    from fastapi import FastAPI, Request, Response
+    from telebot.types import Update
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        yield
+        await async_transport.aclose()
+
+    configure_apis()
+    app = FastAPI(lifespan=lifespan)
+
+    @app.get("/callback/google")
+    async def google_callback(request: Request):
+        """Обрабатывает колбэк от Google."""
+        code = request.query_params.get("code")
+        if code:
+            tokens = await exchange_google_code_for_token_async(code)
+            if not tokens:
+                return {"message": "Google authorisation error"}
+            chat_id = chat_from_google_state(request.query_params.get("state"))
+            if chat_id is None:
+                return {"message": "Google authorisation completed!", "token": tokens["access_token"]}
+            await async_transport.run_blocking(google_connected, chat_id, tokens)
+            return {"message": "Google authorisation completed! Вернитесь в Telegram."}
+        return {"message": "Authorisation code missing"}
+
+    @app.get("/callback/todoist")
+    async def todoist_callback(request: Request):
+        """Обрабатывает колбэк от Todoist."""
+        code = request.query_params.get("code")
+        if code:
+            token = await exchange_todoist_code_for_token_async(code)
+            if token:
+                return {"message": "Todoist authorisation completed!", "token": token}
+            return {"message": "Todoist authorisation error"}
+        return {"message": "Authorisation code missing"}
+
+    @app.post(WEBHOOK_PATH)
+    async def telegram_webhook(request: Request):
+        """Принимает апдейт Telegram в режиме webhook и сразу отвечает, обработка идет в диспетчере."""
+        dispatcher = get_dispatcher()
+        if not dispatcher.running:
+            return Response(status_code=404)
+        if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+            return Response(status_code=403)
+        update = Update.de_json((await request.body()).decode("utf-8"))
+        if not dispatcher.submit(update, block=False):
+            # Telegram повторит доставку позже — это и есть backpressure в режиме webhook.
+            return Response(status_code=503)
+        return {"ok": True}
+
+    @app.get("/metrics")
+    def metrics_endpoint():
+        include = None
+        if isinstance(globals().get("dispatcher"), ProcessDispatcher):
+            # Гистограммы и счетчики с метками (задержки, ошибки разбора) копятся в воркерах и сюда не
+            # доходят: чтобы не отдавать нули, остаются только суммы WorkerCounters и метрики диспетчера.
+            def include(metric):
+                return isinstance(metric, metrics.Callback)
+        return Response(metrics.REGISTRY.render(include), media_type=metrics.CONTENT_TYPE)
+
+    return app
 
 
 # ======== Запуск сервера и бота ========
-def start_fastapi():
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+def configure_logging():
+    logging.basicConfig(level=getattr(config, "LOG_LEVEL", "INFO"),
+                        format="%(asctime)s %(levelname)s %(process)d %(name)s: %(message)s")
+
+
+def create_server():
+    import uvicorn
+
+    return uvicorn.Server(uvicorn.Config(get_app(), host="0.0.0.0", port=8000))
 
 
 def start_telegram_bot():
-    bot.polling(none_stop=True)
+    """Запускает прием апдейтов: webhook, если задан WEBHOOK_URL, иначе long polling."""
+    bot = get_bot()
+    dispatcher = get_dispatcher()
+    if WEBHOOK_URL:
+        dispatcher.start()
+        bot.set_webhook(url=WEBHOOK_URL + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET,
+                        max_connections=dispatcher.workers)
+    else:
+        bot.remove_webhook()
+        run_polling(bot, dispatcher)
+
+
+def start_background():
+    """Отправка сообщений, напоминания и обновление токенов Google — там, где обрабатываются апдейты."""
+    get_outbox().start()
+    get_reminders().start()
+    get_google_tokens().start()
+
+
+def stop_background():
+    """Досылает очередь сообщений и закрывает хранилища, которые успели открыться."""
+    reminders = globals().get("reminders")
+    if reminders is not None:
+        reminders.stop(timeout=1)
+    for name in ("llm_batcher", "outbox"):
+        running = globals().get(name)
+        if running is not None:
+            running.stop(timeout=5)
+    for name in ("token_store", "conversations", "google_tokens"):
+        store = globals().get(name)
+        if store is not None:
+            store.close()
+
+
+def use_worker_processes(processes):
+    """Апдейты уходят в processes процессов-воркеров, а этот процесс только принимает их (polling/webhook)."""
+    # Диалоги в Redis хранить не умеем (см. create_conversation_store), токены — умеем.
+    shared = ((TOKEN_STORE_URL, ("sqlite:///", "redis://", "rediss://")), (CONVERSATION_STORE_URL, ("sqlite:///",)))
+    for url, prefixes in shared:
+        if not url.startswith(prefixes):
+            raise ValueError(f"Хранилище {url} не общее для процессов, WORKER_PROCESSES > 1 с ним не работает")
+    globals()["dispatcher"] = ProcessDispatcher(run_worker, processes,
+                                                counter_names=[name for name, *_ in WORKER_METRICS])
+
+
+def run_worker(index, processes, updates, counters):
+    """Процесс-воркер: обрабатывает апдейты своих чатов, отправляет им ответы и напоминания."""
+    configure_logging()
+    # Останавливает воркер родитель (None в очереди); Ctrl+C при этом приходит всей группе процессов.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    # Лимит Telegram общий на бота — делим его между процессами.
+    globals()["outbox"] = Outbox(send_message, global_rate=GLOBAL_RATE / processes)
+    get_llm_batcher().max_concurrency = max(1, YANDEX_MAX_CONCURRENCY // processes)
+    globals()["reminders"] = ReminderScheduler(ReminderStore(REMINDERS_PATH, partition=(index, processes)),
+                                               send_reminder)
+    globals()["google_tokens"] = create_google_tokens(
+        GoogleCredentialStore(GOOGLE_CREDENTIALS_PATH, partition=(index, processes)))
+    start_background()
+    try:
+        serve_process(index, updates, counters, get_dispatcher(), read_worker_metrics)
+    finally:
+        stop_background()
 
 
-if __name__ == "__main__":
-    threading.Thread(target=start_fastapi).start()
-    threading.Thread(target=start_telegram_bot).start()
+def shutdown(timeout=SHUTDOWN_TIMEOUT):
+    """Перестает принимать апдейты, дорабатывает уже принятые и досылает ответы."""
+    dispatcher = globals().get("dispatcher")
+    if dispatcher is not None:
+        dispatcher.stop(timeout=timeout)
+    stop_background()
+
 
+def main():
+    configure_logging()
+    if WORKER_PROCESSES > 1:
+        use_worker_processes(WORKER_PROCESSES)
+    else:
+        start_background()
+    stopping = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda signum, frame: stopping.set())
+
+    server = create_server()
+    threading.Thread(target=server.run, name="fastapi").start()
+    # Long polling может висеть в get_updates до 20 с — ждать его при остановке незачем.
+    threading.Thread(target=start_telegram_bot, name="telegram", daemon=True).start()
 
-def handle_exit(signum, frame):
-    bot.stop_polling()
-    print("Завершение работы приложения...")
-    exit(0)
+    stopping.wait()
+    logger.info("Завершение работы приложения...")
+    server.should_exit = True
+    shutdown()
 
 
-signal.signal(signal.SIGINT, handle_exit)
-signal.signal(signal.SIGTERM, handle_exit)
+if __name__ == "__main__":
+    main()
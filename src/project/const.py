@@ -7,6 +7,8 @@ DEFAULT_COMPLETION_OPTIONS = {
     "temperature": 0.2,
     "maxTokens": 2000
 }
+# Ответ на одно сообщение — короткий JSON: этого хватает с запасом, а зациклившийся ответ обрывается быстро.
+EXTRACTION_MAX_TOKENS = 200
 DELTA_AFTER_TOMORROW = 2
 DELTA_TOMORROW = 1
 HTTP_NO_CONTENT = 204
@@ -19,19 +21,41 @@ MONTH_MAP = {
 MONTH_R = r"(\d{1,2}) (января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)"
 TIME_R = r"\d{1,2}:\d{2}"
 WEEKDAY_R = r"(понедельник|вторник|среда|четверг|пятница|суббота|воскресенье)"
+WEEKDAY_FORMS = {
+    "понедельник": "понедельник", "понедельника": "понедельник", "вторник": "вторник", "вторника": "вторник",
+    "среда": "среда", "среду": "среда", "среды": "среда", "четверг": "четверг", "четверга": "четверг",
+    "пятница": "пятница", "пятницу": "пятница", "пятницы": "пятница", "суббота": "суббота",
+    "субботу": "суббота", "субботы": "суббота", "воскресенье": "воскресенье", "воскресенья": "воскресенье"
+}
+JSON_ANSWER_FORMAT = (
+    "Отвечай только JSON без пояснений и без разметки, формат ответа: "
+    '{"title": "<название>", "start": "<дата (день) и время>", "end": "<дата (день) и время>"}, '
+    "если время не указано, пиши null. "
+)
 SYSTEM_MESSAGE_GOOGLE = (
     "Ты - ассистент, который помогает планировать события. "
     "Анализируй запросы пользователя и возвращай следующую информацию: "
-    "1. Название события, 2. Время начала события, 3. Время окончания события (если указано, то обрабатывай как ближйшее время от начала, а если нет, то пиши 'не указан'). "
+    "1. Название события, 2. Время начала события, 3. Время окончания события (если указано, то обрабатывай как ближйшее время от начала, а если нет, то пиши null). "
     "Если в запросе встречаются слова с началом 'пол', то обрабатывай его в часах, например: 'полпервого' = 12:30;"
-    "Формат ответа: 'Событие: <название>. Начало: <дата (день) и время>. Конец: <дата (день) и время>'."
-    "Запросы, в которых есть слово 'Послезавтра' обрабатывай как дату, которая будет послезавтра."
-)
+    "Запросы, в которых есть слово 'Послезавтра' обрабатывай как дату, которая будет послезавтра. "
+) + JSON_ANSWER_FORMAT
 SYSTEM_MESSAGE_TODOIST = (
     "Ты - ассистент, который помогает планировать задачи. "
     "Анализируй запросы пользователя и возвращай следующую информацию: "
-    "1. Название задачи, 2. Время начала задачи, 3. Время окончания задачи (если указано, то обрабатывай как ближйшее время от начала, а если нет, то пиши 'не указан'). "
+    "1. Название задачи, 2. Время начала задачи, 3. Время окончания задачи (если указано, то обрабатывай как ближйшее время от начала, а если нет, то пиши null). "
     "Если в запросе встречаются слова с началом 'пол', то обрабатывай его в часах, например: 'полпервого' = 12:30"
-    "Формат ответа: 'Задача: <название>. Начало: <дата (день) и время>. Конец: <дата (день) и время>'."
-    "Запросы, в которых есть слово 'Послезавтра' обрабатывай как дату, которая будет послезавтра."
+    "Запросы, в которых есть слово 'Послезавтра' обрабатывай как дату, которая будет послезавтра. "
+) + JSON_ANSWER_FORMAT
+BATCH_INSTRUCTION = (
+    "В запросе может быть несколько пунктов. Верни JSON-массив, в нем по объекту в указанном формате на каждый пункт. "
+    "Дата, указанная в начале запроса, относится ко всем пунктам, если у пункта нет своей даты."
+)
+SYSTEM_MESSAGE_GOOGLE_BATCH = SYSTEM_MESSAGE_GOOGLE + BATCH_INSTRUCTION
+SYSTEM_MESSAGE_TODOIST_BATCH = SYSTEM_MESSAGE_TODOIST + BATCH_INSTRUCTION
+MULTI_INSTRUCTION = (
+    "Запрос содержит несколько независимых сообщений разных пользователей, каждое начинается с номера "
+    "в квадратных скобках. Разбери каждое отдельно и верни JSON-объект, где ключ — номер сообщения, "
+    'а значение — ответ на него в указанном формате, например: {"1": {...}, "2": {...}}.'
 )
+SYSTEM_MESSAGE_GOOGLE_MULTI = SYSTEM_MESSAGE_GOOGLE + MULTI_INSTRUCTION
+SYSTEM_MESSAGE_TODOIST_MULTI = SYSTEM_MESSAGE_TODOIST + MULTI_INSTRUCTION
@@ -0,0 +1,99 @@
+import json
+import sqlite3
+import threading
+import time
+
+# Незаконченный диалог (выбор проекта, номер задачи для удаления) забывается через сутки.
+CONVERSATION_TTL = 24 * 3600
+
+
+class MemoryConversationStore:
+    """Состояние диалогов в памяти процесса. Подходит для тестов и запуска в одном процессе."""
+
+    def __init__(self, ttl=CONVERSATION_TTL):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def set(self, chat_id, step, args=()):
+        with self._lock:
+            self._data[chat_id] = (step, list(args), time.time() + self.ttl)
+
+    def has(self, chat_id):
+        state = self._data.get(chat_id)
+        return state is not None and state[2] > time.time()
+
+    def pop(self, chat_id):
+        """Забирает шаг диалога: (step, args) или None. Каждый шаг срабатывает один раз."""
+        with self._lock:
+            state = self._data.pop(chat_id, None)
+        if state is None or state[2] <= time.time():
+            return None
+        return state[0], state[1]
+
+    def close(self):
+        pass
+
+
+class SQLiteConversationStore:
+    """Состояние диалогов в SQLite (WAL), общее для всех процессов-воркеров на машине.
+
+    Кэша нет: шаг диалога могут записать и прочитать разные процессы (например, после
+    перезапуска с другим числом воркеров). args хранятся в JSON.
+    """
+
+    def __init__(self, path, ttl=CONVERSATION_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "chat_id INTEGER PRIMARY KEY, step TEXT NOT NULL, args TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        self._connection.commit()
+        self.purge_expired()
+
+    def set(self, chat_id, step, args=()):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO conversations (chat_id, step, args, expires) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (chat_id) DO UPDATE SET step = excluded.step, args = excluded.args, "
+                "expires = excluded.expires",
+                (chat_id, step, json.dumps(list(args), ensure_ascii=False), time.time() + self.ttl),
+            )
+
+    def has(self, chat_id):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM conversations WHERE chat_id = ? AND expires > ?", (chat_id, time.time())
+            ).fetchone()
+        return row is not None
+
+    def pop(self, chat_id):
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "DELETE FROM conversations WHERE chat_id = ? RETURNING step, args, expires", (chat_id,)
+            ).fetchone()
+        if row is None or row[2] <= time.time():
+            return None
+        return row[0], json.loads(row[1])
+
+    def purge_expired(self):
+        with self._lock, self._connection:
+            return self._connection.execute("DELETE FROM conversations WHERE expires <= ?", (time.time(),)).rowcount
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def create_conversation_store(url):
+    """Создает хранилище по адресу: memory:// или sqlite:///path.db."""
+    if url == "memory://":
+        return MemoryConversationStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteConversationStore(url[len("sqlite:///"):])
+    raise ValueError(f"Неизвестное хранилище диалогов: {url}")
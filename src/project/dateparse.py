@@ -0,0 +1,120 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+import logging
+import re
+
+from src.project.const import (
+    DELTA_TOMORROW,
+    DELTA_AFTER_TOMORROW,
+    WEEKDAY_R,
+    DAYS_IN_WEEK,
+    MONTH_R,
+    DATE_R,
+    MONTH_MAP,
+    TIME_R
+)
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = {
+    "понедельник": 0, "вторник": 1, "среда": 2, "четверг": 3,
+    "пятница": 4, "суббота": 5, "воскресенье": 6
+}
+RELATIVE_DAYS = {"послезавтра": DELTA_AFTER_TOMORROW, "завтра": DELTA_TOMORROW, "сегодня": 0}
+
+# Порядок альтернатив важен: в одной позиции «послезавтра» должно победить «завтра»,
+# а полная дата dd.mm.yyyy — время и «день месяц».
+_TOKEN_R = re.compile(
+    "(?P<unset>не указан)"
+    "|(?P<relative>послезавтра|завтра|сегодня)"
+    f"|(?P<date>{DATE_R})"
+    f"|(?P<month>{MONTH_R.replace('(', '(?:')})"
+    r"|(?P<year>\d{4}) года"
+    f"|(?P<weekday>{WEEKDAY_R[1:-1]})"
+    f"|(?P<time>{TIME_R})"
+)
+_TIME_R = re.compile(TIME_R)
+
+DateTokens = namedtuple("DateTokens", "unset relative weekday month year date date_at_start time")
+
+
+def tokenize(time_str):
+    """Один проход по строке: первое вхождение каждого вида токена."""
+    found = {}
+    date_at_start = False
+    for match in _TOKEN_R.finditer(time_str):
+        kind = match.lastgroup
+        if kind == "relative":
+            # «послезавтра» важнее «завтра», «завтра» важнее «сегодня» независимо от порядка в строке.
+            previous = found.get("relative")
+            if previous is None or RELATIVE_DAYS[match.group()] > RELATIVE_DAYS[previous]:
+                found["relative"] = match.group()
+            continue
+        if kind not in found:
+            found[kind] = match.group() if kind != "year" else match.group("year")
+            if kind == "date":
+                date_at_start = match.start() == 0
+    return DateTokens(
+        unset="unset" in found,
+        relative=found.get("relative"),
+        weekday=found.get("weekday"),
+        month=found.get("month"),
+        year=found.get("year"),
+        date=found.get("date"),
+        date_at_start=date_at_start,
+        time=found.get("time"),
+    )
+
+
+def _parse_numeric_date(time_str):
+    try:
+        data = time_str.split(",") if "," in time_str else time_str.split(" ")
+        day, month, year = map(int, data[0].split("."))
+        if len(data) > 1 and _TIME_R.match(data[1].strip()):
+            hour, minute = map(int, data[1].strip().split(":"))
+        else:
+            hour, minute = 0, 0
+        return datetime(year, month, day, hour, minute)
+    except ValueError as e:
+        raise ValueError(f"Ошибка обработки времени: {time_str}. Причина: {e}")
+
+
+def parse_datetime(time_str, now=None):
+    """Разбирает фразу с датой и временем в datetime (None для «не указан»)."""
+    tokens = tokenize(time_str)
+    if tokens.unset:
+        return None
+
+    now = now or datetime.now()
+    if tokens.relative:
+        target_date = now + timedelta(days=RELATIVE_DAYS[tokens.relative])
+    elif tokens.weekday:
+        days_ahead = (WEEKDAYS[tokens.weekday] - now.weekday() + DAYS_IN_WEEK) % DAYS_IN_WEEK
+        target_date = now + timedelta(days=days_ahead or DAYS_IN_WEEK)
+    elif tokens.month:
+        day, month_name = tokens.month.split(" ")
+        month = MONTH_MAP[month_name]
+        if tokens.year:
+            year = int(tokens.year)
+        else:
+            # Ближайшая такая дата: в этом году, если она еще не прошла.
+            year = now.year if (month, int(day)) >= (now.month, now.day) else now.year + 1
+        target_date = datetime(year, month, int(day), 0, 0, 0)
+    elif tokens.date_at_start:
+        return _parse_numeric_date(time_str)
+    else:
+        raise ValueError(f"Не удалось распознать дату: {time_str}")
+
+    if tokens.time:
+        hour, minute = map(int, tokens.time.split(":"))
+        return datetime.combine(target_date.date(), datetime.min.time()).replace(hour=hour, minute=minute)
+    return target_date.replace(hour=0, minute=0)
+
+
+def convert_relative_to_iso(time_str, now=None):
+    result = parse_datetime(time_str, now)
+    if result is None:
+        return None
+    iso = result.replace(microsecond=0).isoformat()
+    logger.debug("Converted %r to %s", time_str, iso)
+    return iso
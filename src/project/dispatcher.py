@@ -0,0 +1,273 @@
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+
+DEFAULT_WORKERS = 8
+DEFAULT_QUEUE_SIZE = 100
+POLLING_ERROR_DELAY = 3
+SHUTDOWN_TIMEOUT = 30
+# Как часто процесс-воркер публикует свои счетчики для /metrics родителя.
+COUNTERS_INTERVAL = 1.0
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def get_update_chat_id(update):
+    """Возвращает chat_id, к которому относится апдейт Telegram (0, если чата нет)."""
+    for name in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        message = getattr(update, name, None)
+        if message is not None:
+            return message.chat.id
+    callback_query = getattr(update, "callback_query", None)
+    if callback_query is not None:
+        if callback_query.message is not None:
+            return callback_query.message.chat.id
+        return callback_query.from_user.id
+    return 0
+
+
+def chat_partition(chat_id, partitions):
+    """Номер процесса-воркера для чата. Та же формула в SQL: abs(chat_id) % partitions."""
+    return abs(chat_id) % partitions
+
+
+class UpdateDispatcher:
+    """Пул воркеров: апдейты разных чатов обрабатываются параллельно,
+    апдейты одного чата — строго по очереди в одном и том же воркере.
+
+    У каждого воркера своя ограниченная очередь; когда она заполнена,
+    submit блокируется, и источник апдейтов (polling/webhook) притормаживает.
+    """
+
+    def __init__(self, handler, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+                 chat_id_getter=get_update_chat_id):
+        if workers < 1:
+            raise ValueError("Количество воркеров должно быть больше нуля")
+        self._handler = handler
+        self._chat_id_getter = chat_id_getter
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._threads = []
+        self._running = threading.Event()
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def workers(self):
+        return len(self._queues)
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    def qsize(self):
+        """Суммарное число апдейтов, ожидающих обработки."""
+        return sum(q.qsize() for q in self._queues)
+
+    def start(self):
+        if self.running:
+            return
+        self._running.set()
+        self._threads = [
+            threading.Thread(target=self._work, args=(q,), name=f"update-worker-{i}", daemon=True)
+            for i, q in enumerate(self._queues)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, update, block=True, timeout=None):
+        """Ставит апдейт в очередь воркера его чата. Возвращает False, если очередь переполнена."""
+        chat_id = self._chat_id_getter(update)
+        try:
+            self._queues[hash(chat_id) % len(self._queues)].put(update, block=block, timeout=timeout)
+        except queue.Full:
+            self.rejected += 1
+            return False
+        return True
+
+    def stop(self, wait=True, timeout=None):
+        """Останавливает воркеры после обработки уже принятых апдейтов."""
+        if not self.running:
+            return
+        self._running.clear()
+        for q in self._queues:
+            q.put(_STOP)
+        if wait:
+            for thread in self._threads:
+                thread.join(timeout)
+
+    def _work(self, updates):
+        while True:
+            update = updates.get()
+            if update is _STOP:
+                return
+            try:
+                self._handler(update)
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Ошибка при обработке апдейта")
+
+
+class WorkerCounters:
+    """Целочисленные счетчики процессов-воркеров в общей памяти: у каждого воркера своя строка,
+    родитель суммирует их для /metrics."""
+
+    def __init__(self, context, processes, names):
+        self.names = tuple(names)
+        self._values = context.Array("q", len(self.names) * processes)
+
+    def publish(self, index, values):
+        """values — {имя: число}; имена, которых нет в names, пропускаются."""
+        width = len(self.names)
+        for offset, name in enumerate(self.names):
+            if name in values:
+                self._values[index * width + offset] = int(values[name])
+
+    def total(self, name):
+        return sum(self._values[self.names.index(name)::len(self.names)])
+
+
+class ProcessDispatcher:
+    """То же, что UpdateDispatcher, но воркеры — отдельные процессы, чтобы использовать все ядра.
+
+    Апдейты одного чата всегда попадают в один процесс (chat_partition), поэтому внутри
+    процесса сохраняются порядок сообщений чата и его кэши. Процесс запускается как
+    target(index, processes, updates, counters, *args) и обычно сразу вызывает serve_process.
+    counters — WorkerCounters с processed, failed и counter_names. Упавший процесс
+    перезапускается при следующем апдейте для него.
+    """
+
+    def __init__(self, target, processes, queue_size=DEFAULT_QUEUE_SIZE, args=(),
+                 chat_id_getter=get_update_chat_id, counter_names=()):
+        if processes < 1:
+            raise ValueError("Количество процессов должно быть больше нуля")
+        # spawn: воркер начинает с чистого интерпретатора, без унаследованных потоков и соединений с базами.
+        self._context = multiprocessing.get_context("spawn")
+        self._target = target
+        self._args = tuple(args)
+        self._chat_id_getter = chat_id_getter
+        self._queues = [self._context.Queue(maxsize=queue_size) for _ in range(processes)]
+        self._processes = [None] * processes
+        self.counters = WorkerCounters(self._context, processes, ("processed", "failed") + tuple(counter_names))
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self.submitted = 0
+        self.rejected = 0
+        self.restarted = 0
+
+    @property
+    def workers(self):
+        return len(self._queues)
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    @property
+    def processed(self):
+        return self.counters.total("processed")
+
+    @property
+    def failed(self):
+        return self.counters.total("failed")
+
+    def qsize(self):
+        return sum(q.qsize() for q in self._queues)
+
+    def start(self):
+        if self.running:
+            return
+        self._running.set()
+        for index in range(self.workers):
+            self._spawn(index)
+
+    def _spawn(self, index):
+        process = self._context.Process(target=self._target, name=f"update-process-{index}",
+                                        args=(index, self.workers, self._queues[index], self.counters) + self._args)
+        process.start()
+        self._processes[index] = process
+
+    def submit(self, update, block=True, timeout=None):
+        index = chat_partition(self._chat_id_getter(update), self.workers)
+        with self._lock:
+            if self.running and not self._processes[index].is_alive():
+                logger.error("Процесс-воркер %s завершился (код %s), перезапуск",
+                             index, self._processes[index].exitcode)
+                self.restarted += 1
+                self._spawn(index)
+        try:
+            self._queues[index].put(update, block=block, timeout=timeout)
+        except queue.Full:
+            self.rejected += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def stop(self, wait=True, timeout=SHUTDOWN_TIMEOUT):
+        """Просит процессы доработать принятые апдейты и выйти; не успевшие за timeout убиваются."""
+        if not self.running:
+            return
+        self._running.clear()
+        for q in self._queues:
+            q.put(None)
+        if not wait:
+            return
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning("Процесс %s не завершился за %s с, останавливаю принудительно", process.name, timeout)
+                process.kill()
+                process.join()
+
+
+def serve_process(index, updates, counters, dispatcher, read_counters=None):
+    """Цикл процесса-воркера: апдейты из очереди ProcessDispatcher обрабатывает локальный dispatcher.
+
+    Раз в COUNTERS_INTERVAL публикует в counters processed, failed и то, что вернет read_counters().
+    Возвращается после None от родителя, когда все принятые апдейты обработаны.
+    """
+    def publish():
+        values = read_counters() if read_counters is not None else {}
+        counters.publish(index, {**values, "processed": dispatcher.processed, "failed": dispatcher.failed})
+
+    dispatcher.start()
+    try:
+        while True:
+            try:
+                update = updates.get(timeout=COUNTERS_INTERVAL)
+            except queue.Empty:
+                pass
+            else:
+                if update is None:
+                    break
+                dispatcher.submit(update)
+            publish()
+    finally:
+        dispatcher.stop()
+        publish()
+
+
+def run_polling(bot, dispatcher, long_polling_timeout=20, allowed_updates=None):
+    """Long polling: забирает апдейты у Telegram и передает их в диспетчер."""
+    dispatcher.start()
+    offset = None
+    while dispatcher.running:
+        try:
+            updates = bot.get_updates(offset=offset, timeout=long_polling_timeout,
+                                      long_polling_timeout=long_polling_timeout,
+                                      allowed_updates=allowed_updates)
+        except Exception:
+            logger.exception("Ошибка при получении апдейтов, повтор через %s с", POLLING_ERROR_DELAY)
+            time.sleep(POLLING_ERROR_DELAY)
+            continue
+        for update in updates:
+            if not dispatcher.running:
+                return
+            dispatcher.submit(update)
+            offset = update.update_id + 1
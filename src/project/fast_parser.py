@@ -0,0 +1,167 @@
+import re
+from datetime import datetime
+
+from src.project.const import MONTH_R, WEEKDAY_FORMS
+from src.project.dateparse import convert_relative_to_iso
+
+CONFIDENCE_THRESHOLD = 0.8
+
+# «пн 10:00 созвон»: сокращения дней недели, иначе «пн» остается в названии.
+_WEEKDAY_ABBREVIATIONS = {"пн": "понедельник", "вт": "вторник", "ср": "среда", "чт": "четверг", "пт": "пятница",
+                          "сб": "суббота", "вс": "воскресенье"}
+_WEEKDAYS = {**WEEKDAY_FORMS, **_WEEKDAY_ABBREVIATIONS}
+
+_RELATIVE_R = re.compile(r"\b(послезавтра|завтра|сегодня)\b", re.IGNORECASE)
+_WEEKDAY_R = re.compile(r"\b(?:(?:во?|до|на|к|ко)\s+)?(" + "|".join(_WEEKDAYS) + r")\b\.?", re.IGNORECASE)
+_MONTH_R = re.compile(r"\b(?:(?:до|на|к)\s+)?" + MONTH_R + r"(?:\s+(\d{4})(?:\s+года)?)?\b", re.IGNORECASE)
+_DATE_R = re.compile(r"\b(?:(?:до|на|к)\s+)?(\d{1,2}\.\d{1,2}\.\d{4})\b")
+_TIME_RANGE_R = re.compile(r"\b(?:с\s+)?(\d{1,2}:\d{2})\s*(?:-|–|до)\s*(\d{1,2}:\d{2})\b", re.IGNORECASE)
+_TIME_R = re.compile(r"(?:\b(?:в|к|до|на)\s+)?\b(\d{1,2}:\d{2})\b", re.IGNORECASE)
+_VAGUE_R = re.compile(
+    r"\b(?:утр\w*|вечер\w*|дн[её]м|ночью|полдень|полночь|через|после|кажд\w+|ежедневно|еженедельно"
+    r"|пол(?:первого|второго|третьего|четвертого|пятого|шестого|седьмого|восьмого|девятого|десятого"
+    r"|одиннадцатого|двенадцатого)"
+    r"|в\s+\d{1,2}(?![\d:.]))\b",
+    re.IGNORECASE,
+)
+_COMMAND_R = re.compile(
+    r"^(?:пожалуйста\s+)?(?:поставь|напомни(?:\s+мне)?|запиши|добавь|создай|запланируй|сделай(?:\s+задачу)?)\s+",
+    re.IGNORECASE,
+)
+_ITEMS_HEADER_R = re.compile(r"^\s*([^,;\n:]*[^\d\s,;\n:])\s*:\s+")
+_ITEM_SEPARATOR_R = re.compile(r"\s*[,;\n]\s*")
+# Нумерация «1) ... 2) ...» делит и одну строку; «1.» и маркеры «-», «•» — только в начале строки.
+_ITEM_NUMBER_R = re.compile(r"(?:^|\s)\d{1,2}\)\s+")
+_ITEM_MARKER_R = re.compile(r"^\s*(?:\d{1,2}[.)]|[-•*])\s+")
+_EDGE_WORDS = {"в", "во", "на", "до", "к", "с", "и", "про"}
+
+
+class FastPathStats:
+    def __init__(self):
+        self.hits = 0
+        self.fallbacks = 0
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.fallbacks
+        return self.hits / total if total else 0.0
+
+
+stats = FastPathStats()
+
+
+def _extract_title(text, spans):
+    for start, end in sorted(spans, reverse=True):
+        text = text[:start] + " " + text[end:]
+    text = _COMMAND_R.sub("", " ".join(text.split()))
+    words = text.strip(" .,!?;:-–—'\"«»").split()
+    while words and words[0].lower() in _EDGE_WORDS:
+        words.pop(0)
+    while words and words[-1].lower() in _EDGE_WORDS:
+        words.pop()
+    return " ".join(words).strip(" .,!?;:-–—'\"«»")
+
+
+def split_items(text):
+    """Делит сообщение-список на пункты; общий заголовок («завтра: ...») добавляется к каждому пункту.
+
+    Списком считается только явная разметка: заголовок с двоеточием (после него пункты идут через
+    запятую, точку с запятой или с новой строки), строки или нумерация «1) ... 2) ...». Запятые в
+    обычной фразе («встреча с Иваном, Петром завтра») сообщение не делят.
+    """
+    header = ""
+    match = _ITEMS_HEADER_R.match(text)
+    if match:
+        header = match.group(1)
+        text = text[match.end():]
+        lines = _ITEM_SEPARATOR_R.split(text)
+    else:
+        lines = text.splitlines()
+    items = [_ITEM_MARKER_R.sub("", part).strip() for line in lines for part in _ITEM_NUMBER_R.split(line)]
+    items = [item for item in items if item]
+    if len(items) < 2:
+        return [f"{header}: {text}" if header else text]
+    return [f"{item} {header}" if header else item for item in items]
+
+
+def _date_phrase(text, spans):
+    """Находит дату в тексте и возвращает фразу в формате convert_relative_to_iso и число найденных дат."""
+    found = []
+    for match in _RELATIVE_R.finditer(text):
+        found.append(match.group(1).lower())
+        spans.append(match.span())
+    for match in _WEEKDAY_R.finditer(text):
+        found.append(_WEEKDAYS[match.group(1).lower()])
+        spans.append(match.span())
+    for match in _MONTH_R.finditer(text):
+        day, month, year = match.groups()
+        found.append(f"{day} {month.lower()} {year} года" if year else f"{day} {month.lower()}")
+        spans.append(match.span())
+    for match in _DATE_R.finditer(text):
+        found.append(match.group(1) + ",")
+        spans.append(match.span())
+    return (found[0] if found else None), len(found)
+
+
+def mentions_date(text):
+    """Есть ли в тексте дата, которую понимает локальный разбор."""
+    return _date_phrase(text, [])[1] > 0
+
+
+def _clock_passed(clock, now):
+    hour, minute = map(int, clock.split(":"))
+    return (hour, minute) < (now.hour, now.minute)
+
+
+def analyze(text, google_todoist, now=None):
+    """Разбирает простое сообщение без LLM. Возвращает (результат или None, уверенность 0..1)."""
+    now = now or datetime.now()
+    if _VAGUE_R.search(text):
+        return None, 0.2
+
+    spans = []
+    date_phrase, dates_found = _date_phrase(text, spans)
+    start_clock = end_clock = None
+    range_match = _TIME_RANGE_R.search(text)
+    if range_match:
+        start_clock, end_clock = range_match.groups()
+        spans.append(range_match.span())
+        times_found = len(_TIME_R.findall(text[:range_match.start()] + text[range_match.end():])) + 1
+    else:
+        times = list(_TIME_R.finditer(text))
+        times_found = len(times)
+        if times:
+            start_clock = times[0].group(1)
+            spans.append(times[0].span())
+
+    if dates_found > 1 or times_found > 1:
+        return None, 0.3
+    if not date_phrase and not start_clock:
+        return None, 0.0
+    if google_todoist and not start_clock:
+        return None, 0.4
+
+    title = _extract_title(text, spans)
+    if len(title) < 2:
+        return None, 0.0
+
+    if not date_phrase:
+        # Только время: сегодня, а если это время уже прошло — завтра.
+        date_phrase = "завтра" if start_clock and _clock_passed(start_clock, now) else "сегодня"
+    try:
+        start_time = convert_relative_to_iso(f"{date_phrase} {start_clock}" if start_clock else date_phrase, now)
+        end_time = convert_relative_to_iso(f"{date_phrase} {end_clock}", now) if end_clock else None
+    except ValueError:
+        return None, 0.0
+    confidence = 1.0 if dates_found else 0.9
+    return {"title": title, "start_time": start_time, "end_time": end_time}, confidence
+
+
+def parse_locally(text, google_todoist, threshold=CONFIDENCE_THRESHOLD, now=None):
+    """Возвращает результат локального разбора, если уверенность достаточна, иначе None (нужен LLM)."""
+    result, confidence = analyze(text, google_todoist, now)
+    if result is not None and confidence >= threshold:
+        stats.hits += 1
+        return result
+    stats.fallbacks += 1
+    return None
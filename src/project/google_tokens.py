@@ -0,0 +1,220 @@
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.project import metrics
+from src.project.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Токены обновляются заранее: за REFRESH_AHEAD секунд до истечения (Google выдает их на час).
+REFRESH_AHEAD = 300
+# Если фоновое обновление не успело, токен обновляется при обращении, когда жить ему осталось меньше этого.
+MIN_VALIDITY = 60
+REFRESH_INTERVAL = 30
+BATCH_SIZE = 500
+REFRESH_CONCURRENCY = 8
+# Google возвращает его, если refresh token отозван или истек: повторять бесполезно.
+INVALID_GRANT = "invalid_grant"
+
+
+class GoogleCredentialStore:
+    """Токены Google в SQLite (WAL): access token, refresh token и время истечения.
+
+    Кэша нет, поэтому store общий для процессов-воркеров: callback OAuth принимает главный
+    процесс, а токен читает воркер. partition=(index, count) — как у ReminderStore: воркер
+    обновляет в фоне только токены своих чатов.
+    """
+
+    def __init__(self, path, partition=None):
+        self.path = path
+        self._partition_sql, self._partition_params = "", ()
+        if partition is not None:
+            index, count = partition
+            self._partition_sql, self._partition_params = " AND abs(chat_id) % ? = ?", (count, index)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS google_credentials ("
+            "chat_id INTEGER PRIMARY KEY, access_token TEXT NOT NULL, refresh_token TEXT NOT NULL, "
+            "expires REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS google_credentials_expires "
+                                 "ON google_credentials (expires)")
+        self._connection.commit()
+
+    def put(self, chat_id, access_token, refresh_token, expires):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO google_credentials (chat_id, access_token, refresh_token, expires) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (chat_id) DO UPDATE SET access_token = excluded.access_token, "
+                "refresh_token = excluded.refresh_token, expires = excluded.expires",
+                (chat_id, access_token, refresh_token, expires),
+            )
+
+    def get(self, chat_id):
+        """(access_token, refresh_token, expires) или None."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT access_token, refresh_token, expires FROM google_credentials WHERE chat_id = ?", (chat_id,)
+            ).fetchone()
+
+    def expiring_before(self, until, limit):
+        """Чаты, чьи токены истекают раньше until, — сначала самые срочные."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT chat_id FROM google_credentials WHERE expires < ? AND refresh_token != ''"
+                f"{self._partition_sql} ORDER BY expires LIMIT ?", (until, *self._partition_params, limit)
+            ).fetchall()
+        return [chat_id for chat_id, in rows]
+
+    def delete(self, chat_id):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM google_credentials WHERE chat_id = ?", (chat_id,))
+
+    def count(self):
+        with self._lock:
+            return self._connection.execute(
+                f"SELECT COUNT(*) FROM google_credentials WHERE 1{self._partition_sql}", self._partition_params
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class GoogleTokenRefresher:
+    """Держит access token Google свежими.
+
+    request_token(refresh_token) — запрос к token endpoint, ответ Google как dict ({"error": ...} при
+    ошибке). Фоновый поток раз в interval секунд обновляет пачкой (до batch_size, в concurrency потоков)
+    токены, которые истекут в ближайшие ahead секунд. access_token() обновляет токен сам, если фон не
+    успел. Обновление одного чата идет через SingleFlight: одновременные запросы ждут один вызов.
+    on_refreshed(chat_id, old_token, new_token) — чтобы сбросить то, что закэшировано по старому токену.
+    """
+
+    def __init__(self, store, request_token, on_refreshed=None, ahead=REFRESH_AHEAD, interval=REFRESH_INTERVAL,
+                 batch_size=BATCH_SIZE, concurrency=REFRESH_CONCURRENCY):
+        self.store = store
+        self._request_token = request_token
+        self._on_refreshed = on_refreshed
+        self.ahead = ahead
+        self.interval = interval
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self._flight = SingleFlight(error_ttl=0)
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.refreshed = 0
+        self.failed = 0
+        self.revoked = 0
+
+    @property
+    def shared(self):
+        """Обращения, которые дождались уже идущего обновления того же чата."""
+        return self._flight.shared
+
+    def save(self, chat_id, token_response):
+        """Сохраняет ответ token endpoint на обмен кода авторизации."""
+        refresh_token = token_response.get("refresh_token")
+        if not refresh_token:
+            # Без refresh token (повторное согласие без prompt=consent) обновить нечего — оставляем старый.
+            current = self.store.get(chat_id)
+            refresh_token = current[1] if current else ""
+        self.store.put(chat_id, token_response["access_token"], refresh_token,
+                       time.time() + token_response.get("expires_in", 3600))
+
+    def access_token(self, chat_id):
+        """Действующий access token чата или None, если Google не подключен."""
+        row = self.store.get(chat_id)
+        if row is None:
+            return None
+        access_token, _, expires = row
+        if expires - time.time() > MIN_VALIDITY:
+            return access_token
+        return self.refresh(chat_id)
+
+    def refresh(self, chat_id):
+        return self._flight.do(chat_id, self._refresh, chat_id)
+
+    def _refresh(self, chat_id):
+        row = self.store.get(chat_id)
+        if row is None:
+            return None
+        access_token, refresh_token, expires = row
+        # Пока ждали своей очереди, токен мог обновить другой поток или процесс.
+        if expires - time.time() > self.ahead or not refresh_token:
+            return access_token
+        started = time.perf_counter()
+        try:
+            response = self._request_token(refresh_token)
+        except Exception as e:
+            response = {"error": str(e)}
+        metrics.GOOGLE_TOKEN_REFRESH.observe(time.perf_counter() - started)
+        if "error" in response or "access_token" not in response:
+            error = response.get("error", "no access_token")
+            with self._lock:
+                self.failed += 1
+            if error == INVALID_GRANT:
+                with self._lock:
+                    self.revoked += 1
+                metrics.GOOGLE_TOKEN_REFRESH_FAILURES.inc(reason=INVALID_GRANT)
+                logger.warning("Refresh token Google для чата %s отозван", chat_id)
+                self.store.delete(chat_id)
+                return None
+            metrics.GOOGLE_TOKEN_REFRESH_FAILURES.inc(reason="error")
+            logger.warning("Не удалось обновить токен Google для чата %s: %s", chat_id, error)
+            # Старый токен еще может быть жив; следующая попытка — на следующем проходе.
+            return access_token if expires > time.time() else None
+        new_token = response["access_token"]
+        self.store.put(chat_id, new_token, response.get("refresh_token") or refresh_token,
+                       time.time() + response.get("expires_in", 3600))
+        with self._lock:
+            self.refreshed += 1
+        if self._on_refreshed is not None:
+            self._on_refreshed(chat_id, access_token, new_token)
+        return new_token
+
+    def refresh_expiring(self):
+        """Один проход: обновляет токены, истекающие в ближайшие ahead секунд. Возвращает число чатов."""
+        total = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="google-refresh") as pool:
+            while not self._stopped.is_set():
+                chat_ids = self.store.expiring_before(time.time() + self.ahead, self.batch_size)
+                failed = self.failed
+                list(pool.map(self.refresh, chat_ids))
+                total += len(chat_ids)
+                # Полная пачка без ошибок — возможно, за ней есть еще; с ошибками ждем следующего прохода.
+                if len(chat_ids) < self.batch_size or self.failed != failed:
+                    break
+        return total
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="google-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.refresh_expiring()
+            except Exception:
+                logger.exception("Ошибка фонового обновления токенов Google")
+            self._stopped.wait(self.interval)
+
+    def close(self):
+        self.stop(timeout=5)
+        self.store.close()
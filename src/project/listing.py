@@ -0,0 +1,85 @@
+from datetime import datetime
+from itertools import islice
+
+MESSAGE_LIMIT = 4096
+PAGE_SIZE = 10
+# Длинные названия обрезаются, чтобы страница из PAGE_SIZE строк гарантированно влезла в одно сообщение.
+LINE_LIMIT = 300
+DATE_FORMAT = "%d %B %Y года %H:%M"
+
+
+def clip(line, limit=LINE_LIMIT):
+    return line if len(line) <= limit else line[:limit - 1] + "…"
+
+
+def format_due(task):
+    """Срок задачи Todoist для вывода; due может отсутствовать или быть None."""
+    due = task.get("due") or {}
+    value = due.get("datetime") or due.get("date")
+    if not value:
+        return due.get("string")
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).strftime(DATE_FORMAT)
+    except ValueError:
+        return due.get("string") or value
+
+
+def format_task(number, task):
+    due = format_due(task)
+    if due:
+        return clip(f"{number}. {task['content']} (дата: {due})")
+    return clip(f"{number}. {task['content']}")
+
+
+def format_event(number, event):
+    start = event["start"].get("dateTime", event["start"].get("date"))
+    formatted_date = datetime.fromisoformat(start).strftime(DATE_FORMAT)
+    return clip(f"{number}. {event.get('summary', 'Без названия')} ({formatted_date})")
+
+
+def chunk_lines(lines, header="", limit=MESSAGE_LIMIT):
+    """Склеивает строки в сообщения не длиннее limit, разрывая только между строками."""
+    chunk = header
+    for line in lines:
+        line = clip(line, limit - 1)
+        if chunk and len(chunk) + len(line) + 1 > limit:
+            yield chunk
+            chunk = ""
+        chunk += line + "\n"
+    if chunk:
+        yield chunk
+
+
+def get_page(items, page, page_size=PAGE_SIZE):
+    """Берет из итерируемого items только строки страницы page и одну следующую (чтобы знать, есть ли еще)."""
+    return list(islice(items, page * page_size, (page + 1) * page_size + 1))
+
+
+def page_keyboard(kind, page, has_next):
+    """Кнопки «назад/вперед»; весь курсор — это номер страницы в callback_data."""
+    from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton("◀", callback_data=f"{kind}:{page - 1}"))
+    if has_next:
+        buttons.append(InlineKeyboardButton("▶", callback_data=f"{kind}:{page + 1}"))
+    if not buttons:
+        return None
+    return InlineKeyboardMarkup().row(*buttons)
+
+
+def parse_page_callback(data):
+    """'tasks:3' -> ('tasks', 3); None для чужих callback_data."""
+    kind, _, page = data.partition(":")
+    if not page.isdigit():
+        return None
+    return kind, int(page)
+
+
+def render_page(title, rows, formatter, page, page_size=PAGE_SIZE):
+    """rows — результат get_page. Возвращает (текст, есть ли следующая); (None, False) для пустой страницы."""
+    if not rows:
+        return None, False
+    first = page * page_size + 1
+    lines = (formatter(number, item) for number, item in enumerate(rows[:page_size], start=first))
+    return title + "\n" + "\n".join(lines), len(rows) > page_size
@@ -0,0 +1,169 @@
+import json
+
+# Типографские кавычки, которые модель иногда ставит вместо прямых.
+QUOTES = str.maketrans({"“": '"', "”": '"', "„": '"', "«": '"', "»": '"', "‘": "'", "’": "'"})
+# Так модель пишет, что время не указано.
+EMPTY_VALUES = ("", "null", "none", "не указан", "не указано", "нет")
+
+_decoder = json.JSONDecoder()
+
+
+class AnswerFormatError(ValueError):
+    """Ответ модели не удалось разобрать как JSON нужной схемы даже после локальной починки."""
+
+
+def _json_start(text):
+    starts = [index for index in (text.find("{"), text.find("[")) if index != -1]
+    return min(starts) if starts else -1
+
+
+def decode_json(text):
+    """Первый JSON-объект или массив в ответе модели.
+
+    Сначала ответ разбирается как есть, затем с первой скобки (пояснения и ```json вокруг
+    отбрасываются), и только потом чинится локально — см. repair_json.
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    start = _json_start(text)
+    if start == -1:
+        raise AnswerFormatError(f"В ответе модели нет JSON: {text[:200]!r}")
+    tail = text[start:]
+    for candidate in (tail, repair_json(tail)):
+        try:
+            return _decoder.raw_decode(candidate)[0]
+        except ValueError:
+            continue
+    raise AnswerFormatError(f"Ответ модели не разбирается как JSON: {text[:200]!r}")
+
+
+def complete_json(text):
+    """Законченное JSON-значение из начала потокового ответа или None, если оно еще не дописано."""
+    start = _json_start(text)
+    if start == -1:
+        return None
+    try:
+        return _decoder.raw_decode(text, start)[0]
+    except ValueError:
+        return None
+
+
+def partial_fields(text):
+    """Поля недописанного объекта для показа пользователю: {"title": "созв"} и т.п."""
+    start = _json_start(text)
+    if start == -1:
+        return {}
+    tail = text[start:]
+    while True:
+        try:
+            value = _decoder.raw_decode(repair_json(tail))[0]
+            break
+        except ValueError:
+            # Недописанное null/число: отступаем к предыдущему полю.
+            comma = tail.rfind(",")
+            if comma == -1:
+                return {}
+            tail = tail[:comma]
+    if isinstance(value, list):
+        value = value[0] if value else {}
+    if not isinstance(value, dict):
+        return {}
+    return {key: field for key, field in value.items() if isinstance(field, str) and field.strip()}
+
+
+def repair_json(text):
+    """Чинит типичные ошибки модели за один проход по символам.
+
+    Типографские и одинарные кавычки, переводы строк внутри строк, висячие запятые,
+    обрезанный по maxTokens хвост (незакрытые строка и скобки). Текст после первого
+    законченного значения отбрасывается.
+    """
+    out, closers = [], []
+    quote = None
+    escaped = False
+    for char in text.translate(QUOTES):
+        if quote is not None:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote, char = None, '"'
+            elif char == '"':
+                char = '\\"'
+            elif char == "\n":
+                char = "\\n"
+            out.append(char)
+            continue
+        if char in "\"'":
+            quote, char = char, '"'
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]":
+            _drop_trailing_comma(out)
+            if closers:
+                char = closers.pop()
+            out.append(char)
+            if not closers:
+                break
+            continue
+        out.append(char)
+    if quote is not None:
+        out.append('"')
+    _drop_trailing_comma(out)
+    if out and out[-1] == ":":
+        out.append("null")
+    out.extend(reversed(closers))
+    return "".join(out)
+
+
+def _drop_trailing_comma(out):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def optional_text(value, field):
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise AnswerFormatError(f"Поле {field} должно быть строкой: {value!r}")
+    value = value.strip()
+    return None if value.lower() in EMPTY_VALUES else value
+
+
+def event_fields(item):
+    """Проверяет пункт ответа {"title": str, "start": str | null, "end": str | null}.
+
+    Возвращает (title, start, end); пустые и «не указан» значения времени — None.
+    """
+    if not isinstance(item, dict):
+        raise AnswerFormatError(f"Пункт ответа должен быть объектом: {item!r}")
+    title = optional_text(item.get("title"), "title")
+    if title is None:
+        raise AnswerFormatError(f"В пункте ответа нет названия: {item!r}")
+    return title, optional_text(item.get("start"), "start"), optional_text(item.get("end"), "end")
+
+
+def answer_items(value):
+    """Список пунктов из ответа на пакетный запрос: массив или один объект."""
+    if isinstance(value, dict):
+        return [value]
+    if isinstance(value, list):
+        return value
+    raise AnswerFormatError(f"Ожидался JSON-массив пунктов: {value!r}")
+
+
+def numbered_items(value):
+    """Ответы на несколько независимых сообщений: {"1": {...}, "2": {...}} -> {1: {...}, 2: {...}}."""
+    if not isinstance(value, dict):
+        raise AnswerFormatError(f"Ожидался JSON-объект с номерами сообщений: {value!r}")
+    items = {}
+    for key, item in value.items():
+        number = key.strip(" []")
+        if number.isdigit():
+            items[int(number)] = item
+    return items
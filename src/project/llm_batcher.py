@@ -0,0 +1,202 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+MAX_BATCH = 8
+# Дольше этого запрос не ждет соседей по пачке.
+MAX_WAIT = 0.02
+# Одновременные запросы к Yandex GPT (квота на папку).
+MAX_CONCURRENCY = 10
+EWMA_ALPHA = 0.2
+
+logger = logging.getLogger(__name__)
+
+
+def _ewma(old, value):
+    return value if old is None else old + EWMA_ALPHA * (value - old)
+
+
+class _Pending:
+    __slots__ = ("text", "futures", "progress", "enqueued")
+
+    def __init__(self, text, enqueued):
+        self.text = text
+        self.futures = []
+        self.progress = []
+        self.enqueued = enqueued
+
+    def report(self, partial):
+        for progress in self.progress:
+            try:
+                progress(partial)
+            except Exception:
+                logger.warning("Ошибка в обработчике промежуточного ответа", exc_info=True)
+
+
+class LLMBatcher:
+    """Склеивает одновременные запросы к LLM в один вызов complete(kind, texts) -> [результат или исключение].
+
+    kind — тип промпта (в одну пачку попадают только запросы с одинаковым промптом),
+    одинаковые тексты в очереди делят один пункт пачки. Одновременно идет не больше
+    max_concurrency вызовов. Размер пачки подстраивается под нагрузку: это число запросов,
+    которые в среднем приходят за время одного вызова в расчете на слот (закон Литтла).
+    При слабой нагрузке он равен 1, и запрос уходит сразу; иначе первый запрос ждет соседей
+    не дольше max_wait, а пока все слоты заняты, очередь копится сама и уходит пачками до max_batch.
+
+    Если задан stream(kind, text, progress) -> результат, запрос с обработчиком progress, который
+    ушел один (нагрузка низкая), выполняется потоково: progress получает промежуточные ответы.
+    """
+
+    def __init__(self, complete, max_batch=MAX_BATCH, max_wait=MAX_WAIT, max_concurrency=MAX_CONCURRENCY,
+                 stream=None):
+        self._complete = complete
+        self._stream = stream
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_concurrency = max_concurrency
+        self._queues = {}
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._executor = None
+        self._in_flight = 0
+        self._last_arrival = None
+        self._arrival_interval = None
+        self._latency = None
+        self.requests = 0
+        self.deduplicated = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.streamed = 0
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def qsize(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm")
+        self._thread = threading.Thread(target=self._run, name="llm-batcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Отправляет то, что уже в очереди, и дожидается ответов."""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def submit(self, kind, text, progress=None):
+        """Ставит текст в очередь; возвращает concurrent.futures.Future с результатом разбора."""
+        future = Future()
+        if not self._running:
+            self.start()
+        with self._condition:
+            now = time.monotonic()
+            if self._last_arrival is not None:
+                self._arrival_interval = _ewma(self._arrival_interval, now - self._last_arrival)
+            self._last_arrival = now
+            self.requests += 1
+            queue = self._queues.setdefault(kind, OrderedDict())
+            pending = queue.get(text)
+            if pending is None:
+                pending = queue[text] = _Pending(text, now)
+            else:
+                self.deduplicated += 1
+            pending.futures.append(future)
+            if progress is not None:
+                pending.progress.append(progress)
+            self._condition.notify()
+        return future
+
+    def __call__(self, kind, text, progress=None):
+        return self.submit(kind, text, progress).result()
+
+    def target_batch(self, now):
+        if self._arrival_interval is None or self._latency is None:
+            return 1
+        # Если запросы перестали приходить, затишье сразу уменьшает пачку.
+        interval = max(self._arrival_interval, now - self._last_arrival, 1e-6)
+        return max(1, min(self.max_batch, round(self._latency / interval / self.max_concurrency)))
+
+    def _oldest_queue(self):
+        oldest = None
+        for kind, queue in self._queues.items():
+            head = next(iter(queue.values()))
+            if oldest is None or head.enqueued < oldest[2].enqueued:
+                oldest = kind, queue, head
+        return oldest
+
+    def _next_batch(self):
+        """Ждет, пока можно отправить пачку. None — очередь пуста и батчер остановлен."""
+        while True:
+            oldest = self._oldest_queue()
+            if oldest is None:
+                if not self._running:
+                    return None
+                self._condition.wait()
+                continue
+            if self._in_flight >= self.max_concurrency:
+                self._condition.wait()
+                continue
+            kind, queue, head = oldest
+            now = time.monotonic()
+            target = self.target_batch(now)
+            if self._running and len(queue) < target:
+                window = min(self.max_wait, (target - 1) * self._arrival_interval)
+                wait = head.enqueued + window - now
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+            batch = [queue.popitem(last=False)[1] for _ in range(min(len(queue), self.max_batch))]
+            if not queue:
+                del self._queues[kind]
+            self._in_flight += 1
+            return kind, batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                item = self._next_batch()
+            if item is None:
+                return
+            self._executor.submit(self._execute, *item)
+
+    def _execute(self, kind, batch):
+        started = time.monotonic()
+        streamed = len(batch) == 1 and self._stream is not None and batch[0].progress
+        try:
+            if streamed:
+                results = [self._stream(kind, batch[0].text, batch[0].report)]
+            else:
+                results = self._complete(kind, [pending.text for pending in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Ожидалось {len(batch)} результатов, получено {len(results)}")
+        except Exception as e:
+            results = [e] * len(batch)
+        with self._condition:
+            self._latency = _ewma(self._latency, time.monotonic() - started)
+            self._in_flight -= 1
+            self.batches += 1
+            self.batched_requests += len(batch)
+            self.streamed += bool(streamed)
+            self._condition.notify()
+        for pending, result in zip(batch, results):
+            for future in pending.futures:
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
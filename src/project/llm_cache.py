@@ -0,0 +1,182 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from src.project.const import DATE_R, MONTH_R, WEEKDAY_FORMS
+
+DEFAULT_MAX_SIZE = 10_000
+DEFAULT_TTL = 24 * 3600
+
+_PUNCTUATION = str.maketrans({char: " " for char in ",!?;\"'«»()"})
+_TRAILING_DOT_R = re.compile(r"\.(?!\d)")
+_ABSOLUTE_DATE_R = re.compile(f"{DATE_R}|{MONTH_R}")
+_RELATIVE_DAYS = {"сегодня", "завтра", "послезавтра"}
+# «через 2 часа», «через 15 минут»: результат зависит от момента запроса, а не от дня.
+_MOMENT_R = re.compile(r"\b(?:через|час\w*|полчаса|минут\w*)\b")
+
+
+def normalize_request(text):
+    """Приводит запрос к каноническому виду: регистр, ё, пунктуация, формы дней недели."""
+    text = _TRAILING_DOT_R.sub(" ", text.lower().replace("ё", "е").translate(_PUNCTUATION))
+    return " ".join(WEEKDAY_FORMS.get(word, word) for word in text.split())
+
+
+def anchor_kind(normalized):
+    """Как результат зависит от текущей даты.
+
+    moment — «через 2 часа»: зависит от момента запроса, такие ответы не кэшируются;
+    absolute — дата указана явно, результат не зависит от дня запроса;
+    weekday — «в пятницу»: результат зависит от дня недели запроса;
+    relative — «завтра», «сегодня», «послезавтра»: сдвигается вместе с текущим днем;
+    today — остальное («созвон 20-го», «в 15:00»): ответ верен только в день запроса.
+    """
+    if _MOMENT_R.search(normalized):
+        return "moment"
+    if _ABSOLUTE_DATE_R.search(normalized):
+        return "absolute"
+    words = normalized.split()
+    if any(word in WEEKDAY_FORMS.values() for word in words):
+        return "weekday"
+    if any(word in _RELATIVE_DAYS for word in words):
+        return "relative"
+    return "today"
+
+
+def _shift(value, days):
+    if value is None or not days:
+        return value
+    return (datetime.fromisoformat(value) + timedelta(days=days)).isoformat()
+
+
+def _is_iso(value):
+    if value is None:
+        return True
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+class LLMCache:
+    """Кэш результатов разбора запросов LLM с учетом относительных дат.
+
+    Ключ — (нормализованный текст, google_todoist). Для запросов с «завтра»/«сегодня»
+    результат хранится вместе с датой, от которой он посчитан, и при попадании
+    сдвигается на текущую дату. Для дней недели в ключ добавляется текущий день недели,
+    для запросов без явной даты — сама дата. «Через 2 часа» не кэшируется.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL, disk_path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT, anchor TEXT, created REAL)"
+            )
+            self._disk.commit()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _key(self, request_text, google_todoist, today):
+        normalized = normalize_request(request_text)
+        kind = anchor_kind(normalized)
+        if kind == "weekday":
+            anchor = f"wd{today.weekday()}"
+        elif kind == "today":
+            anchor = today.isoformat()
+        else:
+            anchor = kind
+        return json.dumps([normalized, bool(google_todoist), anchor], ensure_ascii=False), kind
+
+    def get(self, request_text, google_todoist, today=None):
+        """Возвращает результат для текущей даты или None."""
+        today = today or date.today()
+        key, kind = self._key(request_text, google_todoist, today)
+        if kind == "moment":
+            with self._lock:
+                self.misses += 1
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[2] >= self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is None and self._disk is not None:
+            entry = self._load(key, now)
+            if entry is not None:
+                with self._lock:
+                    self._store(key, entry)
+                    self.hits += 1
+                    self.disk_hits += 1
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        result, anchor, _ = entry
+        days = (today - anchor).days if kind in ("relative", "weekday") else 0
+        return {
+            "title": result["title"],
+            "start_time": _shift(result["start_time"], days),
+            "end_time": _shift(result["end_time"], days),
+        }
+
+    def put(self, request_text, google_todoist, result, today=None):
+        """Сохраняет результат; ответы с неразобранными датами не кэшируются."""
+        if not (_is_iso(result.get("start_time")) and _is_iso(result.get("end_time"))):
+            return
+        today = today or date.today()
+        key, kind = self._key(request_text, google_todoist, today)
+        if kind == "moment":
+            return
+        entry = (dict(result), today, time.time())
+        with self._lock:
+            self._store(key, entry)
+            if self._disk is not None:
+                with self._disk:
+                    self._disk.execute(
+                        "INSERT OR REPLACE INTO llm_cache (key, value, anchor, created) VALUES (?, ?, ?, ?)",
+                        (key, json.dumps(entry[0], ensure_ascii=False), today.isoformat(), entry[2]),
+                    )
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _load(self, key, now):
+        with self._lock:
+            row = self._disk.execute(
+                "SELECT value, anchor, created FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or now - row[2] >= self.ttl:
+            return None
+        return json.loads(row[0]), date.fromisoformat(row[1]), row[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._disk is not None:
+                with self._disk:
+                    self._disk.execute("DELETE FROM llm_cache")
@@ -0,0 +1,183 @@
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_text(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """Набор метрик, который отдается на /metrics в текстовом формате Prometheus."""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self, include=None):
+        """Текст для /metrics; include(metric) -> bool отбирает метрики."""
+        with self._lock:
+            metrics = [metric for metric in self._metrics if include is None or include(metric)]
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_label_text(self.labelnames, key)} {_number(value)}" for key, value in values]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        series = self._series.get(tuple(labels[name] for name in self.labelnames))
+        return series[2] if series else 0
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._series.items())
+        lines = []
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _label_text(self.labelnames + ("le",), key + (_number(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Callback:
+    """Метрика, значение которой читается из уже существующего счетчика в момент выдачи /metrics."""
+
+    def __init__(self, name, documentation, read, kind="gauge", registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self._read = read
+        registry.register(self)
+
+    def samples(self):
+        return [f"{self.name} {_number(self._read())}"]
+
+
+def timed(histogram, **labels):
+    """Декоратор: время вызова функции (в том числе async) попадает в histogram."""
+    def decorator(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with histogram.time(**labels):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ======== Метрики бота ========
+API_LATENCY = Histogram("smart_todo_api_request_seconds", "Время запросов к Google Calendar и Todoist.",
+                        ("service", "operation"))
+LLM_LATENCY = Histogram("smart_todo_extract_event_details_seconds",
+                        "Время разбора сообщения: локально, из кэша или через LLM.", ("path",))
+HANDLER_LATENCY = Histogram("smart_todo_handler_seconds", "Время обработки апдейта по командам.", ("command",))
+PARSE_FAILURES = Counter("smart_todo_parse_failures_total", "Ошибки разбора сообщений и ответов LLM.",
+                         ("stage",))
+FIRST_FEEDBACK = Histogram("smart_todo_first_feedback_seconds",
+                           "Время от начала обработки сообщения до первого отклика: заглушки или первых полей.",
+                           ("kind",))
+GOOGLE_TOKEN_REFRESH = Histogram("smart_todo_google_token_refresh_seconds",
+                                 "Время обновления access token Google по refresh token.")
+GOOGLE_TOKEN_REFRESH_FAILURES = Counter("smart_todo_google_token_refresh_failures_total",
+                                        "Неудачные обновления токенов Google: отозванные и прочие ошибки.",
+                                        ("reason",))
+LLM_STREAMS = Counter("smart_todo_llm_streams_total",
+                      "Потоковые ответы Yandex GPT: прочитанные до конца и прерванные, когда все поля уже пришли.",
+                      ("outcome",))
@@ -0,0 +1,249 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram: около 30 сообщений в секунду на бота и не чаще раза в секунду в один чат.
+GLOBAL_RATE = 30
+CHAT_RATE = 1
+MESSAGE_LIMIT = 4096
+TOO_MANY_REQUESTS = 429
+DEFAULT_RETRY_AFTER = 1
+MAX_RETRIES = 5
+# Сколько корзин простаивающих чатов держать, прежде чем чистить их.
+IDLE_BUCKETS = 10_000
+# Outbox.call(wait=False) возвращает это вместо результата, если лимит сейчас исчерпан.
+SKIPPED = object()
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        """Через сколько секунд можно будет взять токен."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def hold(self, now, pause):
+        """Не выдает токенов ближайшие pause секунд (после 429 с retry_after)."""
+        self._refill(now)
+        self.tokens = min(self.tokens, 1 - pause * self.rate)
+
+    def is_full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+def retry_after(error):
+    """Пауза из ответа 429 (ApiTelegramException.result_json) или None, если это не 429."""
+    if getattr(error, "error_code", None) != TOO_MANY_REQUESTS:
+        return None
+    result = getattr(error, "result_json", None) or {}
+    return result.get("parameters", {}).get("retry_after", DEFAULT_RETRY_AFTER)
+
+
+class Outbox:
+    """Очередь исходящих сообщений с одним отправляющим потоком.
+
+    Хендлеры не ждут Telegram: send() кладет сообщение в очередь чата и сразу возвращается.
+    Подряд идущие сообщения в один чат, которые еще не ушли, склеиваются в одно. Отправка
+    идет с учетом общего лимита бота и лимита на чат (token bucket), а на 429 сообщение
+    откладывается на retry_after. Пока поток не запущен, send() отправляет сразу.
+
+    Вызовы, которым нужен результат (отправка заглушки ради message_id, ее правки), идут через
+    call(): в обход очереди, но в тех же лимитах и с той же паузой после 429.
+    """
+
+    def __init__(self, send, global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE, chat_burst=1):
+        self._send = send
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._global = TokenBucket(global_rate, global_rate)
+        self._buckets = {}
+        self._queues = {}
+        self._scheduled = set()
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+        self.depth = 0
+        self.max_depth = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.failed = 0
+
+    @property
+    def running(self):
+        return self._running
+
+    @property
+    def waiting_chats(self):
+        return len(self._scheduled)
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Останавливает поток, дав ему до timeout секунд дослать очередь."""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def send(self, chat_id, text, **kwargs):
+        if not self._running:
+            return self._send(chat_id, text, **kwargs)
+        with self._condition:
+            queue = self._queues.setdefault(chat_id, deque())
+            last = queue[-1] if queue else None
+            if (last is not None and not kwargs and not last[1]
+                    and len(last[0]) + len(text) + 2 <= MESSAGE_LIMIT):
+                last[0] += "\n\n" + text
+                self.coalesced += 1
+            else:
+                queue.append([text, kwargs, 0])
+                self.depth += 1
+                self.max_depth = max(self.max_depth, self.depth)
+            if chat_id not in self._scheduled:
+                now = time.monotonic()
+                self._schedule(chat_id, now + self._bucket(chat_id).delay(now))
+                self._condition.notify()
+        return None
+
+    def call(self, chat_id, function, *args, wait=True, **kwargs):
+        """Вызывает function(*args, **kwargs) для чата в лимитах очереди и возвращает ее результат.
+
+        Ждет токенов бота и чата; с wait=False не ждет, а сразу возвращает SKIPPED. На 429 чат
+        ставится на паузу retry_after (ее соблюдает и очередь), и вызов повторяется до MAX_RETRIES
+        раз, а с wait=False ошибка пробрасывается сразу. Пока поток не запущен, вызывает сразу.
+        """
+        if not self._running:
+            return function(*args, **kwargs)
+        attempt = 0
+        while True:
+            with self._condition:
+                bucket = self._bucket(chat_id)
+                now = time.monotonic()
+                delay = max(self._global.delay(now), bucket.delay(now))
+                if delay <= 0:
+                    self._global.take(now)
+                    bucket.take(now)
+            if delay > 0:
+                if not wait:
+                    return SKIPPED
+                time.sleep(delay)
+                continue
+            try:
+                return function(*args, **kwargs)
+            except Exception as e:
+                pause = retry_after(e)
+                if pause is None:
+                    raise
+                with self._condition:
+                    self._bucket(chat_id).hold(time.monotonic(), pause)
+                    self.retried += 1
+                if not wait or attempt >= MAX_RETRIES:
+                    raise
+                attempt += 1
+                logger.warning("Telegram 429 для чата %s, повтор через %s с", chat_id, pause)
+
+    def _bucket(self, chat_id):
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if len(self._buckets) >= IDLE_BUCKETS + len(self._scheduled):
+                now = time.monotonic()
+                for idle in [chat for chat, b in self._buckets.items()
+                             if chat not in self._scheduled and b.is_full(now)]:
+                    del self._buckets[idle]
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    def _schedule(self, chat_id, ready_at):
+        self._scheduled.add(chat_id)
+        heapq.heappush(self._heap, (ready_at, next(self._sequence), chat_id))
+
+    def _next_message(self):
+        """Ждет, пока какой-нибудь чат можно обслужить. None — очередь пуста и поток остановлен."""
+        while True:
+            if not self._heap:
+                if not self._running:
+                    return None
+                self._condition.wait()
+                continue
+            now = time.monotonic()
+            ready_at, _, chat_id = self._heap[0]
+            behind = self._buckets[chat_id].delay(now)
+            if ready_at <= now and behind > 0:
+                # Токен чата успел забрать call(): чат встает в очередь заново, не задерживая остальных.
+                heapq.heapreplace(self._heap, (now + behind, next(self._sequence), chat_id))
+                continue
+            wait = max(ready_at - now, self._global.delay(now))
+            if wait > 0:
+                self._condition.wait(wait)
+                continue
+            heapq.heappop(self._heap)
+            self._global.take(now)
+            self._bucket(chat_id).take(now)
+            return chat_id, self._queues[chat_id].popleft()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                item = self._next_message()
+            if item is None:
+                return
+            chat_id, message = item
+            pause = None
+            try:
+                self._send(chat_id, message[0], **message[1])
+                self.sent += 1
+            except Exception as e:
+                pause = retry_after(e)
+                if pause is not None and message[2] < MAX_RETRIES:
+                    message[2] += 1
+                    self.retried += 1
+                    logger.warning("Telegram 429 для чата %s, повтор через %s с", chat_id, pause)
+                else:
+                    pause = None
+                    self.failed += 1
+                    logger.exception("Не удалось отправить сообщение в чат %s", chat_id)
+            with self._condition:
+                queue = self._queues[chat_id]
+                if pause is not None:
+                    queue.appendleft(message)
+                    self._buckets[chat_id].hold(time.monotonic(), pause)
+                else:
+                    self.depth -= 1
+                now = time.monotonic()
+                if queue:
+                    delay = pause if pause is not None else self._buckets[chat_id].delay(now)
+                    self._schedule(chat_id, now + delay)
+                else:
+                    del self._queues[chat_id]
+                    self._scheduled.discard(chat_id)
@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+
+from src.project import metrics
+from src.project.outbox import SKIPPED
+
+logger = logging.getLogger(__name__)
+
+# Telegram позволяет править сообщение в чате примерно раз в секунду.
+EDIT_INTERVAL = 1.0
+PLACEHOLDER = "⏳ Разбираю сообщение…"
+
+
+class ProgressMessage:
+    """Сообщение-заглушка на время разбора через LLM, которое по ходу правится и становится ответом.
+
+    send(chat_id, text) -> Message и edit(text, chat_id, message_id) — вызовы бота, которые идут через
+    outbox.call() (нужен message_id) в лимитах очереди и с паузой после 429. Заглушка и промежуточные
+    правки не ждут лимита, а пропускаются; итоговая правка ждет. Через outbox.send() уходит ответ,
+    если заглушка не понадобилась (сообщение разобрано локально или из кэша) или правка не удалась.
+    """
+
+    def __init__(self, chat_id, send, edit, outbox, edit_interval=EDIT_INTERVAL):
+        self.chat_id = chat_id
+        self._send = send
+        self._edit = edit
+        self._outbox = outbox
+        self.edit_interval = edit_interval
+        self.started = time.perf_counter()
+        self.message_id = None
+        self._text = None
+        self._edited = None
+        self._partial_shown = False
+        self._lock = threading.Lock()
+
+    def waiting(self, text=PLACEHOLDER):
+        """Показывает заглушку (один раз)."""
+        with self._lock:
+            if self.message_id is not None:
+                return
+            try:
+                message = self._outbox.call(self.chat_id, self._send, self.chat_id, text, wait=False)
+            except Exception:
+                logger.warning("Не удалось отправить заглушку в чат %s", self.chat_id, exc_info=True)
+                return
+            if message is SKIPPED:
+                return
+            self.message_id = message.message_id
+            self._text, self._edited = text, time.monotonic()
+        metrics.FIRST_FEEDBACK.observe(time.perf_counter() - self.started, kind="placeholder")
+
+    def update(self, text):
+        """Промежуточный текст. Правки чаще edit_interval и без изменений пропускаются."""
+        with self._lock:
+            now = time.monotonic()
+            if self.message_id is None or text == self._text or now - self._edited < self.edit_interval:
+                return
+            try:
+                edited = self._outbox.call(self.chat_id, self._edit, text, self.chat_id, self.message_id, wait=False)
+            except Exception:
+                logger.warning("Не удалось обновить заглушку в чате %s", self.chat_id, exc_info=True)
+                return
+            if edited is SKIPPED:
+                return
+            self._text, self._edited = text, now
+            first = not self._partial_shown
+            self._partial_shown = True
+        if first:
+            metrics.FIRST_FEEDBACK.observe(time.perf_counter() - self.started, kind="partial")
+
+    def finish(self, text):
+        """Итоговый ответ: правкой заглушки, а без нее — обычным сообщением."""
+        with self._lock:
+            message_id, current = self.message_id, self._text
+            self._text = text
+        if message_id is None:
+            self._outbox.send(self.chat_id, text)
+            return
+        if text == current:
+            return
+        try:
+            self._outbox.call(self.chat_id, self._edit, text, self.chat_id, message_id)
+        except Exception:
+            logger.warning("Не удалось заменить заглушку в чате %s", self.chat_id, exc_info=True)
+            self._outbox.send(self.chat_id, text)
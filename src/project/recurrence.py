@@ -0,0 +1,259 @@
+import calendar
+import re
+from collections import deque, namedtuple
+from datetime import datetime, timedelta
+
+from src.project.const import MONTH_R
+from src.project.dateparse import parse_datetime
+
+DAILY, WEEKLY, MONTHLY, YEARLY = "DAILY", "WEEKLY", "MONTHLY", "YEARLY"
+# Индекс — datetime.weekday().
+RRULE_DAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+TODOIST_DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+SHORT_DAYS = ("пн", "вт", "ср", "чт", "пт", "сб", "вс")
+WORKDAYS = (0, 1, 2, 3, 4)
+WEEKEND = (5, 6)
+# Повторяющиеся сроки Todoist разбирает надежнее всего по-английски.
+DUE_LANG = "en"
+
+TODOIST_UNITS = {DAILY: "day", WEEKLY: "week", MONTHLY: "month", YEARLY: "year"}
+EVERY = {DAILY: "каждый день", WEEKLY: "каждую неделю", MONTHLY: "каждый месяц", YEARLY: "каждый год"}
+UNITS = {
+    DAILY: ("день", "дня", "дней"), WEEKLY: ("неделю", "недели", "недель"),
+    MONTHLY: ("месяц", "месяца", "месяцев"), YEARLY: ("год", "года", "лет"),
+}
+TIMES = ("раз", "раза", "раз")
+
+_WEEKDAY_STEMS = ("понедельник", "вторник", "сред", "четверг", "пятниц", "суббот", "воскресень")
+_DAY_R = r"(?:" + "|".join(_WEEKDAY_STEMS) + r")\w*"
+_ORDINAL_R = r"(?:\d+|друг\w*|втор(?:ой|ую|ое|ые)|трет\w*)"
+_WEEKDAYS_R = re.compile(
+    rf"\b(?:кажд\w*\s+(?:(?P<nth>{_ORDINAL_R})\s+)?|по\s+)(?P<days>{_DAY_R}(?:\s*(?:,|и)\s*{_DAY_R})*)",
+    re.IGNORECASE,
+)
+# «каждые 2 недели в среду»: день недели при недельном периоде — это BYDAY, а не дата начала.
+_ON_DAYS_R = re.compile(rf"\bво?\s+(?P<days>{_DAY_R}(?:\s*(?:,|и)\s*(?:во?\s+)?{_DAY_R})*)", re.IGNORECASE)
+_WORKDAYS_R = re.compile(r"\b(?:кажд\w*|по)\s+(?:(будн\w*)|выходн\w*)(?:\s+дн\w*)?", re.IGNORECASE)
+_PERIOD_R = re.compile(
+    rf"\b(?:кажд\w*|(?<!\d\s)раз\s+в)\s+(?:(?P<nth>{_ORDINAL_R})\s+)?"
+    r"(?P<unit>день|дня|дней|недел[юиь]|месяц\w*|год\w*|лет)\b",
+    re.IGNORECASE,
+)
+_ADVERB_R = re.compile(r"\b(ежедневно|еженедельно|ежемесячно|ежегодно|через\s+день)\b", re.IGNORECASE)
+_ADVERBS = {"ежедневно": (DAILY, 1), "еженедельно": (WEEKLY, 1), "ежемесячно": (MONTHLY, 1),
+            "ежегодно": (YEARLY, 1), "через день": (DAILY, 2)}
+_YEAR_R = r"(?:\s+(\d{4})(?:\s+года)?)?"
+# «с 1 по 5 июня»: начало остается в тексте («1 июня»), конец становится UNTIL.
+_RANGE_R = re.compile(rf"\bс\s+(\d{{1,2}})\s+по\s+{MONTH_R}{_YEAR_R}", re.IGNORECASE)
+_UNTIL_R = re.compile(rf"\b(?:до|по)\s+(?:{MONTH_R}{_YEAR_R}|(\d{{1,2}}\.\d{{1,2}}\.\d{{4}}))\b", re.IGNORECASE)
+_COUNT_R = re.compile(r"\b(\d+)\s+(?:раза?|повторени\w*)\b(?!\s+в\b)", re.IGNORECASE)
+
+
+def _plural(number, forms):
+    if number % 10 == 1 and number % 100 != 11:
+        return forms[0]
+    if 2 <= number % 10 <= 4 and not 12 <= number % 100 <= 14:
+        return forms[1]
+    return forms[2]
+
+
+class Recurrence(namedtuple("Recurrence", "freq interval weekdays until count", defaults=(1, (), None, None))):
+    """Правило повторения: частота, интервал, дни недели (datetime.weekday()), последний день или число раз."""
+
+    def rrule(self, tz_offset_hours=3):
+        """Строка RRULE для поля recurrence события Google; UNTIL — конец последнего дня в UTC."""
+        parts = [f"FREQ={self.freq}"]
+        if self.interval > 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.weekdays:
+            parts.append("BYDAY=" + ",".join(RRULE_DAYS[day] for day in self.weekdays))
+        if self.until is not None:
+            until = datetime.combine(self.until + timedelta(days=1), datetime.min.time())
+            until -= timedelta(hours=tz_offset_hours, seconds=1)
+            parts.append(f"UNTIL={until:%Y%m%dT%H%M%SZ}")
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        return "RRULE:" + ";".join(parts)
+
+    def due_string(self, start=None):
+        """Повторяющийся срок Todoist (язык DUE_LANG): «every mon, wed at 10:00 starting 2024-06-03»."""
+        if self.weekdays and self.interval == 1:
+            phrase = "every workday" if self.weekdays == WORKDAYS else f"every {', '.join(self._todoist_days())}"
+        elif len(self.weekdays) == 1 and self.interval == 2:
+            phrase = f"every other {self._todoist_days()[0]}"
+        elif self.interval == 1:
+            phrase = f"every {TODOIST_UNITS[self.freq]}"
+        else:
+            phrase = f"every {self.interval} {TODOIST_UNITS[self.freq]}s"
+        until = self.until
+        if start is not None:
+            if start.time() != datetime.min.time():
+                phrase += f" at {start:%H:%M}"
+            phrase += f" starting {start:%Y-%m-%d}"
+            if self.count is not None:
+                # У Todoist нет «N раз»: считаем дату последнего повторения сами.
+                until = last_occurrence(self, start).date()
+        if until is not None:
+            phrase += f" until {until:%Y-%m-%d}"
+        return phrase
+
+    def describe(self):
+        """Правило по-русски для ответа пользователю: «раз в 2 недели по пн, ср»."""
+        if self.interval == 1:
+            text = "" if self.weekdays else EVERY[self.freq]
+        else:
+            text = f"раз в {self.interval} {_plural(self.interval, UNITS[self.freq])}"
+        if self.weekdays:
+            text = f"{text} по {', '.join(SHORT_DAYS[day] for day in self.weekdays)}".strip()
+        if self.until is not None:
+            text += f", до {self.until:%d.%m.%Y}"
+        if self.count is not None:
+            text += f", {self.count} {_plural(self.count, TIMES)}"
+        return text
+
+    def _todoist_days(self):
+        return [TODOIST_DAYS[day] for day in self.weekdays]
+
+
+def _candidates(rule, start):
+    """Бесконечная последовательность дат по частоте и интервалу, без учета until и count."""
+    step = 0
+    while True:
+        if rule.freq == DAILY:
+            yield start + timedelta(days=step * rule.interval)
+        elif rule.freq == WEEKLY:
+            week = start - timedelta(days=start.weekday()) + timedelta(weeks=step * rule.interval)
+            for day in rule.weekdays or (start.weekday(),):
+                yield week + timedelta(days=day)
+        elif rule.freq == MONTHLY:
+            year, month = divmod(start.month - 1 + step * rule.interval, 12)
+            # Как в RFC 5545: месяцы без такого числа (31-е, 30 февраля) пропускаются.
+            if start.day <= calendar.monthrange(start.year + year, month + 1)[1]:
+                yield start.replace(year=start.year + year, month=month + 1)
+        else:
+            year = start.year + step * rule.interval
+            if start.day <= calendar.monthrange(year, start.month)[1]:
+                yield start.replace(year=year)
+        step += 1
+
+
+def occurrences(rule, start):
+    """Лениво перечисляет начала повторений, начиная со start (он считается первым, если подходит).
+
+    Бесконечное правило дает бесконечный генератор: берите сколько нужно через islice.
+    """
+    produced = 0
+    for moment in _candidates(rule, start):
+        if rule.until is not None and moment.date() > rule.until:
+            return
+        if moment < start:
+            continue
+        yield moment
+        produced += 1
+        if rule.count is not None and produced >= rule.count:
+            return
+
+
+def first_occurrence(rule, start, now):
+    """Первое повторение не раньше start и now или None, если все повторения уже в прошлом."""
+    unlimited = rule._replace(count=None)
+    return next((moment for moment in occurrences(unlimited, start) if moment >= now), None)
+
+
+def last_occurrence(rule, start):
+    """Последнее повторение конечного правила (с until или count), для бесконечного — None."""
+    if rule.until is None and rule.count is None:
+        return None
+    last = deque(occurrences(rule, start), maxlen=1)
+    return last[0] if last else None
+
+
+def _ordinal(word):
+    if not word:
+        return 1
+    word = word.lower()
+    if word.isdigit():
+        return max(1, int(word))
+    return 3 if word.startswith("трет") else 2
+
+
+def _weekday(word):
+    word = word.lower()
+    return next(index for index, stem in enumerate(_WEEKDAY_STEMS) if word.startswith(stem))
+
+
+def _cut(text, spans):
+    """Вырезает найденные фразы вместе с запятыми вокруг и подставляет замены."""
+    for start, end, replacement in sorted(spans, reverse=True):
+        before = text[:start].rstrip()
+        if before.endswith(","):
+            start = len(before) - 1
+        comma = re.match(r"\s*,", text[end:])
+        if comma:
+            end += comma.end()
+        text = f"{text[:start]} {replacement} {text[end:]}"
+    return " ".join(text.split()).strip(" ,;")
+
+
+def parse_recurrence(text, now=None):
+    """Находит в сообщении правило повторения.
+
+    Возвращает (Recurrence или None, текст без фраз о повторении). «каждый понедельник»,
+    «по средам и пятницам», «каждые 2 недели в среду», «по будням», «ежедневно», а также границы:
+    «до 31 декабря», «с 1 по 5 июня», «10 раз». Даты понимаются так же, как в dateparse.
+    """
+    freq, interval, weekdays, spans = None, 1, set(), []
+
+    def taken(match):
+        return any(start < match.end() and match.start() < end for start, end, _ in spans)
+
+    for match in _WEEKDAYS_R.finditer(text):
+        weekdays.update(_weekday(word) for word in re.findall(_DAY_R, match.group("days"), re.IGNORECASE))
+        interval = max(interval, _ordinal(match.group("nth")))
+        spans.append((*match.span(), ""))
+    for match in _WORKDAYS_R.finditer(text):
+        if not taken(match):
+            weekdays.update(WORKDAYS if match.group(1) else WEEKEND)
+            spans.append((*match.span(), ""))
+    for match in _PERIOD_R.finditer(text):
+        if not taken(match):
+            unit = match.group("unit").lower()
+            freq = DAILY if unit.startswith("д") else WEEKLY if unit.startswith("н") else \
+                MONTHLY if unit.startswith("м") else YEARLY
+            interval = max(interval, _ordinal(match.group("nth")))
+            spans.append((*match.span(), ""))
+    for match in _ADVERB_R.finditer(text):
+        if not taken(match):
+            freq, step = _ADVERBS[" ".join(match.group(1).lower().split())]
+            interval = max(interval, step)
+            spans.append((*match.span(), ""))
+    if weekdays:
+        freq = WEEKLY
+    elif freq == WEEKLY:
+        match = _ON_DAYS_R.search(text)
+        if match and not taken(match):
+            weekdays.update(_weekday(word) for word in re.findall(_DAY_R, match.group("days"), re.IGNORECASE))
+            spans.append((*match.span(), ""))
+    if freq is None:
+        return None, text
+
+    until = count = None
+    match = _RANGE_R.search(text)
+    if match:
+        first, last, month, year = match.groups()
+        until = parse_datetime(f"{last} {month.lower()}" + (f" {year} года" if year else ""), now).date()
+        spans.append((*match.span(), f"{first} {month.lower()}" + (f" {year} года" if year else "")))
+    else:
+        match = _UNTIL_R.search(text)
+        if match and not taken(match):
+            day, month, year, numeric = match.groups()
+            phrase = numeric if numeric else f"{day} {month.lower()}" + (f" {year} года" if year else "")
+            until = parse_datetime(phrase, now).date()
+            spans.append((*match.span(), ""))
+    match = _COUNT_R.search(text)
+    if match and not taken(match):
+        count = int(match.group(1))
+        spans.append((*match.span(), ""))
+
+    rule = Recurrence(freq, interval, tuple(sorted(weekdays)), until, count or None)
+    return rule, _cut(text, spans)
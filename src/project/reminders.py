@@ -0,0 +1,219 @@
+import heapq
+import itertools
+import logging
+import math
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+HORIZON = 3600
+MAX_LOADED = 10_000
+# Telegram пропускает около 30 сообщений в секунду на бота.
+SEND_RATE = 30
+
+
+class ReminderStore:
+    """Напоминания в SQLite (WAL): переживают перезапуск, выбираются по индексу на due.
+
+    partition=(index, count) — store процесса-воркера: выбираются только напоминания чатов,
+    которые dispatcher.chat_partition отдает этому процессу, так что каждое срабатывает один раз.
+    """
+
+    def __init__(self, path, partition=None):
+        self.path = path
+        self._partition_sql, self._partition_params = "", ()
+        if partition is not None:
+            index, count = partition
+            self._partition_sql, self._partition_params = " AND abs(chat_id) % ? = ?", (count, index)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS reminders ("
+            "chat_id INTEGER NOT NULL, key TEXT NOT NULL, due REAL NOT NULL, text TEXT NOT NULL, "
+            "PRIMARY KEY (chat_id, key)) WITHOUT ROWID"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS reminders_due ON reminders (due)")
+        self._connection.commit()
+
+    def put_many(self, reminders):
+        """reminders — итерируемое из (due, chat_id, key, text); то же (chat_id, key) перезаписывается."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO reminders (due, chat_id, key, text) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (chat_id, key) DO UPDATE SET due = excluded.due, text = excluded.text",
+                reminders,
+            )
+
+    def delete(self, chat_id, key):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM reminders WHERE chat_id = ? AND key = ?", (chat_id, key))
+
+    def delete_fired(self, reminders):
+        """Удаляет отправленные; если напоминание успели перенести (due изменился), оно остается."""
+        with self._lock, self._connection:
+            self._connection.executemany("DELETE FROM reminders WHERE due = ? AND chat_id = ? AND key = ?",
+                                         [(due, chat_id, key) for due, chat_id, key, _ in reminders])
+
+    def due_before(self, until, limit):
+        with self._lock:
+            return self._connection.execute(
+                f"SELECT due, chat_id, key, text FROM reminders WHERE due < ?{self._partition_sql} "
+                "ORDER BY due LIMIT ?", (until, *self._partition_params, limit)
+            ).fetchall()
+
+    def count(self):
+        with self._lock:
+            return self._connection.execute(
+                f"SELECT COUNT(*) FROM reminders WHERE 1{self._partition_sql}", self._partition_params
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class ReminderScheduler:
+    """Один поток, который спит до ближайшего напоминания.
+
+    Все напоминания лежат в ReminderStore, а в памяти (куча по due) — только ближайшее
+    окно: до horizon секунд вперед и не больше max_loaded штук. Когда окно заканчивается,
+    следующее подгружается из базы. Сработавшие напоминания одного чата склеиваются
+    в одно сообщение, и за секунду отправляется не больше send_rate сообщений.
+    """
+
+    def __init__(self, store, deliver, horizon=HORIZON, max_loaded=MAX_LOADED, send_rate=SEND_RATE):
+        self.store = store
+        self.deliver = deliver
+        self.horizon = horizon
+        self.max_loaded = max_loaded
+        self.send_rate = send_rate
+        self._heap = []
+        self._live = {}
+        self._sequence = itertools.count()
+        self._loaded_until = 0.0
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+        self.fired = 0
+        self.messages = 0
+        self.failed = 0
+
+    @property
+    def loaded(self):
+        return len(self._live)
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="reminders", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def schedule(self, chat_id, key, due, text):
+        """Ставит (или переносит) напоминание; due — unix-время."""
+        self.schedule_many([(due, chat_id, key, text)])
+
+    def schedule_many(self, reminders):
+        """reminders — список (due, chat_id, key, text)."""
+        reminders = list(reminders)
+        self.store.put_many(reminders)
+        with self._condition:
+            wake = False
+            for due, chat_id, key, text in reminders:
+                self._forget(chat_id, key)
+                if due >= self._loaded_until:
+                    continue
+                if len(self._live) >= self.max_loaded:
+                    # Окно переполнено: сдвигаем его границу, остальное дочитается из базы.
+                    self._loaded_until = due
+                    wake = True
+                    continue
+                entry = [due, next(self._sequence), chat_id, key, text]
+                self._live[(chat_id, key)] = entry
+                heapq.heappush(self._heap, entry)
+                wake = wake or self._heap[0] is entry
+            if wake:
+                self._condition.notify()
+
+    def cancel(self, chat_id, key):
+        self.store.delete(chat_id, key)
+        with self._condition:
+            self._forget(chat_id, key)
+
+    def _forget(self, chat_id, key):
+        entry = self._live.pop((chat_id, key), None)
+        if entry is not None:
+            entry[-1] = None
+
+    def _reload(self, now):
+        rows = self.store.due_before(now + self.horizon, self.max_loaded + 1)
+        if len(rows) > self.max_loaded:
+            rows = rows[:self.max_loaded]
+            self._loaded_until = rows[-1][0]
+        else:
+            self._loaded_until = now + self.horizon
+        self._heap = [[due, next(self._sequence), chat_id, key, text] for due, chat_id, key, text in rows]
+        self._live = {(entry[2], entry[3]): entry for entry in self._heap}
+        heapq.heapify(self._heap)
+
+    def _take_ready(self, now):
+        """Снимает с кучи сработавшие напоминания не больше чем для send_rate чатов."""
+        ready = {}
+        while self._heap and self._heap[0][0] <= now:
+            if self._heap[0][-1] is None:
+                heapq.heappop(self._heap)
+                continue
+            chat_id = self._heap[0][2]
+            if chat_id not in ready and len(ready) == self.send_rate:
+                break
+            due, _, chat_id, key, text = heapq.heappop(self._heap)
+            del self._live[(chat_id, key)]
+            ready.setdefault(chat_id, []).append((due, chat_id, key, text))
+        return ready
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if not self._running:
+                        return
+                    now = time.time()
+                    # В куче всегда все напоминания с due < _loaded_until, поэтому пока они
+                    # не отправлены, перечитывать базу незачем.
+                    if now >= self._loaded_until and (not self._heap or self._heap[0][0] >= self._loaded_until):
+                        self._reload(now)
+                    ready = self._take_ready(now)
+                    if ready:
+                        break
+                    next_due = self._heap[0][0] if self._heap else math.inf
+                    self._condition.wait(min(next_due, self._loaded_until) - now)
+            started = time.monotonic()
+            self._send(ready)
+            if len(ready) == self.send_rate:
+                # Уперлись в лимит: следующая пачка — не раньше чем через секунду.
+                time.sleep(max(0.0, 1.0 - (time.monotonic() - started)))
+
+    def _send(self, ready):
+        fired = []
+        for chat_id, reminders in ready.items():
+            try:
+                self.deliver(chat_id, [text for _, _, _, text in reminders])
+                self.messages += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Не удалось отправить напоминание в чат %s", chat_id)
+            self.fired += len(reminders)
+            fired.extend(reminders)
+        self.store.delete_fired(fired)
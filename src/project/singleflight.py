@@ -0,0 +1,87 @@
+import threading
+import time
+
+ERROR_TTL = 2.0
+MAX_ERRORS = 1024
+
+
+def is_error_result(result):
+    """Ошибки API в этом проекте возвращаются как {"error": ...}."""
+    return isinstance(result, dict) and "error" in result
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Одновременные одинаковые запросы (по ключу) выполняются одним вызовом.
+
+    Пока первый вызов идет, остальные ждут и получают тот же результат. Ошибки
+    (исключение или {"error": ...}) запоминаются на error_ttl секунд, чтобы не
+    долбить упавший API повторами.
+    """
+
+    def __init__(self, error_ttl=ERROR_TTL):
+        self.error_ttl = error_ttl
+        self._calls = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+        self.negative_hits = 0
+
+    def do(self, key, function, *args, **kwargs):
+        with self._lock:
+            failed = self._errors.get(key)
+            if failed is not None:
+                if failed[0] > time.monotonic():
+                    self.negative_hits += 1
+                    return self._replay(failed[1])
+                del self._errors[key]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            return self._replay(call)
+
+        try:
+            call.result = function(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+        with self._lock:
+            del self._calls[key]
+            if call.error is not None or is_error_result(call.result):
+                now = time.monotonic()
+                if len(self._errors) >= MAX_ERRORS:
+                    for expired in [k for k, (until, _) in self._errors.items() if until <= now]:
+                        del self._errors[expired]
+                self._errors[key] = (now + self.error_ttl, call)
+        call.done.set()
+        return self._replay(call)
+
+    @staticmethod
+    def _replay(call):
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def forget(self, key):
+        """Сбрасывает запомненную ошибку (например, после смены токена)."""
+        with self._lock:
+            self._errors.pop(key, None)
+
+
+# Общий для чтений из Todoist и Google Calendar.
+reads = SingleFlight()
@@ -0,0 +1,241 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = 100_000
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_FLUSH_INTERVAL = 0.5
+
+_MISSING = object()
+
+
+class MemoryTokenStore:
+    """Токены в памяти процесса. Подходит для тестов и одного процесса без перезапусков."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, chat_id, key):
+        return self._data.get((chat_id, key))
+
+    def set(self, chat_id, key, value):
+        with self._lock:
+            self._data[(chat_id, key)] = value
+
+    def set_many(self, items):
+        """items — итерируемое из (chat_id, key, value)."""
+        with self._lock:
+            for chat_id, key, value in items:
+                self._data[(chat_id, key)] = value
+
+    def delete(self, chat_id, key):
+        with self._lock:
+            self._data.pop((chat_id, key), None)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLiteTokenStore:
+    """Токены в SQLite (WAL) с LRU-кэшем на чтение и пакетной записью.
+
+    Запись сразу видна в этом процессе, а на диск уходит пачкой — при
+    накоплении batch_size изменений, по таймеру flush_interval или при flush/close.
+    """
+
+    def __init__(self, path, cache_size=DEFAULT_CACHE_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.path = path
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS tokens ("
+            "chat_id INTEGER NOT NULL, key TEXT NOT NULL, value TEXT, "
+            "PRIMARY KEY (chat_id, key)) WITHOUT ROWID"
+        )
+        connection.commit()
+
+        self._flusher = None
+        if flush_interval:
+            self._flusher = threading.Thread(target=self._flush_periodically, args=(flush_interval,),
+                                             name="token-store-flush", daemon=True)
+            self._flusher.start()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _remember(self, cache_key, value):
+        self._cache[cache_key] = value
+        self._cache.move_to_end(cache_key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get(self, chat_id, key):
+        cache_key = (chat_id, key)
+        with self._lock:
+            value = self._pending.get(cache_key, _MISSING)
+            if value is _MISSING:
+                value = self._cache.get(cache_key, _MISSING)
+                if value is not _MISSING:
+                    self._cache.move_to_end(cache_key)
+            if value is not _MISSING:
+                return value
+
+        row = self._connection().execute(
+            "SELECT value FROM tokens WHERE chat_id = ? AND key = ?", cache_key
+        ).fetchone()
+        value = row[0] if row else None
+        with self._lock:
+            if cache_key not in self._pending:
+                self._remember(cache_key, value)
+        return value
+
+    def set(self, chat_id, key, value):
+        self.set_many([(chat_id, key, value)])
+
+    def set_many(self, items):
+        with self._lock:
+            for chat_id, key, value in items:
+                self._pending[(chat_id, key)] = value
+                self._remember((chat_id, key), value)
+            should_flush = len(self._pending) >= self.batch_size
+        if should_flush:
+            self.flush()
+
+    def delete(self, chat_id, key):
+        self.set(chat_id, key, None)
+
+    def flush(self):
+        """Записывает накопленные изменения одной транзакцией."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            rows = [(chat_id, key, value) for (chat_id, key), value in pending.items()]
+            connection = self._connection()
+            with connection:
+                connection.executemany(
+                    "INSERT INTO tokens (chat_id, key, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT (chat_id, key) DO UPDATE SET value = excluded.value",
+                    rows,
+                )
+
+    def _flush_periodically(self, interval):
+        while not self._closed.wait(interval):
+            self.flush()
+
+    def close(self):
+        self._closed.set()
+        self.flush()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join()
+
+
+class LocalRedis:
+    """Минимальная замена Redis в памяти (hget/hset/hdel/pipeline) для локального запуска и тестов."""
+
+    def __init__(self):
+        self._hashes = {}
+        self._lock = threading.Lock()
+
+    def hget(self, name, field):
+        return self._hashes.get(name, {}).get(field)
+
+    def hset(self, name, field, value):
+        with self._lock:
+            self._hashes.setdefault(name, {})[field] = value
+
+    def hdel(self, name, field):
+        with self._lock:
+            self._hashes.get(name, {}).pop(field, None)
+
+    def pipeline(self):
+        return _LocalRedisPipeline(self)
+
+
+class _LocalRedisPipeline:
+    def __init__(self, redis):
+        self._redis = redis
+        self._commands = []
+
+    def hset(self, name, field, value):
+        self._commands.append((self._redis.hset, name, field, value))
+
+    def hdel(self, name, field):
+        self._commands.append((self._redis.hdel, name, field))
+
+    def execute(self):
+        results = [command(*args) for command, *args in self._commands]
+        self._commands = []
+        return results
+
+
+class RedisTokenStore:
+    """Токены в Redis: по хэшу tokens:<chat_id> на пользователя, запись пачками через pipeline."""
+
+    def __init__(self, client, prefix="tokens"):
+        self._client = client
+        self._prefix = prefix
+
+    def _name(self, chat_id):
+        return f"{self._prefix}:{chat_id}"
+
+    def get(self, chat_id, key):
+        value = self._client.hget(self._name(chat_id), key)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return value
+
+    def set(self, chat_id, key, value):
+        self.set_many([(chat_id, key, value)])
+
+    def set_many(self, items):
+        pipeline = self._client.pipeline()
+        for chat_id, key, value in items:
+            if value is None:
+                pipeline.hdel(self._name(chat_id), key)
+            else:
+                pipeline.hset(self._name(chat_id), key, value)
+        pipeline.execute()
+
+    def delete(self, chat_id, key):
+        self._client.hdel(self._name(chat_id), key)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def create_token_store(url):
+    """Создает хранилище по адресу: memory://, sqlite:///path.db, redis://host:port/db или local-redis://."""
+    if url == "memory://":
+        return MemoryTokenStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteTokenStore(url[len("sqlite:///"):])
+    if url == "local-redis://":
+        return RedisTokenStore(LocalRedis())
+    if url.startswith("redis://") or url.startswith("rediss://"):
+        import redis
+        return RedisTokenStore(redis.Redis.from_url(url))
+    raise ValueError(f"Неизвестное хранилище токенов: {url}")
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from src.project.api import async_transport, transport
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Подменяет сеть: handler(request) -> httpx.Response; sleep не ждет, а записывает паузы."""
+    calls, sleeps = [], []
+    responses = []
+
+    def handler(request):
+        calls.append(request.method)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(async_transport, "_create_client",
+                        lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    return responses, calls, sleeps
+
+
+def run(coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await async_transport.aclose()
+    return asyncio.run(main())
+
+
+def test_get_is_retried_and_retry_after_is_honored(upstream):
+    responses, calls, sleeps = upstream
+    responses += [httpx.Response(503, headers={"Retry-After": "2"}), httpx.Response(500), httpx.Response(200)]
+
+    assert run(async_transport.get("http://api/x")).status_code == 200
+    assert calls == ["GET"] * 3
+    assert sleeps == [2, transport.RETRY_BACKOFF_FACTOR * 2]
+
+
+def test_post_is_retried_only_on_429_and_503(upstream):
+    responses, calls, _ = upstream
+    responses += [httpx.Response(500)]
+    assert run(async_transport.post("http://api/x")).status_code == 500
+    assert calls == ["POST"]
+
+    responses += [httpx.Response(429), httpx.Response(503), httpx.Response(201)]
+    assert run(async_transport.post("http://api/x")).status_code == 201
+    assert calls == ["POST"] * 4
+
+
+def test_connect_errors_are_retried_then_raised(upstream):
+    responses, calls, _ = upstream
+    responses += [httpx.ConnectError("refused"), httpx.Response(200)]
+    assert run(async_transport.get("http://api/x")).status_code == 200
+
+    responses += [httpx.ConnectError("refused")] * (transport.RETRY_TOTAL + 1)
+    with pytest.raises(httpx.ConnectError):
+        run(async_transport.get("http://api/x"))
+    assert len(calls) == 2 + transport.RETRY_TOTAL + 1
+
+    # Последний ответ с ошибкой возвращается как есть, без лишней попытки.
+    responses += [httpx.Response(502)] * (transport.RETRY_TOTAL + 1)
+    assert run(async_transport.get("http://api/x")).status_code == 502
+    assert not responses
+
+
+def test_client_is_shared_within_a_loop_and_closed_with_it():
+    async def clients():
+        first, second = async_transport.get_client(), async_transport.get_client()
+        await async_transport.aclose()
+        return first, second, async_transport.get_client()
+
+    first, second, reopened = asyncio.run(clients())
+    assert first is second and reopened is not first
+    assert first.is_closed
+    assert asyncio.run(clients())[0] is not first
+
+
+def test_run_blocking_uses_the_worker_pool():
+    def work(value, plus=0):
+        return value + plus, threading.current_thread().name
+
+    result, thread = asyncio.run(async_transport.run_blocking(work, 1, plus=2))
+    assert result == 3 and thread.startswith("blocking-io")
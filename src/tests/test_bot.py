@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import pytest
 from fastapi.testclient import TestClient
 from src.project.bot import app, save_user_token, get_user_token, generate_google_auth_url, \
@@ -7,6 +7,19 @@ from src.project.bot import app, save_user_token, get_user_token, generate_googl
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def stores(monkeypatch, tmp_path):
+    """Хранилища бота создаются заново в памяти и во временном каталоге, а не в корне репозитория."""
+    from src.project import bot as bot_module
+
+    monkeypatch.setattr(bot_module, "TOKEN_STORE_URL", "memory://")
+    monkeypatch.setattr(bot_module, "CONVERSATION_STORE_URL", "memory://")
+    monkeypatch.setattr(bot_module, "REMINDERS_PATH", str(tmp_path / "reminders.db"))
+    monkeypatch.setattr(bot_module, "GOOGLE_CREDENTIALS_PATH", str(tmp_path / "google_credentials.db"))
+    for name in ("token_store", "reminders", "conversations", "google_tokens"):
+        monkeypatch.setitem(vars(bot_module), name, None)
+
+
 @pytest.mark.asyncio
 async def test_save_and_get_user_token():
     chat_id = 12345
@@ -59,3 +72,341 @@ def test_convert_relative_to_iso_tomorrow():
     now = datetime.now() + timedelta(days=1)
     expected = now.replace(hour=16, minute=30, second=0, microsecond=0)
     assert result == expected.isoformat()
+
+
+def test_telegram_webhook_dispatches_update(monkeypatch):
+    from src.project import bot as bot_module
+
+    replies = []
+    monkeypatch.setattr(bot_module.bot, "send_message", lambda chat_id, text, **kwargs: replies.append(chat_id))
+    update = {
+        "update_id": 1,
+        "message": {
+            "message_id": 1,
+            "date": 0,
+            "chat": {"id": 777, "type": "private"},
+            "from": {"id": 777, "is_bot": False, "first_name": "test"},
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }
+    headers = {"X-Telegram-Bot-Api-Secret-Token": bot_module.WEBHOOK_SECRET or ""}
+
+    assert client.post(bot_module.WEBHOOK_PATH, json=update, headers=headers).status_code == 404
+
+    bot_module.dispatcher.start()
+    try:
+        response = client.post(bot_module.WEBHOOK_PATH, json=update, headers=headers)
+    finally:
+        bot_module.dispatcher.stop()
+
+    assert response.status_code == 200
+    assert replies == [777]
+
+
+def test_metrics_endpoint():
+    from src.project import bot as bot_module
+
+    bot_module.parse_event_text("Событие: созвон. Конец: 2025-01-01T10:00:00")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'smart_todo_parse_failures_total{stage="start_time"}' in response.text
+    assert "smart_todo_outbox_depth 0" in response.text
+
+
+def test_parse_event_text_drops_punctuation_after_iso_time():
+    from src.project.bot import parse_event_text
+
+    result = parse_event_text("Событие: созвон. Начало: 2026-10-19T10:00:00. Конец: 2026-10-19T11:00:00.")
+    assert result == {"title": "созвон", "start_time": "2026-10-19T10:00:00", "end_time": "2026-10-19T11:00:00"}
+
+
+def test_import_is_lazy(tmp_path):
+    import os
+    import subprocess
+    import sys
+
+    heavy = ("fastapi", "uvicorn", "telebot", "httpx", "googleapiclient")
+    lazy = ("bot", "app", "outbox", "dispatcher", "llm_cache", "llm_batcher")
+    # С LLM_CACHE_PATH кэш LLM открыл бы SQLite при импорте.
+    code = (f"import sys, config; config.LLM_CACHE_PATH = 'llm.db'; import src.project.bot as bot; "
+            f"print([m for m in {heavy!r} if m in sys.modules] + [name for name in {lazy!r} if name in vars(bot)])")
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, capture_output=True, text=True,
+                            check=True)
+
+    assert result.stdout.strip() == "[]"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_conversation_step_survives_in_shared_store(monkeypatch):
+    import telebot
+    from src.project import bot as bot_module
+    from src.project.conversations import MemoryConversationStore
+
+    replies = []
+    monkeypatch.setitem(vars(bot_module), "conversations", MemoryConversationStore())
+    monkeypatch.setattr(bot_module.bot, "send_message", lambda chat_id, text, **kwargs: replies.append(text))
+
+    def send(text):
+        message = {"message_id": 1, "date": 0, "text": text, "chat": {"id": 778, "type": "private"},
+                   "from": {"id": 778, "is_bot": False, "first_name": "test"}}
+        bot_module.process_update(telebot.types.Update.de_json({"update_id": 1, "message": message}))
+
+    bot_module.expect_reply(telebot.types.Message.de_json(
+        {"message_id": 1, "date": 0, "chat": {"id": 778, "type": "private"}}), "project_selection", [{"id": "p1"}])
+    send("5")
+    assert replies == ["Неверный выбор. Попробуйте снова."]
+    assert not bot_module.conversations.has(778)
+
+    bot_module.conversations.set(778, "project_selection", [[{"id": "p1"}]])
+    send("1")
+    assert replies[-1] == "Введите описание задачи:"
+    assert bot_module.conversations.pop(778) == ("task_creation", ["p1"])
+
+
+def test_llm_batch_is_split_by_number_and_missing_items_are_asked_again(monkeypatch):
+    import json
+    from types import SimpleNamespace
+    from src.project import bot as bot_module
+
+    def answer(text):
+        body = {"result": {"alternatives": [{"message": {"text": text}}]}}
+        return SimpleNamespace(status_code=200, json=lambda: body)
+
+    def post(url, headers=None, data=None):
+        user = json.loads(data)["messages"][-1]["text"]
+        if user.startswith("[1]"):
+            return answer('{"3": {"title": "обед", "start": "2026-10-19T13:00:00", "end": "2026-10-19T14:00:00"}, '
+                          '"1": {"title": "созвон", "start": "2026-10-19T10:00:00", "end": null}}')
+        return answer('{"title": "ужин", "start": "2026-10-19T19:00:00", "end": "2026-10-19T20:00:00"}')
+
+    monkeypatch.setattr(bot_module.transport, "post", post)
+    results = bot_module.complete_llm_batch(True, ["созвон утром", "ужин\nвечером", "обед"])
+
+    assert [result["title"] for result in results] == ["созвон", "ужин", "обед"]
+    assert json.loads(bot_module.form_multi_payload(["a", "b\nc"], True))["messages"][-1]["text"] == "[1] a\n[2] b c"
+
+
+def test_llm_is_asked_again_only_when_answer_cannot_be_repaired(monkeypatch):
+    from types import SimpleNamespace
+    from src.project import bot as bot_module
+
+    answers = ["Вот ответ:\n```json\n{'title': 'обед', 'start': '2026-10-19T13:00:00', 'end': 'не указан',}\n```",
+               "Не могу помочь с этим запросом.",
+               '{"title": "ужин", "start": "2026-10-19T19:00:00", "end": null}']
+    calls = []
+
+    def post(url, headers=None, data=None):
+        calls.append(data)
+        body = {"result": {"alternatives": [{"message": {"text": answers[len(calls) - 1]}}]}}
+        return SimpleNamespace(status_code=200, json=lambda: body)
+
+    monkeypatch.setattr(bot_module.transport, "post", post)
+    assert bot_module.request_llm("обед завтра", True) == \
+        {"title": "обед", "start_time": "2026-10-19T13:00:00", "end_time": None}
+    assert len(calls) == 1
+    assert bot_module.request_llm("ужин завтра", True)["title"] == "ужин"
+    assert len(calls) == 3 and calls[1] == calls[2]
+
+
+def test_payload_prefix_is_serialized_once_per_prompt():
+    import json
+    from src.project import bot as bot_module
+
+    payload = json.loads(bot_module.form_payload('созвон "в 10"\n', True))
+    assert payload["messages"] == [{"role": "system", "text": bot_module.SYSTEM_MESSAGE_GOOGLE},
+                                   {"role": "user", "text": 'созвон "в 10"\n'}]
+    assert payload["modelUri"] == bot_module.MODEL_URI
+    hits = bot_module.payload_prefix.cache_info().hits
+    bot_module.form_payload("ужин", True)
+    assert bot_module.payload_prefix.cache_info().hits == hits + 1
+
+
+def test_stream_stops_reading_once_the_answer_is_complete(monkeypatch):
+    import json
+    from src.project import bot as bot_module
+
+    answer = '{"title": "созвон", "start": "2026-10-19T10:00:00", "end": null}\nЕсли нужно что-то изменить, напишите.'
+    read = []
+
+    class StreamedResponse:
+        status_code = 200
+        closed = False
+
+        def iter_lines(self):
+            for end in range(4, len(answer) + 4, 4):
+                read.append(end)
+                yield json.dumps({"result": {"alternatives": [{"message": {"text": answer[:end]}}]}}).encode()
+
+        def close(self):
+            self.closed = True
+
+    response = StreamedResponse()
+    sent = []
+
+    def post(url, headers=None, data=None, stream=False):
+        sent.append(json.loads(data)["completionOptions"])
+        return response
+
+    monkeypatch.setattr(bot_module.transport, "post", post)
+    partials = []
+    result = bot_module.stream_llm(True, "созвон завтра в 10", partials.append)
+
+    assert result == {"title": "созвон", "start_time": "2026-10-19T10:00:00", "end_time": None}
+    assert sent == [{**bot_module.DEFAULT_COMPLETION_OPTIONS, "stream": True,
+                     "maxTokens": bot_module.EXTRACTION_MAX_TOKENS}]
+    assert response.closed and read[-1] < len(answer)
+    assert {"title": "созвон"} in partials
+    assert bot_module.format_progress(partials[-1], True).startswith("⏳ Событие: созвон\nНачало: 2026-10-19")
+
+
+def test_google_callback_saves_refreshable_credentials_for_the_chat(monkeypatch, tmp_path):
+    import threading
+    from urllib.parse import parse_qs, urlsplit
+    from src.project import bot as bot_module
+    from src.project.google_tokens import GoogleCredentialStore
+
+    async def exchange(code):
+        return {"access_token": "access", "refresh_token": "refresh", "expires_in": 3599}
+
+    replies = []
+    monkeypatch.setitem(vars(bot_module), "google_tokens", bot_module.create_google_tokens(
+        GoogleCredentialStore(str(tmp_path / "google.db"))))
+    monkeypatch.setattr(bot_module, "exchange_google_code_for_token_async", exchange)
+    monkeypatch.setattr(bot_module.outbox, "send", lambda chat_id, text, **kwargs: replies.append(
+        (chat_id, threading.current_thread().name.startswith("blocking-io"))))
+
+    state = parse_qs(urlsplit(bot_module.generate_google_auth_url(4242)).query)["state"][0]
+    assert bot_module.chat_from_google_state(state) == 4242
+    assert bot_module.chat_from_google_state("4243" + state[4:]) is None
+
+    response = client.get("/callback/google", params={"code": "c", "state": state})
+    assert "token" not in response.json()
+    # Запись в SQLite и отправка — не в цикле событий.
+    assert replies == [(4242, True)]
+    assert bot_module.get_google_token(4242) == "access"
+    assert bot_module.google_tokens.store.get(4242)[1] == "refresh"
+    bot_module.google_tokens.close()
+
+
+def test_recurring_event_is_created_once_with_rrule(monkeypatch):
+    from types import SimpleNamespace
+    from src.project import bot as bot_module
+
+    created, replies = [], []
+
+    def create_event(token, summary, start_time, end_time, recurrence=None):
+        created.append((summary, start_time, end_time, recurrence))
+        return {"id": "e1", "summary": summary, "start": {"dateTime": start_time}, "end": {"dateTime": end_time}}
+
+    monkeypatch.setattr(bot_module, "get_google_token", lambda chat_id: "google")
+    monkeypatch.setattr(bot_module.googleapi, "create_google_event", create_event)
+    monkeypatch.setattr(bot_module, "progress_message", lambda chat_id: SimpleNamespace(
+        waiting=lambda: None, update=lambda text: None, finish=replies.append))
+
+    message = SimpleNamespace(chat=SimpleNamespace(id=31), text="каждый понедельник в 10:00 планёрка")
+    bot_module.process_event_details_nlp(message)
+
+    [(summary, start_time, end_time, rrule)] = created
+    start = datetime.fromisoformat(start_time)
+    assert (summary, rrule) == ("планёрка", "RRULE:FREQ=WEEKLY;BYDAY=MO")
+    assert start.weekday() == 0 and start.hour == 10 and start > datetime.now(start.tzinfo)
+    assert "Повторяется по пн." in replies[0]
+    assert f"только о ближайших {bot_module.RECURRENCE_REMINDERS} повторениях" in replies[0]
+
+    # Напоминание — на каждое из ближайших повторений, под id экземпляра, как в /list_events.
+    reminders = bot_module.get_reminders().store.due_before(float("inf"), 100)
+    assert len(reminders) == bot_module.RECURRENCE_REMINDERS
+    first, second = reminders[:2]
+    assert second[0] - first[0] == 7 * 24 * 3600
+    assert first[2] == f"google:e1_{start.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}"
+
+
+def test_recurring_task_reminders_are_cancelled_with_the_task():
+    from src.project import bot as bot_module
+    from src.project.recurrence import DAILY, Recurrence
+
+    start = (datetime.now() + timedelta(days=1)).replace(microsecond=0).isoformat()
+    bot_module.remind_about_task(5, "t1", "зарядка", start, Recurrence(DAILY, count=3))
+    store = bot_module.get_reminders().store
+    keys = [key for _, _, key, _ in store.due_before(float("inf"), 100)]
+    assert keys == ["todoist:t1", "todoist:t1#1", "todoist:t1#2"]
+
+    bot_module.cancel_task_reminders(5, "t1")
+    assert store.count() == 0
+
+
+def test_unrecognized_task_is_asked_again(monkeypatch):
+    from types import SimpleNamespace
+    from src.project import bot as bot_module
+
+    replies, created = [], []
+    monkeypatch.setattr(bot_module, "get_user_token", lambda chat_id, key: "todoist")
+    monkeypatch.setattr(bot_module, "extract_event_list", lambda text, google_todoist, progress: [])
+    monkeypatch.setattr(bot_module.todoistapi, "create_task_in_project", lambda *args: created.append(args))
+    monkeypatch.setattr(bot_module, "progress_message", lambda chat_id: SimpleNamespace(finish=replies.append))
+
+    message = SimpleNamespace(chat=SimpleNamespace(id=32), text="???")
+    bot_module.process_task_creation(message, "p1")
+
+    assert replies == ["Не удалось распознать задачу. Пожалуйста, введите задачу еще раз."]
+    assert not created
+    assert bot_module.get_conversations().pop(32) == ("task_creation", ["p1"])
+
+
+def test_page_turns_go_through_the_outbox_limits(monkeypatch):
+    from types import SimpleNamespace
+    from src.project import bot as bot_module
+
+    calls = []
+    fake_bot = SimpleNamespace(edit_message_text=lambda text, chat_id, message_id, reply_markup=None: "edited",
+                               answer_callback_query=lambda query_id: True)
+    monkeypatch.setitem(vars(bot_module), "bot", fake_bot)
+    monkeypatch.setattr(bot_module.outbox, "call", lambda chat_id, function, *args, **kwargs: calls.append(
+        (chat_id, function, args)))
+    monkeypatch.setattr(bot_module, "get_user_token", lambda chat_id, key: "todoist")
+    monkeypatch.setattr(bot_module, "send_tasks_page", lambda chat_id, token, page, message_id: bot_module.show_page(
+        chat_id, f"страница {page}", None, message_id))
+
+    message = SimpleNamespace(chat=SimpleNamespace(id=33), message_id=9)
+    bot_module.turn_page(SimpleNamespace(id="q1", data="tasks:1", message=message))
+
+    assert calls == [(33, fake_bot.edit_message_text, ("страница 1", 33, 9)),
+                     (33, fake_bot.answer_callback_query, ("q1",))]
+
+
+def test_worker_processes_need_stores_shared_between_processes(monkeypatch):
+    from src.project import bot as bot_module
+
+    monkeypatch.setattr(bot_module, "TOKEN_STORE_URL", "redis://localhost:6379/0")
+    monkeypatch.setattr(bot_module, "CONVERSATION_STORE_URL", "redis://localhost:6379/0")
+    with pytest.raises(ValueError):
+        bot_module.use_worker_processes(2)
+    monkeypatch.setattr(bot_module, "CONVERSATION_STORE_URL", "memory://")
+    with pytest.raises(ValueError):
+        bot_module.use_worker_processes(2)
+
+
+def test_metrics_in_worker_process_mode_are_summed_over_workers(monkeypatch):
+    from src.project import bot as bot_module
+    from src.project.dispatcher import ProcessDispatcher
+
+    dispatcher = ProcessDispatcher(bot_module.run_worker, 2,
+                                   counter_names=[name for name, *_ in bot_module.WORKER_METRICS])
+    dispatcher.counters.publish(0, {"smart_todo_outbox_sent_total": 3, "processed": 5})
+    dispatcher.counters.publish(1, {"smart_todo_outbox_sent_total": 4, "processed": 1})
+    monkeypatch.setattr(bot_module, "dispatcher", dispatcher)
+    monkeypatch.delitem(vars(bot_module), "reminders", raising=False)
+    monkeypatch.delitem(vars(bot_module), "google_tokens", raising=False)
+
+    text = client.get("/metrics").text
+    assert "smart_todo_outbox_sent_total 7" in text
+    assert "smart_todo_updates_processed_total 6" in text
+    assert "smart_todo_reminders_loaded 0" in text
+    # Гистограммы копятся в воркерах: в родителе их нет вместо нулей.
+    assert "smart_todo_parse_failures_total" not in text
+    # Сбор метрик не открывает базы напоминаний и токенов.
+    assert "reminders" not in vars(bot_module) and "google_tokens" not in vars(bot_module)
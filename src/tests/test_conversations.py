@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+from src.project.conversations import MemoryConversationStore, SQLiteConversationStore, create_conversation_store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryConversationStore()
+    return SQLiteConversationStore(str(tmp_path / "conversations.db"))
+
+
+def test_step_is_taken_once(store):
+    store.set(1, "task_deletion", [[{"id": "a"}, {"id": "b"}]])
+
+    assert store.has(1)
+    assert not store.has(2)
+    assert store.pop(1) == ("task_deletion", [[{"id": "a"}, {"id": "b"}]])
+    assert store.pop(1) is None
+    assert not store.has(1)
+
+
+def test_expired_step_is_ignored(store):
+    store.ttl = -1
+    store.set(1, "event_details")
+
+    assert not store.has(1)
+    assert store.pop(1) is None
+
+
+def test_sqlite_store_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / "conversations.db")
+    first, second = SQLiteConversationStore(path), SQLiteConversationStore(path)
+    first.set(7, "task_creation", ["project"])
+
+    assert second.pop(7) == ("task_creation", ["project"])
+    assert first.pop(7) is None
+
+
+def test_sqlite_store_purges_expired_on_open(tmp_path):
+    path = str(tmp_path / "conversations.db")
+    SQLiteConversationStore(path, ttl=-1).set(1, "event_details")
+    time.sleep(0.01)
+
+    assert SQLiteConversationStore(path).purge_expired() == 0
+
+
+def test_create_conversation_store(tmp_path):
+    assert isinstance(create_conversation_store("memory://"), MemoryConversationStore)
+    assert isinstance(create_conversation_store(f"sqlite:///{tmp_path}/c.db"), SQLiteConversationStore)
+    with pytest.raises(ValueError):
+        create_conversation_store("redis://localhost")
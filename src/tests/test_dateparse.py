@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import pytest
+
+from src.project.dateparse import parse_datetime, tokenize
+
+NOW = datetime(2024, 12, 23, 9, 15, 42)  # понедельник
+
+
+def test_tokenize_single_pass():
+    tokens = tokenize("послезавтра или завтра в 16:30")
+    assert tokens.relative == "послезавтра"
+    assert tokens.time == "16:30"
+
+    tokens = tokenize("28 декабря 2025 года 10:00")
+    assert (tokens.month, tokens.year, tokens.time) == ("28 декабря", "2025", "10:00")
+    assert tokenize("28.12.2024, 15:00").date_at_start
+    assert not tokenize("до 28.12.2024").date_at_start
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("завтра 16:30", datetime(2024, 12, 24, 16, 30)),
+    ("послезавтра в 9:05", datetime(2024, 12, 25, 9, 5)),
+    ("сегодня 18:00", datetime(2024, 12, 23, 18, 0)),
+    ("пятница 20:00", datetime(2024, 12, 27, 20, 0)),
+    ("понедельник 10:00", datetime(2024, 12, 30, 10, 0)),
+    ("28 декабря 15:00", datetime(2024, 12, 28, 15, 0)),
+    ("5 января", datetime(2025, 1, 5, 0, 0)),
+    ("1 марта 2030 года 12:00", datetime(2030, 3, 1, 12, 0)),
+    ("28.12.2024, 15:00", datetime(2024, 12, 28, 15, 0)),
+    ("12.01.2025", datetime(2025, 1, 12, 0, 0)),
+])
+def test_parse_datetime(text, expected):
+    assert parse_datetime(text, now=NOW).replace(second=0) == expected
+
+
+def test_parse_datetime_unset_and_errors():
+    assert parse_datetime("не указан", now=NOW) is None
+    with pytest.raises(ValueError):
+        parse_datetime("когда-нибудь", now=NOW)
+    with pytest.raises(ValueError):
+        parse_datetime("31.02.2024", now=NOW)
+    with pytest.raises(ValueError):
+        parse_datetime("завтра 25:00", now=NOW)
+
+
+def test_month_without_year_is_the_nearest_future_date():
+    now = datetime(2026, 10, 18, 12, 0)
+    assert parse_datetime("20 октября 10:00", now=now) == datetime(2026, 10, 20, 10, 0)
+    assert parse_datetime("18 октября", now=now) == datetime(2026, 10, 18, 0, 0)
+    assert parse_datetime("17 октября", now=now) == datetime(2027, 10, 17, 0, 0)
@@ -0,0 +1,38 @@
+import itertools
+import random
+
+import pytest
+
+from src.project.dateparse import convert_relative_to_iso, tokenize
+
+pytest.importorskip("pytest_benchmark")
+
+DATES = ["завтра", "послезавтра", "сегодня", "понедельник", "среда", "пятница", "воскресенье", "28 декабря",
+         "1 января 2025 года", "14 февраля", "28.12.2024,", "12.01.2025"]
+TIMES = ["", "9:30", "15:00", "в 18:45", "23:59"]
+NOISE = ["", "встреча с командой", "позвонить маме", "созвон по проекту"]
+
+
+def build_corpus(size=20_000, seed=7):
+    phrases = [" ".join(filter(None, parts)) for parts in itertools.product(DATES, TIMES)]
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        phrase = rng.choice(phrases)
+        if not phrase[0].isdigit() or "." not in phrase:
+            phrase = f"{rng.choice(NOISE)} {phrase}".strip()
+        corpus.append(phrase)
+    corpus.extend(["не указан"] * (size // 50))
+    return corpus
+
+
+CORPUS = build_corpus()
+
+
+def test_benchmark_tokenize(benchmark):
+    benchmark(lambda: [tokenize(phrase) for phrase in CORPUS])
+
+
+def test_benchmark_convert_relative_to_iso(benchmark):
+    results = benchmark(lambda: [convert_relative_to_iso(phrase) for phrase in CORPUS])
+    assert len(results) == len(CORPUS)
@@ -0,0 +1,85 @@
+import multiprocessing
+import threading
+import time
+from types import SimpleNamespace
+
+from src.project.dispatcher import ProcessDispatcher, UpdateDispatcher, chat_partition, get_update_chat_id, \
+    serve_process
+
+
+def make_update(chat_id, seq):
+    return SimpleNamespace(update_id=seq, message=SimpleNamespace(chat=SimpleNamespace(id=chat_id)))
+
+
+def test_get_update_chat_id():
+    assert get_update_chat_id(make_update(42, 1)) == 42
+    assert get_update_chat_id(SimpleNamespace()) == 0
+
+
+def test_updates_of_one_chat_keep_order():
+    seen = {}
+    lock = threading.Lock()
+
+    def handler(update):
+        time.sleep(0.001)
+        with lock:
+            seen.setdefault(update.message.chat.id, []).append(update.update_id)
+
+    dispatcher = UpdateDispatcher(handler, workers=4)
+    dispatcher.start()
+    for seq in range(50):
+        for chat_id in range(5):
+            dispatcher.submit(make_update(chat_id, seq))
+    dispatcher.stop()
+
+    assert dispatcher.processed == 250
+    for chat_id in range(5):
+        assert seen[chat_id] == list(range(50))
+
+
+def test_different_chats_run_in_parallel():
+    barrier = threading.Barrier(2, timeout=2)
+    dispatcher = UpdateDispatcher(lambda update: barrier.wait(), workers=2)
+    dispatcher.start()
+    dispatcher.submit(make_update(0, 1))
+    dispatcher.submit(make_update(1, 2))
+    dispatcher.stop()
+
+    assert dispatcher.processed == 2
+    assert dispatcher.failed == 0
+
+
+def test_full_queue_rejects_without_blocking():
+    release = threading.Event()
+    dispatcher = UpdateDispatcher(lambda update: release.wait(), workers=1, queue_size=1)
+    dispatcher.start()
+    assert dispatcher.submit(make_update(1, 1))
+    time.sleep(0.05)
+    assert dispatcher.submit(make_update(1, 2), block=False)
+    assert not dispatcher.submit(make_update(1, 3), block=False)
+    assert dispatcher.rejected == 1
+    release.set()
+    dispatcher.stop()
+
+
+def record_chats(index, processes, updates, counters, results):
+    serve_process(index, updates, counters,
+                  UpdateDispatcher(lambda update: results.put((index, update.message.chat.id)), workers=1),
+                  lambda: {"workers": 1})
+
+
+def test_process_dispatcher_routes_each_chat_to_one_process():
+    results = multiprocessing.get_context("spawn").Queue()
+    dispatcher = ProcessDispatcher(record_chats, processes=2, args=(results,), counter_names=("workers",))
+    dispatcher.start()
+    chats = [1, 2, -3, 4]
+    for seq in range(3):
+        for chat_id in chats:
+            assert dispatcher.submit(make_update(chat_id, seq))
+    dispatcher.stop(timeout=30)
+
+    seen = [results.get(timeout=5) for _ in range(3 * len(chats))]
+    assert sorted(seen) == sorted((chat_partition(chat_id, 2), chat_id) for chat_id in chats for _ in range(3))
+    assert dispatcher.processed == 12
+    assert dispatcher.failed == 0
+    assert dispatcher.counters.total("workers") == 2
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+from src.project.fast_parser import analyze, parse_locally, split_items
+
+
+def at(days, hour, minute=0):
+    day = datetime.now() + timedelta(days=days)
+    return day.replace(hour=hour, minute=minute, second=0, microsecond=0).isoformat()
+
+
+def test_simple_event_is_parsed_locally():
+    result = parse_locally("Созвон с командой завтра в 15:00", True)
+    assert result == {"title": "Созвон с командой", "start_time": at(1, 15), "end_time": None}
+
+
+def test_time_range_and_command_prefix():
+    result, confidence = analyze("Запиши планерку послезавтра с 10:00 до 11:30", True)
+    assert confidence == 1.0
+    assert result == {"title": "планерку", "start_time": at(2, 10), "end_time": at(2, 11, 30)}
+
+
+def test_task_without_time_is_accepted_only_for_todoist():
+    assert parse_locally("Напомни позвонить врачу до 28.12.2030", False)["start_time"] == "2030-12-28T00:00:00"
+    assert parse_locally("Напомни позвонить врачу до 28.12.2030", True) is None
+
+
+def test_vague_or_ambiguous_text_falls_back_to_llm():
+    assert parse_locally("Напомни про свидание завтра в семь вечера", True) is None
+    assert parse_locally("обед завтра или в пятницу в 13:00", True) is None
+    assert parse_locally("купить молоко", False) is None
+
+
+def test_split_items_with_shared_date():
+    assert split_items("завтра: 10:00 стендап, 14:00 ревью, купить молоко") == [
+        "10:00 стендап завтра", "14:00 ревью завтра", "купить молоко завтра"]
+    assert split_items("Созвон завтра в 15:00") == ["Созвон завтра в 15:00"]
+    assert [parse_locally(item, True)["start_time"] for item in split_items("завтра: 10:00 стендап; 14:00 ревью")] == [
+        at(1, 10), at(1, 14)]
+
+
+def test_split_items_only_on_explicit_list_markers():
+    assert split_items("встреча с Иваном, Петром завтра в 10:00") == ["встреча с Иваном, Петром завтра в 10:00"]
+    assert split_items("купить хлеб; молоко") == ["купить хлеб; молоко"]
+    assert split_items("стендап в 10:00, потом ревью\nкупить молоко") == [
+        "стендап в 10:00, потом ревью", "купить молоко"]
+    assert split_items("1) стендап в 10:00 2) ревью в 14:00") == ["стендап в 10:00", "ревью в 14:00"]
+    assert split_items("1. стендап завтра\n- ревью 24.12 в 14:00\n\n• молоко") == [
+        "стендап завтра", "ревью 24.12 в 14:00", "молоко"]
+
+
+NOW = datetime(2026, 10, 18, 12, 0)  # воскресенье
+
+
+def test_date_without_year_is_the_nearest_future_one():
+    assert parse_locally("созвон 20 октября в 10:00", True, now=NOW)["start_time"] == "2026-10-20T10:00:00"
+    assert parse_locally("встреча 5 ноября", False, now=NOW)["start_time"] == "2026-11-05T00:00:00"
+    assert parse_locally("отчет 1 октября в 10:00", True, now=NOW)["start_time"] == "2027-10-01T10:00:00"
+
+
+def test_time_without_date_rolls_forward_once_passed():
+    assert parse_locally("созвон в 15:00", True, now=NOW)["start_time"] == "2026-10-18T15:00:00"
+    assert parse_locally("созвон в 10:00", True, now=NOW)["start_time"] == "2026-10-19T10:00:00"
+
+
+def test_weekday_abbreviation_is_a_date():
+    assert parse_locally("пн 10:00 созвон", True, now=NOW) == {
+        "title": "созвон", "start_time": "2026-10-19T10:00:00", "end_time": None}
+    assert parse_locally("ревью в чт. в 11:00", True, now=NOW)["start_time"] == "2026-10-22T11:00:00"
@@ -0,0 +1,130 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from googleapiclient.errors import HttpError
+
+from src.project.api import google_sync
+from src.project.api.google_sync import CalendarCache, CalendarCaches
+from src.project.singleflight import SingleFlight
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def event(event_id, hours, summary=None, duration=1):
+    start = NOW + timedelta(hours=hours)
+    return {"id": event_id, "summary": summary or event_id, "status": "confirmed",
+            "start": {"dateTime": start.isoformat()},
+            "end": {"dateTime": (start + timedelta(hours=duration)).isoformat()}}
+
+
+class FakeCalendar:
+    """events().list(...).execute() с заранее заготовленными страницами ответов."""
+
+    def __init__(self, *pages):
+        self.pages = list(pages)
+        self.requests = []
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        self.requests.append(params)
+        return self
+
+    def execute(self, num_retries=0):
+        page = self.pages.pop(0)
+        if isinstance(page, Exception):
+            raise page
+        return page
+
+
+def test_full_then_incremental_sync():
+    calendar = FakeCalendar(
+        {"items": [event("b", 5), event("old", -50)], "nextPageToken": "p2"},
+        {"items": [event("a", 2), event("now", -1, duration=2)], "nextSyncToken": "s1"},
+        {"items": [{"id": "b", "status": "cancelled"}, event("c", 3)], "nextSyncToken": "s2"},
+    )
+    cache = CalendarCache()
+
+    cache.sync(calendar)
+    assert [e["id"] for e in cache.upcoming(NOW)] == ["now", "a", "b"]
+    assert cache.upcoming(NOW, limit=1)[0]["id"] == "now"
+
+    cache.sync(calendar)
+    assert [e["id"] for e in cache.upcoming(NOW)] == ["now", "a", "c"]
+    assert calendar.requests[1]["pageToken"] == "p2"
+    assert "syncToken" not in calendar.requests[0] and calendar.requests[2]["syncToken"] == "s1"
+    assert (cache.full_syncs, cache.incremental_syncs) == (1, 1)
+
+
+def test_expired_sync_token_triggers_full_resync():
+    gone = HttpError(SimpleNamespace(status=410, reason="Gone"), b"")
+    calendar = FakeCalendar(
+        {"items": [event("a", 1)], "nextSyncToken": "s1"},
+        gone,
+        {"items": [event("b", 2)], "nextSyncToken": "s2"},
+    )
+    cache = CalendarCache()
+    cache.sync(calendar)
+    cache.sync(calendar)
+
+    assert [e["id"] for e in cache.upcoming(NOW)] == ["b"]
+    assert cache.sync_token == "s2" and cache.full_syncs == 2
+
+
+def test_reads_and_own_writes_skip_the_network(monkeypatch):
+    calendar = FakeCalendar({"items": [event("a", 1)], "nextSyncToken": "s1"})
+    monkeypatch.setattr(google_sync.googleapi, "get_google_service", lambda token: calendar)
+    caches = CalendarCaches()
+
+    assert [e["id"] for e in caches.upcoming("token")] == ["a"]
+    caches.event_created("token", event("b", 2))
+    caches.event_deleted("token", "a")
+    assert [e["id"] for e in caches.upcoming("token")] == ["b"]
+    assert caches.upstream_syncs == 1 and caches.avoided_calls == 1
+
+
+def test_cache_follows_refreshed_token(monkeypatch):
+    calendar = FakeCalendar({"items": [event("a", 1)], "nextSyncToken": "s1"})
+    monkeypatch.setattr(google_sync.googleapi, "get_google_service", lambda token: calendar)
+    caches = CalendarCaches()
+
+    caches.upcoming("old")
+    caches.rename("old", "new")
+    assert [e["id"] for e in caches.upcoming("new")] == ["a"]
+    assert caches.upstream_syncs == 1
+
+
+def test_concurrent_reads_join_one_sync(monkeypatch):
+    calendar = FakeCalendar({"items": [event("a", 1)], "nextSyncToken": "s1"})
+    started, release = threading.Event(), threading.Event()
+    execute = calendar.execute
+
+    def slow_execute(num_retries=0):
+        started.set()
+        release.wait(5)
+        return execute(num_retries)
+
+    calendar.execute = slow_execute
+    flights = SingleFlight()
+    monkeypatch.setattr(google_sync.googleapi, "get_google_service", lambda token: calendar)
+    monkeypatch.setattr(google_sync.singleflight, "reads", flights)
+    caches = CalendarCaches()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(caches.upcoming("token"))) for _ in range(5)]
+    threads[0].start()
+    assert started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flights.shared < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert (flights.calls, flights.shared) == (1, 4)
+    assert caches.upstream_syncs == 1 and len(calendar.requests) == 1
+    assert [[e["id"] for e in result] for result in results] == [["a"]] * 5
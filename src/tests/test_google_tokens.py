@@ -0,0 +1,103 @@
+import threading
+import time
+
+from src.project.google_tokens import GoogleCredentialStore, GoogleTokenRefresher
+
+
+class TokenEndpoint:
+    def __init__(self, delay=0.0, error=None):
+        self.calls = []
+        self.delay = delay
+        self.error = error
+        self.lock = threading.Lock()
+
+    def __call__(self, refresh_token):
+        with self.lock:
+            self.calls.append(refresh_token)
+            number = len(self.calls)
+        time.sleep(self.delay)
+        if self.error:
+            return {"error": self.error}
+        return {"access_token": f"{refresh_token}-access-{number}", "expires_in": 3599}
+
+
+def test_store_selects_expiring_tokens_of_its_partition(tmp_path):
+    path = str(tmp_path / "google.db")
+    store = GoogleCredentialStore(path)
+    now = time.time()
+    store.put(1, "a1", "r1", now + 100)
+    store.put(2, "a2", "r2", now + 10)
+    store.put(3, "a3", "r3", now + 3600)
+    store.put(4, "a4", "", now)
+    assert store.get(2) == ("a2", "r2", now + 10)
+    assert store.expiring_before(now + 300, 10) == [2, 1]
+
+    odd = GoogleCredentialStore(path, partition=(1, 2))
+    assert odd.expiring_before(now + 300, 10) == [1]
+    assert odd.count() == 2
+    store.delete(1)
+    assert store.get(1) is None
+    odd.close()
+    store.close()
+
+
+def test_concurrent_requests_share_one_refresh(tmp_path):
+    store = GoogleCredentialStore(str(tmp_path / "google.db"))
+    store.put(7, "old", "refresh", time.time() + 5)
+    endpoint = TokenEndpoint(delay=0.1)
+    renamed = []
+    refresher = GoogleTokenRefresher(store, endpoint, on_refreshed=lambda *args: renamed.append(args))
+
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(refresher.access_token(7))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert endpoint.calls == ["refresh"]
+    assert tokens == ["refresh-access-1"] * 8
+    assert renamed == [(7, "old", "refresh-access-1")]
+    assert refresher.refreshed == 1 and refresher.shared >= 1
+    assert refresher.access_token(7) == "refresh-access-1"
+    assert store.get(7)[2] > time.time() + 3000
+    store.close()
+
+
+def test_background_pass_refreshes_only_expiring_tokens(tmp_path):
+    store = GoogleCredentialStore(str(tmp_path / "google.db"))
+    now = time.time()
+    for chat_id in range(5):
+        store.put(chat_id, f"a{chat_id}", f"r{chat_id}", now + 60 * chat_id)
+    store.put(10, "fresh", "r10", now + 3600)
+    endpoint = TokenEndpoint()
+    refresher = GoogleTokenRefresher(store, endpoint, ahead=150, batch_size=2)
+
+    assert refresher.refresh_expiring() == 3
+    assert sorted(endpoint.calls) == ["r0", "r1", "r2"]
+    assert store.get(10)[0] == "fresh"
+    assert store.expiring_before(time.time() + 150, 10) == []
+    store.close()
+
+
+def test_revoked_token_is_dropped_and_transient_error_keeps_old_token(tmp_path):
+    store = GoogleCredentialStore(str(tmp_path / "google.db"))
+    store.put(1, "expired", "revoked", time.time() - 1)
+    store.put(2, "still-valid", "refresh", time.time() + 30)
+    refresher = GoogleTokenRefresher(store, TokenEndpoint(error="invalid_grant"))
+    assert refresher.access_token(1) is None
+    assert store.get(1) is None
+
+    refresher = GoogleTokenRefresher(store, TokenEndpoint(error="temporarily_unavailable"))
+    assert refresher.access_token(2) == "still-valid"
+    assert refresher.failed == 1 and store.get(2)[0] == "still-valid"
+    store.close()
+
+
+def test_save_keeps_refresh_token_when_google_does_not_send_it(tmp_path):
+    store = GoogleCredentialStore(str(tmp_path / "google.db"))
+    refresher = GoogleTokenRefresher(store, TokenEndpoint())
+    refresher.save(3, {"access_token": "a1", "refresh_token": "r1", "expires_in": 3599})
+    refresher.save(3, {"access_token": "a2", "expires_in": 3599})
+    assert store.get(3)[:2] == ("a2", "r1")
+    store.close()
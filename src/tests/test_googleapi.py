@@ -0,0 +1,72 @@
+from collections import OrderedDict
+
+import pytest
+
+from src.project.api import googleapi
+
+
+@pytest.fixture
+def built(monkeypatch):
+    """Сервисы не строятся по-настоящему: build_google_service возвращает объект и записывает токен."""
+    tokens, clock = [], [1000.0]
+
+    def build(token):
+        tokens.append(token)
+        return object()
+
+    monkeypatch.setattr(googleapi, "_service_cache", OrderedDict())
+    monkeypatch.setattr(googleapi, "build_google_service", build)
+    monkeypatch.setattr(googleapi.time, "monotonic", lambda: clock[0])
+    return tokens, clock
+
+
+def test_service_is_built_once_per_token(built):
+    tokens, _ = built
+    first = googleapi.get_google_service("a")
+
+    assert googleapi.get_google_service("a") is first
+    assert googleapi.get_google_service("b") is not first
+    assert tokens == ["a", "b"]
+
+
+def test_service_is_rebuilt_after_ttl(built, monkeypatch):
+    tokens, clock = built
+    monkeypatch.setattr(googleapi, "SERVICE_CACHE_TTL", 60)
+    first = googleapi.get_google_service("a")
+
+    clock[0] += 59
+    assert googleapi.get_google_service("a") is first
+    clock[0] += 1
+    assert googleapi.get_google_service("a") is not first
+    assert tokens == ["a", "a"]
+
+
+def test_least_recently_used_service_is_evicted(built, monkeypatch):
+    tokens, _ = built
+    monkeypatch.setattr(googleapi, "SERVICE_CACHE_SIZE", 2)
+    googleapi.get_google_service("a")
+    googleapi.get_google_service("b")
+    googleapi.get_google_service("a")
+    googleapi.get_google_service("c")
+
+    assert list(googleapi._service_cache) == ["a", "c"]
+    googleapi.get_google_service("a")
+    googleapi.get_google_service("b")
+    assert tokens == ["a", "b", "c", "b"]
+
+
+def test_replaced_token_drops_its_service(built, monkeypatch):
+    from src.project import bot as bot_module
+
+    tokens, _ = built
+    monkeypatch.setattr(bot_module, "TOKEN_STORE_URL", "memory://")
+    monkeypatch.setitem(vars(bot_module), "token_store", None)
+    bot_module.save_user_token(7, "google_token", "old")
+    googleapi.get_google_service("old")
+    googleapi.get_google_service("other")
+
+    bot_module.save_user_token(7, "google_token", "old")
+    assert "old" in googleapi._service_cache
+    bot_module.save_user_token(7, "google_token", "new")
+    assert list(googleapi._service_cache) == ["other"]
+    assert tokens == ["old", "other"]
@@ -0,0 +1,45 @@
+from itertools import count
+
+from src.project import listing
+
+
+def test_chunks_never_exceed_telegram_limit():
+    lines = [f"{i}. задача " + "x" * (i % 500) for i in range(2000)]
+    chunks = list(listing.chunk_lines(lines, "Список:\n"))
+
+    assert all(len(chunk) <= listing.MESSAGE_LIMIT for chunk in chunks)
+    assert chunks[0].startswith("Список:\n")
+    assert "".join(chunks).count("\n") == len(lines) + 1
+
+
+def test_page_reads_only_what_it_needs():
+    pulled = []
+
+    def tasks():
+        for i in count():
+            pulled.append(i)
+            yield {"id": str(i), "content": f"задача {i}", "due": None}
+
+    rows = listing.get_page(tasks(), 2, page_size=10)
+    text, has_next = listing.render_page("Задачи:", rows, listing.format_task, 2, page_size=10)
+
+    assert text.splitlines()[1] == "21. задача 20"
+    assert has_next and len(pulled) == 31
+    assert listing.render_page("Задачи:", [], listing.format_task, 3) == (None, False)
+
+
+def test_format_due_handles_missing_and_iso_dates():
+    assert listing.format_due({"due": None}) is None
+    assert listing.format_due({}) is None
+    assert listing.format_due({"due": {"string": "каждый день", "date": "2025-03-01"}}) == "01 March 2025 года 00:00"
+    assert listing.format_due({"due": {"string": "завтра"}}) == "завтра"
+
+
+def test_page_keyboard_keeps_cursor_in_callback_data():
+    keyboard = listing.page_keyboard("events", 1, True)
+    data = [button.callback_data for button in keyboard.keyboard[0]]
+
+    assert data == ["events:0", "events:2"]
+    assert listing.parse_page_callback("events:2") == ("events", 2)
+    assert listing.parse_page_callback("other") is None
+    assert listing.page_keyboard("tasks", 0, False) is None
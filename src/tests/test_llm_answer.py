@@ -0,0 +1,61 @@
+import pytest
+
+from src.project.llm_answer import (AnswerFormatError, complete_json, decode_json, event_fields, numbered_items,
+                                    partial_fields, repair_json)
+
+
+def test_plain_json_is_decoded_as_is():
+    assert decode_json('{"title": "созвон", "start": "завтра 10:00", "end": null}') == \
+        {"title": "созвон", "start": "завтра 10:00", "end": None}
+
+
+def test_text_around_json_is_skipped():
+    text = 'Конечно!\n```json\n[{"title": "a"}, {"title": "b"}]\n```\nЕсли нужно что-то еще, спрашивайте.'
+    assert decode_json(text) == [{"title": "a"}, {"title": "b"}]
+
+
+@pytest.mark.parametrize("broken, expected", [
+    ("{'title': 'обед \"у мамы\"', 'start': null}", {"title": 'обед "у мамы"', "start": None}),
+    ('{“title”: “обед”, "end": null,}', {"title": "обед", "end": None}),
+    ('{"title": "строка\nвторая"}', {"title": "строка\nвторая"}),
+    ('[{"title": "a"}, {"title": "b", "start": "завтра', [{"title": "a"}, {"title": "b", "start": "завтра"}]),
+    ('{"title": "a", "start":', {"title": "a", "start": None}),
+])
+def test_common_model_mistakes_are_repaired_locally(broken, expected):
+    assert decode_json(broken) == expected
+
+
+def test_repair_keeps_only_first_value():
+    assert repair_json('{"a": 1} и еще {"b": 2}') == '{"a": 1}'
+
+
+def test_answer_without_json_is_a_format_error():
+    with pytest.raises(AnswerFormatError):
+        decode_json("Не могу помочь с этим запросом.")
+
+
+def test_event_fields_are_validated():
+    assert event_fields({"title": " созвон ", "start": "завтра 10:00", "end": "не указан"}) == \
+        ("созвон", "завтра 10:00", None)
+    for item in ({"start": "завтра"}, {"title": ""}, {"title": "a", "start": 10}, ["a"]):
+        with pytest.raises(AnswerFormatError):
+            event_fields(item)
+
+
+def test_numbered_items():
+    assert numbered_items({"1": {"title": "a"}, "[2]": {"title": "b"}, "x": {}}) == \
+        {1: {"title": "a"}, 2: {"title": "b"}}
+    with pytest.raises(AnswerFormatError):
+        numbered_items([{"title": "a"}])
+
+
+def test_complete_json_waits_for_the_closing_brace():
+    text = '{"title": "созвон", "start": "завтра 10:00", "end": null'
+    assert complete_json(text) is None
+    assert complete_json(text + "}\nЕсли нужно") == {"title": "созвон", "start": "завтра 10:00", "end": None}
+
+
+def test_partial_fields_show_what_is_already_written():
+    assert partial_fields("") == {}
+    assert partial_fields('```json\n{"title": "созв') == {"title": "созв"}
+    assert partial_fields('{"title": "созвон", "start": "", "end": nu') == {"title": "созвон"}
@@ -0,0 +1,133 @@
+import threading
+import time
+
+import pytest
+
+from src.project.llm_batcher import LLMBatcher
+
+
+class Completion:
+    def __init__(self, block=False):
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+        self.lock = threading.Lock()
+
+    def __call__(self, kind, texts):
+        with self.lock:
+            self.calls.append((kind, list(texts)))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        self.release.wait(5)
+        with self.lock:
+            self.active -= 1
+        return [f"{kind}:{text}" for text in texts]
+
+
+def test_single_request_is_sent_without_waiting():
+    completion = Completion()
+    batcher = LLMBatcher(completion, max_wait=1.0)
+    try:
+        started = time.monotonic()
+        assert batcher(True, "встреча") == "True:встреча"
+        assert time.monotonic() - started < 0.5
+    finally:
+        batcher.stop()
+    assert completion.calls == [(True, ["встреча"])]
+
+
+def test_requests_queue_up_while_slots_are_busy():
+    completion = Completion(block=True)
+    batcher = LLMBatcher(completion, max_batch=4, max_concurrency=2)
+    futures = [batcher.submit(True, f"сообщение {i}") for i in range(2)]
+    time.sleep(0.05)
+    futures += [batcher.submit(True, f"сообщение {i}") for i in range(2, 10)]
+    futures.append(batcher.submit(False, "задача"))
+    completion.release.set()
+    try:
+        results = [future.result(5) for future in futures]
+    finally:
+        batcher.stop()
+
+    assert results == [f"True:сообщение {i}" for i in range(10)] + ["False:задача"]
+    assert completion.max_active <= 2
+    assert all(len(texts) <= 4 for _, texts in completion.calls)
+    assert [texts for kind, texts in completion.calls if kind is False] == [["задача"]]
+    assert batcher.batches == len(completion.calls) < 11
+
+
+def test_identical_texts_share_one_item():
+    completion = Completion(block=True)
+    batcher = LLMBatcher(completion, max_concurrency=1)
+    first = batcher.submit(True, "занято")
+    time.sleep(0.05)
+    same = [batcher.submit(True, "созвон") for _ in range(3)]
+    completion.release.set()
+    try:
+        assert first.result(5) == "True:занято"
+        assert [future.result(5) for future in same] == ["True:созвон"] * 3
+    finally:
+        batcher.stop()
+    assert batcher.deduplicated == 2
+    assert completion.calls[-1] == (True, ["созвон"])
+
+
+def test_errors_reach_every_caller_of_the_batch():
+    gate = threading.Event()
+
+    def failing(kind, texts):
+        gate.wait(5)
+        if texts == ["a"]:
+            raise RuntimeError("LLM недоступна")
+        return texts[:1]
+
+    batcher = LLMBatcher(failing, max_concurrency=1)
+    first = batcher.submit(True, "a")
+    time.sleep(0.05)
+    rest = [batcher.submit(True, text) for text in ("b", "c")]
+    gate.set()
+    try:
+        with pytest.raises(RuntimeError):
+            first.result(5)
+        for future in rest:
+            with pytest.raises(ValueError):
+                future.result(5)
+    finally:
+        batcher.stop()
+
+
+def test_batch_size_follows_load():
+    batcher = LLMBatcher(lambda kind, texts: texts, max_batch=8, max_concurrency=2)
+    now = time.monotonic()
+    assert batcher.target_batch(now) == 1
+
+    batcher._latency, batcher._arrival_interval, batcher._last_arrival = 0.4, 0.01, now
+    assert batcher.target_batch(now) == 8
+    batcher._arrival_interval = 0.05
+    assert batcher.target_batch(now) == 4
+    assert batcher.target_batch(now + 1.0) == 1
+
+
+def test_lone_request_with_progress_is_streamed():
+    streamed = []
+
+    def stream(kind, text, progress):
+        progress({"title": text[:3]})
+        streamed.append(text)
+        return f"поток:{text}"
+
+    completion = Completion()
+    batcher = LLMBatcher(completion, stream=stream)
+    partials = []
+    try:
+        assert batcher(True, "встреча", partials.append) == "поток:встреча"
+        assert batcher(True, "обед") == "True:обед"
+    finally:
+        batcher.stop()
+    assert partials == [{"title": "вст"}]
+    assert streamed == ["встреча"]
+    assert completion.calls == [(True, ["обед"])]
+    assert batcher.streamed == 1
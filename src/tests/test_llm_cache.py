@@ -0,0 +1,83 @@
+from datetime import date, timedelta
+
+from src.project.llm_cache import LLMCache, anchor_kind, normalize_request
+
+MONDAY = date(2024, 12, 23)
+
+
+def result_for(day, hour="15:00"):
+    return {"title": "созвон", "start_time": f"{day.isoformat()}T{hour}:00", "end_time": None}
+
+
+def test_normalize_request():
+    assert normalize_request("Завтра в 15:00, созвон!") == "завтра в 15:00 созвон"
+    assert normalize_request("Встреча в ПЯТНИЦУ.") == "встреча в пятница"
+    assert normalize_request("отчет до 28.12.2024.") == "отчет до 28.12.2024"
+
+
+def test_anchor_kind():
+    assert anchor_kind("завтра в 15:00 созвон") == "relative"
+    assert anchor_kind("встреча в пятница") == "weekday"
+    assert anchor_kind("28 декабря созвон") == "absolute"
+    assert anchor_kind("созвон 20-го в 15:00") == "today"
+    assert anchor_kind("созвон через 2 часа") == "moment"
+
+
+def test_relative_hit_is_reanchored_to_today():
+    cache = LLMCache()
+    cache.put("завтра в 15:00 созвон", True, result_for(MONDAY + timedelta(days=1)), today=MONDAY)
+
+    wednesday = MONDAY + timedelta(days=2)
+    hit = cache.get("Завтра в 15:00 созвон.", True, today=wednesday)
+    assert hit == result_for(wednesday + timedelta(days=1))
+    assert cache.get("завтра в 15:00 созвон", False, today=wednesday) is None
+    assert cache.hits == 1 and cache.misses == 1
+
+
+def test_weekday_hit_only_on_same_weekday():
+    cache = LLMCache()
+    friday = MONDAY + timedelta(days=4)
+    cache.put("созвон в пятницу", True, result_for(friday), today=MONDAY)
+
+    assert cache.get("созвон в пятницу", True, today=MONDAY + timedelta(days=1)) is None
+    assert cache.get("созвон в пятницу", True, today=MONDAY + timedelta(days=7)) == result_for(friday + timedelta(days=7))
+
+
+def test_absolute_dates_are_not_shifted():
+    cache = LLMCache()
+    day = date(2024, 12, 28)
+    cache.put("созвон 28 декабря в 15:00", True, result_for(day), today=MONDAY)
+    assert cache.get("созвон 28 декабря в 15:00", True, today=MONDAY + timedelta(days=3)) == result_for(day)
+
+
+def test_size_ttl_and_unparsed_results():
+    cache = LLMCache(max_size=1)
+    cache.put("a завтра", True, result_for(MONDAY), today=MONDAY)
+    cache.put("b завтра", True, result_for(MONDAY), today=MONDAY)
+    assert cache.get("a завтра", True, today=MONDAY) is None
+
+    cache.put("c", True, {"title": "c", "start_time": "в обед", "end_time": None}, today=MONDAY)
+    assert cache.get("c", True, today=MONDAY) is None
+
+    expired = LLMCache(ttl=0)
+    expired.put("a завтра", True, result_for(MONDAY), today=MONDAY)
+    assert expired.get("a завтра", True, today=MONDAY) is None
+
+
+def test_disk_tier(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    LLMCache(disk_path=path).put("завтра созвон", True, result_for(MONDAY), today=MONDAY)
+
+    cache = LLMCache(disk_path=path)
+    assert cache.get("завтра созвон", True, today=MONDAY + timedelta(days=1)) == result_for(MONDAY + timedelta(days=1))
+    assert cache.disk_hits == 1
+
+
+def test_requests_without_a_day_word_are_not_shifted():
+    cache = LLMCache()
+    cache.put("созвон 20-го в 15:00", True, result_for(date(2024, 12, 20)), today=MONDAY)
+    assert cache.get("созвон 20-го в 15:00", True, today=MONDAY) == result_for(date(2024, 12, 20))
+    assert cache.get("созвон 20-го в 15:00", True, today=MONDAY + timedelta(days=1)) is None
+
+    cache.put("созвон через 2 часа", True, result_for(MONDAY, "11:15"), today=MONDAY)
+    assert cache.get("созвон через 2 часа", True, today=MONDAY) is None
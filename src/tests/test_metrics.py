@@ -0,0 +1,49 @@
+import asyncio
+
+from src.project import metrics
+from src.project.metrics import Callback, Counter, Histogram, Registry
+
+
+def test_render_prometheus_text_format():
+    registry = Registry()
+    failures = Counter("failures_total", "Ошибки.", ("stage",), registry=registry)
+    latency = Histogram("latency_seconds", "Время.", ("operation",), buckets=(0.1, 1.0), registry=registry)
+    Callback("queue_depth", "Очередь.", lambda: 3, registry=registry)
+
+    failures.inc(stage="date")
+    failures.inc(2, stage="date")
+    latency.observe(0.05, operation='list "x"')
+    latency.observe(0.5, operation='list "x"')
+    latency.observe(7, operation='list "x"')
+
+    assert registry.render().splitlines() == [
+        "# HELP failures_total Ошибки.",
+        "# TYPE failures_total counter",
+        'failures_total{stage="date"} 3',
+        "# HELP latency_seconds Время.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{operation="list \\"x\\"",le="0.1"} 1',
+        'latency_seconds_bucket{operation="list \\"x\\"",le="1.0"} 2',
+        'latency_seconds_bucket{operation="list \\"x\\"",le="+Inf"} 3',
+        'latency_seconds_sum{operation="list \\"x\\""} 7.55',
+        'latency_seconds_count{operation="list \\"x\\""} 3',
+        "# HELP queue_depth Очередь.",
+        "# TYPE queue_depth gauge",
+        "queue_depth 3",
+    ]
+
+
+def test_timed_decorator_handles_sync_and_async():
+    histogram = Histogram("calls_seconds", "Вызовы.", ("kind",), registry=Registry())
+
+    @metrics.timed(histogram, kind="sync")
+    def work():
+        return 1
+
+    @metrics.timed(histogram, kind="async")
+    async def async_work():
+        return 2
+
+    assert work() == 1
+    assert asyncio.run(async_work()) == 2
+    assert histogram.count(kind="sync") == 1 and histogram.count(kind="async") == 1
@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+
+from src.project.outbox import SKIPPED, Outbox, TokenBucket
+
+
+class TooManyRequests(Exception):
+    error_code = 429
+    result_json = {"parameters": {"retry_after": 0.05}}
+
+
+class Telegram:
+    def __init__(self, fail_first=0):
+        self.sent = []
+        self.fail_first = fail_first
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id, text, **kwargs):
+        with self.lock:
+            if self.fail_first:
+                self.fail_first -= 1
+                raise TooManyRequests()
+            self.sent.append((time.monotonic(), chat_id, text, kwargs))
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_sends_directly_until_started():
+    telegram = Telegram()
+    outbox = Outbox(telegram.send_message)
+    outbox.send(1, "привет")
+    assert [text for _, _, text, _ in telegram.sent] == ["привет"]
+
+
+def test_pending_messages_to_one_chat_are_coalesced():
+    telegram = Telegram()
+    outbox = Outbox(telegram.send_message, chat_rate=10)
+    outbox.start()
+    try:
+        outbox.send(1, "первое")
+        assert wait_for(lambda: telegram.sent)
+        for text in ("список", "напишите номер"):
+            outbox.send(1, text)
+        outbox.send(1, "страница", reply_markup="kb")
+        assert wait_for(lambda: len(telegram.sent) == 3)
+    finally:
+        outbox.stop()
+
+    assert [(text, kwargs) for _, _, text, kwargs in telegram.sent] == [
+        ("первое", {}), ("список\n\nнапишите номер", {}), ("страница", {"reply_markup": "kb"})]
+    assert outbox.coalesced == 1 and outbox.depth == 0
+
+
+def test_per_chat_and_global_limits():
+    telegram = Telegram()
+    outbox = Outbox(telegram.send_message, global_rate=40, chat_rate=20)
+    outbox.start()
+    try:
+        for i in range(4):
+            outbox.send(1, f"a{i}", reply_markup=i)
+        for chat_id in range(2, 30):
+            outbox.send(chat_id, "b")
+        assert wait_for(lambda: len(telegram.sent) == 32)
+    finally:
+        outbox.stop()
+
+    chat_times = [at for at, chat_id, _, _ in telegram.sent if chat_id == 1]
+    assert all(later - earlier >= 0.04 for earlier, later in zip(chat_times, chat_times[1:]))
+    assert outbox.max_depth >= 4
+
+
+def test_retries_after_429():
+    telegram = Telegram(fail_first=2)
+    outbox = Outbox(telegram.send_message)
+    outbox.start()
+    try:
+        outbox.send(1, "напоминание")
+        assert wait_for(lambda: telegram.sent)
+    finally:
+        outbox.stop()
+    assert telegram.sent[0][2] == "напоминание"
+    assert outbox.retried == 2 and outbox.failed == 0
+
+
+def test_direct_calls_share_the_chat_limit_and_pause_after_429():
+    telegram = Telegram()
+    outbox = Outbox(telegram.send_message, chat_rate=10)
+    outbox.start()
+    try:
+        assert outbox.call(1, lambda: "edited", wait=False) == "edited"
+        assert outbox.call(1, lambda: "edited", wait=False) is SKIPPED
+        called = time.monotonic()
+        outbox.send(1, "после правки")
+        assert wait_for(lambda: telegram.sent)
+
+        def limited():
+            raise TooManyRequests()
+        with pytest.raises(TooManyRequests):
+            outbox.call(2, limited, wait=False)
+        limited_at = time.monotonic()
+        outbox.send(2, "после 429")
+        assert wait_for(lambda: len(telegram.sent) == 2)
+    finally:
+        outbox.stop()
+
+    assert telegram.sent[0][0] - called >= 0.09
+    assert telegram.sent[1][0] - limited_at >= 0.04
+    assert outbox.retried == 1
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=2, capacity=1)
+    now = bucket.updated
+    bucket.take(now)
+    assert bucket.delay(now) == 0.5
+    assert bucket.delay(now + 0.5) == 0.0
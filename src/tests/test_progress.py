@@ -0,0 +1,92 @@
+import time
+from types import SimpleNamespace
+
+from src.project.outbox import Outbox
+from src.project.progress import PLACEHOLDER, ProgressMessage
+
+
+class TooManyRequests(Exception):
+    error_code = 429
+    result_json = {"parameters": {"retry_after": 0.2}}
+
+
+class Chat:
+    def __init__(self, fail_edits=False, limited_edits=0):
+        self.log = []
+        self.fail_edits = fail_edits
+        self.limited_edits = limited_edits
+
+    def send(self, chat_id, text):
+        self.log.append(("send", text))
+        return SimpleNamespace(message_id=7)
+
+    def edit(self, text, chat_id, message_id):
+        if self.fail_edits:
+            raise RuntimeError("Bad Request")
+        if self.limited_edits:
+            self.limited_edits -= 1
+            raise TooManyRequests()
+        self.log.append(("edit", text, time.monotonic()))
+
+    def reply(self, chat_id, text):
+        self.log.append(("reply", text))
+
+    def progress(self, edit_interval=0.0, outbox=None):
+        return ProgressMessage(1, self.send, self.edit, outbox or Outbox(self.reply), edit_interval=edit_interval)
+
+    def actions(self):
+        return [entry[:2] for entry in self.log]
+
+
+def test_answer_without_placeholder_is_a_plain_reply():
+    chat = Chat()
+    chat.progress().finish("Готово")
+    assert chat.log == [("reply", "Готово")]
+
+
+def test_placeholder_is_edited_into_the_answer():
+    chat = Chat()
+    progress = chat.progress()
+    progress.waiting()
+    progress.waiting()
+    progress.update("⏳ Событие: созвон")
+    progress.update("⏳ Событие: созвон")
+    progress.finish("Событие добавлено")
+    assert chat.actions() == [("send", PLACEHOLDER), ("edit", "⏳ Событие: созвон"), ("edit", "Событие добавлено")]
+
+
+def test_updates_are_throttled():
+    chat = Chat()
+    progress = chat.progress(edit_interval=60)
+    progress.waiting()
+    progress.update("⏳ Событие: с")
+    progress.update("⏳ Событие: созвон")
+    assert chat.log == [("send", PLACEHOLDER)]
+
+
+def test_failed_edit_falls_back_to_reply():
+    chat = Chat(fail_edits=True)
+    progress = chat.progress()
+    progress.waiting()
+    progress.update("⏳ Событие: созвон")
+    progress.finish("Событие добавлено")
+    assert chat.log == [("send", PLACEHOLDER), ("reply", "Событие добавлено")]
+
+
+def test_edits_share_the_outbox_limits_and_wait_out_429():
+    chat = Chat(limited_edits=1)
+    outbox = Outbox(chat.reply, chat_rate=5)
+    outbox.start()
+    try:
+        progress = chat.progress(outbox=outbox)
+        progress.waiting()
+        # Токен чата только что ушел на заглушку: промежуточная правка пропускается, а не ждет.
+        progress.update("⏳ Событие: созвон")
+        started = time.monotonic()
+        progress.finish("Событие добавлено")
+    finally:
+        outbox.stop()
+
+    assert chat.actions() == [("send", PLACEHOLDER), ("edit", "Событие добавлено")]
+    assert chat.log[-1][2] - started >= TooManyRequests.result_json["parameters"]["retry_after"]
+    assert outbox.retried == 1
@@ -0,0 +1,69 @@
+from datetime import date, datetime
+from itertools import islice
+
+from src.project.recurrence import (
+    DAILY, MONTHLY, WEEKLY, WORKDAYS, Recurrence, first_occurrence, occurrences, parse_recurrence,
+)
+
+NOW = datetime(2026, 10, 18, 12, 0)
+
+
+def test_phrases_become_rules_and_leave_the_rest_for_parsing():
+    assert parse_recurrence("каждый понедельник в 10:00 планёрка", NOW) == (Recurrence(WEEKLY, 1, (0,)),
+                                                                           "в 10:00 планёрка")
+    assert parse_recurrence("по средам и пятницам в 19:00 бассейн", NOW)[0] == Recurrence(WEEKLY, 1, (2, 4))
+    assert parse_recurrence("каждую вторую среду в 11:00 встреча", NOW)[0] == Recurrence(WEEKLY, 2, (2,))
+    assert parse_recurrence("каждые 3 дня полить цветы", NOW) == (Recurrence(DAILY, 3), "полить цветы")
+    assert parse_recurrence("по будням в 9:00 стендап", NOW)[0] == Recurrence(WEEKLY, 1, WORKDAYS)
+    assert parse_recurrence("планёрка, каждый понедельник, в 10:00", NOW)[1] == "планёрка в 10:00"
+    assert parse_recurrence("созвон завтра в 10:00", NOW) == (None, "созвон завтра в 10:00")
+    assert parse_recurrence("2 раза в неделю спорт", NOW)[0] is None
+
+
+def test_weekday_after_weekly_period_becomes_byday():
+    assert parse_recurrence("каждые 2 недели в среду ретро", NOW) == (Recurrence(WEEKLY, 2, (2,)), "ретро")
+    assert parse_recurrence("каждые 2 недели по средам в 15:00 ретро", NOW) == (Recurrence(WEEKLY, 2, (2,)),
+                                                                               "в 15:00 ретро")
+    assert parse_recurrence("еженедельно во вторник и в четверг йога", NOW) == (Recurrence(WEEKLY, 1, (1, 3)),
+                                                                                "йога")
+    # Без недельного периода «в среду» — дата, ее разбирает dateparse.
+    assert parse_recurrence("ежемесячно в среду оплатить счёт", NOW) == (Recurrence(MONTHLY),
+                                                                         "в среду оплатить счёт")
+
+
+def test_limits_by_date_range_and_count():
+    rule, rest = parse_recurrence("каждый день с 1 по 5 июня 2027 года в 9:00 зарядка", NOW)
+    assert rule == Recurrence(DAILY, until=date(2027, 6, 5))
+    assert rest == "1 июня 2027 года в 9:00 зарядка"
+    assert parse_recurrence("ежемесячно оплатить счёт до 31.12.2026", NOW)[0].until == date(2026, 12, 31)
+    assert parse_recurrence("ежедневно зарядка 10 раз", NOW) == (Recurrence(DAILY, count=10), "зарядка")
+
+
+def test_rrule_and_todoist_due_string():
+    start = datetime(2026, 10, 19, 10, 0)
+    assert Recurrence(WEEKLY, 2, (0, 2)).rrule() == "RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE"
+    # UNTIL — конец последнего дня по Москве в UTC.
+    assert Recurrence(DAILY, until=date(2027, 6, 5)).rrule() == "RRULE:FREQ=DAILY;UNTIL=20270605T205959Z"
+    assert Recurrence(WEEKLY, 1, (0, 2)).due_string(start) == "every mon, wed at 10:00 starting 2026-10-19"
+    assert Recurrence(WEEKLY, 1, WORKDAYS).due_string() == "every workday"
+    assert Recurrence(DAILY, count=3).due_string(start) == "every day at 10:00 starting 2026-10-19 until 2026-10-21"
+    assert Recurrence(WEEKLY, 2, (2,)).describe() == "раз в 2 недели по ср"
+
+
+def test_occurrences_are_generated_lazily():
+    start = datetime(2026, 10, 19, 10, 0)
+    every_day = occurrences(Recurrence(DAILY), start)
+    assert next(every_day) == start
+    assert [moment.day for moment in islice(every_day, 2)] == [20, 21]
+    assert [moment.day for moment in occurrences(Recurrence(WEEKLY, 1, (0, 2), count=3), start)] == [19, 21, 26]
+    # Месяцы без 31-го числа пропускаются, как в RFC 5545.
+    monthly = occurrences(Recurrence(MONTHLY, until=date(2027, 6, 1)), datetime(2027, 1, 31, 9, 0))
+    assert [moment.month for moment in monthly] == [1, 3, 5]
+
+
+def test_first_occurrence_is_not_in_the_past():
+    today = datetime(2026, 10, 18, 10, 0)
+    assert first_occurrence(Recurrence(DAILY), today, NOW) == datetime(2026, 10, 19, 10, 0)
+    assert first_occurrence(Recurrence(WEEKLY, 1, (0,)), today, NOW) == datetime(2026, 10, 19, 10, 0)
+    assert first_occurrence(Recurrence(DAILY, count=2), today, NOW) == datetime(2026, 10, 19, 10, 0)
+    assert first_occurrence(Recurrence(DAILY, until=date(2026, 10, 1)), today, NOW) is None
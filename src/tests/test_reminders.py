@@ -0,0 +1,75 @@
+import threading
+import time
+
+from src.project.reminders import ReminderScheduler, ReminderStore
+
+
+class Inbox:
+    def __init__(self, expected):
+        self.messages = []
+        self.expected = expected
+        self.done = threading.Event()
+
+    def deliver(self, chat_id, texts):
+        self.messages.append((chat_id, texts))
+        if sum(len(texts) for _, texts in self.messages) >= self.expected:
+            self.done.set()
+
+
+def test_reminders_fire_in_order_and_group_by_chat(tmp_path):
+    inbox = Inbox(expected=3)
+    scheduler = ReminderScheduler(ReminderStore(str(tmp_path / "reminders.db")), inbox.deliver)
+    now = time.time()
+    scheduler.schedule_many([(now + 0.2, 1, "google:a", "стендап"), (now + 0.2, 1, "todoist:b", "отчет"),
+                             (now + 0.1, 2, "google:c", "звонок")])
+    scheduler.schedule(3, "google:d", now + 0.1, "отменено")
+    scheduler.cancel(3, "google:d")
+    scheduler.start()
+    try:
+        assert inbox.done.wait(5)
+    finally:
+        scheduler.stop()
+
+    assert inbox.messages == [(2, ["звонок"]), (1, ["стендап", "отчет"])]
+    assert scheduler.store.count() == 0
+
+
+def test_only_the_nearest_window_is_kept_in_memory(tmp_path):
+    inbox = Inbox(expected=2)
+    store = ReminderStore(str(tmp_path / "reminders.db"))
+    now = time.time()
+    store.put_many([(now + 3600 * 24 + i, i, "k", "позже") for i in range(100)])
+    scheduler = ReminderScheduler(store, inbox.deliver, horizon=60, max_loaded=10)
+    scheduler.start()
+    try:
+        scheduler.schedule(7, "soon", now + 0.05, "скоро")
+        scheduler.schedule(8, "moved", now + 3600, "перенесено")
+        scheduler.schedule(8, "moved", now + 0.1, "перенесено")
+        assert inbox.done.wait(5)
+        assert scheduler.loaded == 0
+    finally:
+        scheduler.stop()
+
+    assert inbox.messages == [(7, ["скоро"]), (8, ["перенесено"])]
+    assert store.count() == 100
+
+
+def test_restart_picks_up_overdue_reminders(tmp_path):
+    path = str(tmp_path / "reminders.db")
+    ReminderStore(path).put_many([(time.time() - 5, 1, "k", "пропущено")])
+    inbox = Inbox(expected=1)
+    scheduler = ReminderScheduler(ReminderStore(path), inbox.deliver, max_loaded=1)
+    scheduler.start()
+    try:
+        assert inbox.done.wait(5)
+    finally:
+        scheduler.stop()
+    assert inbox.messages == [(1, ["пропущено"])]
+
+
+def test_partitioned_store_sees_only_its_chats(tmp_path):
+    path = str(tmp_path / "reminders.db")
+    ReminderStore(path).put_many([(1.0, chat_id, "k", "t") for chat_id in (1, 2, 3, -4)])
+
+    assert sorted(row[1] for row in ReminderStore(path, partition=(0, 2)).due_before(10, 10)) == [-4, 2]
+    assert ReminderStore(path, partition=(1, 2)).count() == 2
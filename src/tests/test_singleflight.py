@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from src.project.singleflight import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_upstream_call():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    upstream = []
+
+    def fetch(token):
+        upstream.append(token)
+        started.set()
+        release.wait(5)
+        return [{"id": "1", "name": "Inbox"}]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do(("projects", "t"), fetch, "t")))
+               for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while flight.shared < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert upstream == ["t"]
+    assert results == [[{"id": "1", "name": "Inbox"}]] * 5
+    assert flight.calls == 1 and flight.shared == 4
+    assert flight.do(("projects", "other"), lambda: "fresh") == "fresh"
+
+
+def test_errors_are_cached_briefly():
+    flight = SingleFlight(error_ttl=0.05)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        return {"error": "503"}
+
+    assert flight.do("key", failing) == {"error": "503"}
+    assert flight.do("key", failing) == {"error": "503"}
+    assert len(calls) == 1 and flight.negative_hits == 1
+
+    time.sleep(0.06)
+    flight.do("key", failing)
+    assert len(calls) == 2
+
+
+def test_exceptions_are_shared_and_cached():
+    flight = SingleFlight()
+
+    def broken():
+        raise ConnectionError("нет сети")
+
+    with pytest.raises(ConnectionError):
+        flight.do("key", broken)
+    with pytest.raises(ConnectionError):
+        flight.do("key", lambda: "не вызывается")
+    flight.forget("key")
+    assert flight.do("key", lambda: "ok") == "ok"
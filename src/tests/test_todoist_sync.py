@@ -0,0 +1,85 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from src.project.api import todoist_sync
+from src.project.api.todoist_sync import TodoistMirrors
+from src.project.singleflight import SingleFlight
+
+
+class FakeSyncApi:
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.requests = []
+
+    def post(self, url, data=None, headers=None):
+        self.requests.append(data)
+        body = self.answers.pop(0)
+        return SimpleNamespace(status_code=200, json=lambda: body, text="")
+
+
+def item(item_id, content, **extra):
+    return {"id": item_id, "content": content, "child_order": int(item_id), **extra}
+
+
+def test_reads_are_served_from_mirror_until_invalidated(monkeypatch):
+    api = FakeSyncApi(
+        {"sync_token": "t1", "full_sync": True, "items": [item("1", "стендап"), item("2", "ревью")],
+         "projects": [{"id": "p1", "name": "Inbox"}]},
+        {"sync_token": "t2", "full_sync": False, "items": [item("1", "стендап", checked=True), item("3", "молоко")],
+         "projects": []},
+    )
+    monkeypatch.setattr(todoist_sync.transport, "post", api.post)
+    mirrors = TodoistMirrors()
+
+    assert [task["content"] for task in mirrors.get_tasks("token")] == ["стендап", "ревью"]
+    assert [project["name"] for project in mirrors.get_projects("token")] == ["Inbox"]
+    assert mirrors.get_tasks("token")[1]["id"] == "2"
+    assert mirrors.upstream_calls == 1 and mirrors.avoided_calls == 2
+
+    mirrors.invalidate("token")
+    assert [task["content"] for task in mirrors.get_tasks("token")] == ["ревью", "молоко"]
+    assert [request["sync_token"] for request in api.requests] == ["*", "t1"]
+
+
+def test_large_accounts_fall_back_to_rest(monkeypatch):
+    api = FakeSyncApi({"sync_token": "t1", "full_sync": True, "items": [item(str(i), "x") for i in range(5)]})
+    monkeypatch.setattr(todoist_sync.transport, "post", api.post)
+    monkeypatch.setattr(todoist_sync.todoistapi, "get_todoist_tasks", lambda token: ["rest"])
+    mirrors = TodoistMirrors(max_items_per_user=3)
+
+    assert mirrors.get_tasks("token") == ["rest"]
+    assert mirrors.get_tasks("token") == ["rest"]
+    assert len(api.requests) == 1
+
+
+def test_concurrent_reads_join_one_sync(monkeypatch):
+    api = FakeSyncApi({"sync_token": "t1", "full_sync": True, "items": [],
+                       "projects": [{"id": "p1", "name": "Inbox"}]})
+    started, release = threading.Event(), threading.Event()
+
+    def slow_post(url, data=None, headers=None):
+        started.set()
+        release.wait(5)
+        return api.post(url, data, headers)
+
+    flights = SingleFlight()
+    monkeypatch.setattr(todoist_sync.transport, "post", slow_post)
+    monkeypatch.setattr(todoist_sync.singleflight, "reads", flights)
+    mirrors = TodoistMirrors()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(mirrors.get_projects("token"))) for _ in range(10)]
+    threads[0].start()
+    assert started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flights.shared < 9 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert (flights.calls, flights.shared) == (1, 9)
+    assert len(api.requests) == 1 and mirrors.upstream_calls == 1
+    assert results == [[{"id": "p1", "name": "Inbox"}]] * 10
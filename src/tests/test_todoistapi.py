@@ -0,0 +1,29 @@
+from types import SimpleNamespace
+
+from src.project.api import todoistapi
+
+
+def test_create_tasks_batch_reports_each_item(monkeypatch):
+    sent = {}
+
+    def fake_post(url, json=None, headers=None):
+        sent["commands"] = json["commands"]
+        first, second = json["commands"]
+        body = {
+            "sync_status": {first["uuid"]: "ok", second["uuid"]: {"error_code": 15, "error": "Invalid date format"}},
+            "temp_id_mapping": {first["temp_id"]: "101"},
+        }
+        return SimpleNamespace(status_code=200, json=lambda: body, text="")
+
+    monkeypatch.setattr(todoistapi.transport, "post", fake_post)
+    results = todoistapi.create_tasks_batch("token", [("стендап", "2024-12-24T10:00:00"), ("ревью", "когда-то")], "42")
+
+    assert results == [{"id": "101"}, {"error": "Invalid date format"}]
+    assert [command["args"]["project_id"] for command in sent["commands"]] == ["42", "42"]
+    assert sent["commands"][0]["args"]["due"] == {"string": "2024-12-24T10:00:00"}
+
+
+def test_recurring_due_string_is_sent_with_its_language():
+    data = todoistapi.task_request_data("планёрка", "42", "every mon at 10:00", "en")
+    assert (data["due_string"], data["due_lang"]) == ("every mon at 10:00", "en")
+    assert "due_lang" not in todoistapi.task_request_data("молоко", "42")
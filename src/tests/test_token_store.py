@@ -0,0 +1,51 @@
+import pytest
+
+from src.project.token_store import SQLiteTokenStore, create_token_store
+
+
+@pytest.fixture(params=["memory://", "sqlite", "local-redis://"])
+def store(request, tmp_path):
+    url = request.param
+    if url == "sqlite":
+        url = f"sqlite:///{tmp_path / 'tokens.db'}"
+    store = create_token_store(url)
+    yield store
+    store.close()
+
+
+def test_set_get_delete(store):
+    store.set(1, "google_token", "g1")
+    store.set(1, "todoist_token", "t1")
+    assert store.get(1, "google_token") == "g1"
+    assert store.get(1, "todoist_token") == "t1"
+    assert store.get(2, "google_token") is None
+
+    store.set(1, "google_token", "g2")
+    store.delete(1, "todoist_token")
+    assert store.get(1, "google_token") == "g2"
+    assert store.get(1, "todoist_token") is None
+
+
+def test_set_many(store):
+    store.set_many((chat_id, "google_token", f"g{chat_id}") for chat_id in range(100))
+    store.flush()
+    assert store.get(42, "google_token") == "g42"
+
+
+def test_sqlite_persists_batched_writes(tmp_path):
+    path = str(tmp_path / "tokens.db")
+    store = SQLiteTokenStore(path, cache_size=2, batch_size=1000, flush_interval=0)
+    for chat_id in range(10):
+        store.set(chat_id, "google_token", f"g{chat_id}")
+    assert store.get(0, "google_token") == "g0"
+    store.close()
+
+    reopened = SQLiteTokenStore(path, cache_size=2, flush_interval=0)
+    assert [reopened.get(chat_id, "google_token") for chat_id in range(10)] == [f"g{i}" for i in range(10)]
+    assert reopened.get(99, "google_token") is None
+    reopened.close()
+
+
+def test_unknown_store_url():
+    with pytest.raises(ValueError):
+        create_token_store("ftp://tokens")
@@ -0,0 +1,75 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.project.api import transport
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Локальный сервер отвечает статусами из списка по очереди; адаптер записывает таймауты запросов."""
+    statuses, calls, timeouts = [], [], []
+
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self):
+            calls.append(self.command)
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            self.send_response(statuses.pop(0))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        do_GET = do_POST = reply
+
+        def log_message(self, *args):
+            pass
+
+    send = transport.HTTPAdapter.send
+
+    def recording_send(adapter, request, **kwargs):
+        timeouts.append(kwargs.get("timeout"))
+        return send(adapter, request, **kwargs)
+
+    monkeypatch.setattr(transport.HTTPAdapter, "send", recording_send)
+    monkeypatch.setattr(transport, "RETRY_BACKOFF_FACTOR", 0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    transport.close_sessions()
+    yield f"http://127.0.0.1:{server.server_port}/", statuses, calls, timeouts
+    transport.close_sessions()
+    server.shutdown()
+    server.server_close()
+
+
+def test_post_is_not_retried_on_server_errors(upstream):
+    url, statuses, calls, _ = upstream
+    statuses += [500]
+    assert transport.post(url, json={}).status_code == 500
+    statuses += [502]
+    assert transport.post(url, json={}).status_code == 502
+    assert calls == ["POST", "POST"]
+
+
+def test_post_is_retried_on_429_and_503(upstream):
+    url, statuses, calls, _ = upstream
+    statuses += [429, 503, 201]
+    assert transport.post(url, json={}).status_code == 201
+    assert calls == ["POST"] * 3
+
+
+def test_get_is_retried_on_server_errors_up_to_the_limit(upstream):
+    url, statuses, calls, _ = upstream
+    statuses += [500, 502, 200]
+    assert transport.get(url).status_code == 200
+
+    statuses += [500] * (transport.RETRY_TOTAL + 1)
+    assert transport.get(url).status_code == 500
+    assert len(calls) == 3 + transport.RETRY_TOTAL + 1 and not statuses
+
+
+def test_default_timeouts_are_applied(upstream):
+    url, statuses, _, timeouts = upstream
+    statuses += [200, 200]
+    transport.get(url)
+    transport.get(url, timeout=1)
+    assert timeouts == [(transport.CONNECT_TIMEOUT, transport.READ_TIMEOUT), 1]